@@ -4,8 +4,6 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
 from dotenv import load_dotenv
-from datetime import datetime
-import pytz # <-- Importar pytz
 
 load_dotenv()  # <-- Cargar las variables del archivo .env
 
@@ -17,22 +15,15 @@ login_manager.login_message = "Por favor, inicie sesión para acceder a esta pá
 login_manager.login_message_category = "info"
 
 # --- INICIO: FILTRO DE ZONA HORARIA PERSONALIZADO ---
-def format_to_local_time(utc_dt):
-    """Filtro de Jinja2 para convertir una fecha UTC a la hora local de Bogotá."""
+def format_to_local_time(utc_dt, zona_horaria=None):
+    """Filtro de Jinja2 para convertir una fecha UTC a la hora local del evento activo."""
+    from .services import tiempo
+    from .services.config_cache import config_cache
+
     if not utc_dt:
         return ""
-    # Define las zonas horarias
-    utc_zone = pytz.timezone('UTC')
-    local_zone = pytz.timezone('America/Bogota')
-    
-    # Convierte la fecha naive de la DB a una fecha "aware" en UTC
-    aware_utc_dt = utc_zone.localize(utc_dt)
-    
-    # Convierte a la zona horaria local
-    local_dt = aware_utc_dt.astimezone(local_zone)
-    
-    # Formatea la fecha para mostrarla
-    return local_dt.strftime('%Y-%m-%d %I:%M:%S %p') # Formato 12 horas con AM/PM
+    # Las zonas se crean una sola vez por proceso (services/tiempo.py)
+    return tiempo.formatear(utc_dt, zona_horaria or tiempo.zona_del_evento(config_cache.obtener()))
 # --- FIN: FILTRO ---
 
 
@@ -49,9 +40,18 @@ def create_app():
 
     # Cadena de conexión para MySQL con PyMySQL
     # El formato es: 'mysql+pymysql://<user>:<password>@<host>/<dbname>?charset=utf8mb4'
-    app.config['SQLALCHEMY_DATABASE_URI'] = f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}?charset=utf8mb4"
+    # DATABASE_URL permite usar otra base completa (p. ej. SQLite en los benchmarks)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL') or (
+        f"mysql+pymysql://{db_user}:{db_password}@{db_host}/{db_name}?charset=utf8mb4"
+    )
     
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Costo de bcrypt para las contraseñas nuevas; los hashes con otro costo se
+    # rehacen al iniciar sesión (ver routes/auth.py)
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    # Pool de conexiones configurable por entorno (DB_POOL_SIZE, DB_POOL_RECYCLE, ...)
+    from .services.salud import opciones_motor
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones_motor(app.config['SQLALCHEMY_DATABASE_URI'], os.environ)
     # Configuración de carpetas de subida
     base_upload_path = os.path.join(app.root_path, 'static/uploads')
     app.config['UPLOAD_FOLDER'] = base_upload_path
@@ -60,17 +60,30 @@ def create_app():
     app.config['PAIS_LOGOS_FOLDER'] = os.path.join(base_upload_path, 'iconos_bandera')
     app.config['INSTITUCION_LOGOS_FOLDER'] = os.path.join(base_upload_path, 'logos_institucion')
     app.config['EVENTO_LOGO_FOLDER'] = os.path.join(base_upload_path, 'logos_evento')
+    app.config['QR_CACHE_FOLDER'] = os.path.join(base_upload_path, 'qr_cache')
+    # Miniaturas JPEG/WebP de las fotos de participantes (ver services/fotos.py)
+    app.config['PHOTO_THUMBS_FOLDER'] = os.path.join(base_upload_path, 'fotos', 'miniaturas')
     # Crear carpetas si no existen
-    for folder in ['fotos', 'logos_committe', 'iconos_bandera', 'logos_institucion', 'logos_evento']:
+    for folder in ['fotos', 'fotos/miniaturas', 'logos_committe', 'iconos_bandera', 'logos_institucion', 'logos_evento', 'qr_cache']:
         os.makedirs(os.path.join(base_upload_path, folder), exist_ok=True)
 
 
+    # Carpeta para archivos generados en segundo plano (ZIP de códigos QR)
+    app.config['EXPORTS_FOLDER'] = os.path.join(app.instance_path, 'exportaciones')
+    app.config['QR_WORKERS'] = int(os.environ.get('QR_WORKERS', os.cpu_count() or 1))
+    # Con QR_REQUIRE_SIGNED=1 el escáner solo acepta el token compacto firmado (ni JSON ni ids sueltos)
+    app.config['QR_REQUIRE_SIGNED'] = os.environ.get('QR_REQUIRE_SIGNED', '0') not in ('0', 'false', 'False')
+    # Segundos entre refrescos incrementales del índice de participantes del escáner
+    app.config['PARTICIPANT_INDEX_REFRESH'] = float(os.environ.get('PARTICIPANT_INDEX_REFRESH', 5))
+
     # Configuración de carpetas
     app.config['UPLOAD_FOLDER'] = os.path.join(app.root_path, 'static/uploads')
     app.config['PHOTOS_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'fotos')
 
      # --- REGISTRAR EL FILTRO EN LA APP ---
     app.jinja_env.filters['to_local_time'] = format_to_local_time
+    from .services.fotos import nombre_derivada
+    app.jinja_env.filters['miniatura'] = nombre_derivada
 
     # Crear carpetas si no existen
     for folder in ['uploads', 'fotos', 'logos_committe', 'logos_institucion', 'logos_evento', 'iconos_bandera']:
@@ -81,23 +94,48 @@ def create_app():
     bcrypt.init_app(app)
     login_manager.init_app(app)
 
+    from .services.config_cache import config_cache
+    config_cache.init_app(app)
+    from .services.eventos import canal_eventos
+    canal_eventos.init_app(app)
+    from .services.consultas import contador_consultas
+    contador_consultas.init_app(app)
+    from .services.metricas import metricas
+    metricas.init_app(app)
+    from .services.usuarios_cache import usuarios_cache
+    usuarios_cache.init_app(app)
+    from .services.activos import activos
+    activos.init_app(app)
+    from .services.indice_participantes import indice_participantes
+    indice_participantes.init_app(app)
+    from .services.idempotencia import resultados_recientes
+    resultados_recientes.init_app(app)
+
     # Registrar Blueprints (rutas)
     from .routes.auth import auth_bp
     from .routes.admin import admin_bp
     from .routes.operador import operador_bp
+    from .routes.salud import salud_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp, url_prefix='/admin')
     app.register_blueprint(operador_bp, url_prefix='/operador')
+    app.register_blueprint(salud_bp)
 
     # Registrar comando para inicializar la BD
-    from .utils import init_db_command
+    from .utils import (init_db_command, upgrade_db_command, rebuild_counters_command, archive_event_command,
+                        generate_thumbnails_command, build_assets_command, bulk_participants_command)
     app.cli.add_command(init_db_command)
-
-    # Contexto para que el modelo User esté disponible
-    from .models.models import User
+    app.cli.add_command(upgrade_db_command)
+    app.cli.add_command(rebuild_counters_command)
+    app.cli.add_command(archive_event_command)
+    app.cli.add_command(generate_thumbnails_command)
+    app.cli.add_command(build_assets_command)
+    app.cli.add_command(bulk_participants_command)
+
+    # El usuario de la sesión se lee de la caché por proceso (sin consulta en cada petición)
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return usuarios_cache.obtener(int(user_id))
 
     return app
\ No newline at end of file
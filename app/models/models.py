@@ -9,10 +9,29 @@ class User(db.Model, UserMixin):
     role = db.Column(db.String(20), nullable=False, default='operador') # roles: 'admin', 'operador'
 
 class Participante(db.Model):
+    __table_args__ = (
+        # Listados, búsquedas e importaciones trabajan siempre sobre un evento
+        db.Index('ix_participante_evento_nombre', 'evento_id', 'nombre_participante'),
+        # Refresco incremental del índice en memoria de los escáneres (services/indice_participantes.py)
+        db.Index('ix_participante_actualizado', 'actualizado_at'),
+        # Reimportación: emparejamiento por el id de la planilla de los organizadores
+        db.Index('ix_participante_evento_externo', 'evento_id', 'id_externo'),
+    )
+
     id_participante = db.Column(db.Integer, primary_key=True)
-    nombre_participante = db.Column(db.String(150), nullable=False)
+    nombre_participante = db.Column(db.String(150), nullable=False, index=True)
     saldo_merienda = db.Column(db.Integer, nullable=False)
     foto_participante = db.Column(db.String(100), nullable=True)
+    # Fecha (UTC) de la última merienda entregada; se mantiene en cada redención
+    # para que el cooldown no tenga que consultar el historial de Registro.
+    ultimo_registro_at = db.Column(db.DateTime, nullable=True)
+    # Evento (fila de Configuracion) al que pertenece el participante
+    evento_id = db.Column(db.Integer, db.ForeignKey('configuracion.id_config'), nullable=True)
+    # Identificador del participante en la planilla de los organizadores (columna opcional
+    # `id_externo` de la hoja Estudiantes); si falta se empareja por nombre e institución
+    id_externo = db.Column(db.String(64), nullable=True)
+    # Fecha (UTC) del último cambio de la fila, incluidas las redenciones
+    actualizado_at = db.Column(db.DateTime, nullable=True, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     committe_id = db.Column(db.Integer, db.ForeignKey('committe.id_committe'), nullable=False)
     pais_id = db.Column(db.Integer, db.ForeignKey('pais.id_pais'), nullable=False)
@@ -45,13 +64,95 @@ class Configuracion(db.Model):
     fechas_evento = db.Column(db.String(150), nullable=False)
     meriendas_totales = db.Column(db.Integer, default=6, nullable=False)
     cooldown_minutos = db.Column(db.Integer, default=60, nullable=False)
+    # Contenido de los QR generados: 'json' (datos completos) o 'compacto' (token firmado)
+    formato_qr = db.Column(db.String(10), default='json', server_default='json', nullable=False)
+    # Cada fila es un evento; el escáner, el dashboard y los listados usan el activo
+    activo = db.Column(db.Boolean, default=False, server_default='0', nullable=False)
+    # Fecha (UTC) en que sus participantes y registros se movieron a las tablas de archivo
+    archivado_at = db.Column(db.DateTime, nullable=True)
+    # Zona horaria IANA del evento: las fechas se guardan en UTC y se muestran y agrupan en esta zona
+    zona_horaria = db.Column(db.String(64), default='America/Bogota', server_default='America/Bogota', nullable=False)
 
 class Registro(db.Model):
+    __table_args__ = (
+        db.Index('ix_registro_participante_fecha', 'id_participante', 'fecha_hora'),
+        db.Index('ix_registro_evento_fecha', 'evento_id', 'fecha_hora'),
+    )
+
     id_registro = db.Column(db.Integer, primary_key=True)
     fecha_hora = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    evento_id = db.Column(db.Integer, db.ForeignKey('configuracion.id_config'), nullable=True)
 
     id_participante = db.Column(db.Integer, db.ForeignKey('participante.id_participante'), nullable=False)
     operador_responsable_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
     participante = db.relationship('Participante', backref=db.backref('registros', lazy=True))
-    operador = db.relationship('User', backref=db.backref('registros_realizados', lazy=True))
\ No newline at end of file
+    operador = db.relationship('User', backref=db.backref('registros_realizados', lazy=True))
+
+# --- Archivo de eventos terminados ---
+# Al archivar un evento sus participantes y registros salen de las tablas en uso y
+# se copian aquí con los nombres ya resueltos (sin claves foráneas), de modo que los
+# reportes históricos no dependan de comités, instituciones u operadores que se
+# borren después.
+
+class ParticipanteArchivado(db.Model):
+    __table_args__ = (
+        db.Index('ix_participante_archivado_evento_nombre', 'evento_id', 'nombre_participante'),
+    )
+
+    id_participante = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    evento_id = db.Column(db.Integer, nullable=False)
+    nombre_participante = db.Column(db.String(150), nullable=False)
+    saldo_merienda = db.Column(db.Integer, nullable=False)
+    foto_participante = db.Column(db.String(100), nullable=True)
+    committe_id = db.Column(db.Integer, nullable=False)
+    nombre_committe = db.Column(db.String(100), nullable=False)
+    pais_id = db.Column(db.Integer, nullable=False)
+    nombre_pais = db.Column(db.String(100), nullable=False)
+    institucion_id = db.Column(db.Integer, nullable=False)
+    nombre_institucion = db.Column(db.String(150), nullable=False)
+
+class RegistroArchivado(db.Model):
+    __table_args__ = (
+        db.Index('ix_registro_archivado_evento_fecha', 'evento_id', 'fecha_hora'),
+    )
+
+    id_registro = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    evento_id = db.Column(db.Integer, nullable=False)
+    fecha_hora = db.Column(db.DateTime, nullable=False)
+    id_participante = db.Column(db.Integer, nullable=False)
+    nombre_participante = db.Column(db.String(150), nullable=False)
+    # Saldo del participante al archivar (el "saldo actual" del reporte)
+    saldo_merienda = db.Column(db.Integer, nullable=False)
+    committe_id = db.Column(db.Integer, nullable=False)
+    nombre_committe = db.Column(db.String(100), nullable=False)
+    institucion_id = db.Column(db.Integer, nullable=False)
+    nombre_institucion = db.Column(db.String(150), nullable=False)
+    operador_id = db.Column(db.Integer, nullable=False)
+    username = db.Column(db.String(80), nullable=False)
+
+class ContadorAgregado(db.Model):
+    # Contadores precalculados del dashboard (solo del evento activo). Se actualizan dentro de la misma
+    # transacción que cada entrega (services/agregados.py), así que el dashboard
+    # los lee sin recorrer Registro.
+    # dimension: 'total', 'dia', 'hora', 'committe', 'institucion', 'operador' o 'participantes'
+    # clave: puede llevar el sufijo '#<fragmento>'; el valor de un contador es la suma de sus fragmentos
+    dimension = db.Column(db.String(20), primary_key=True)
+    clave = db.Column(db.String(40), primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+
+class OperacionMasiva(db.Model):
+    # Auditoría de las operaciones masivas sobre participantes (services/operaciones_masivas.py):
+    # quién aplicó qué cambio, con qué filtros y a cuántas filas
+    id_operacion = db.Column(db.Integer, primary_key=True)
+    fecha_hora = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    evento_id = db.Column(db.Integer, db.ForeignKey('configuracion.id_config'), nullable=False, index=True)
+    # Usuario que la aplicó (copiado, para que la auditoría sobreviva a su eliminación)
+    # o 'cli' si se hizo desde la línea de comandos
+    usuario = db.Column(db.String(80), nullable=False)
+    # 'restablecer', 'recargar' o 'reasignar'
+    tipo = db.Column(db.String(20), nullable=False)
+    # Filtros y parámetros en JSON, tal como se aplicaron
+    filtros = db.Column(db.Text, nullable=False)
+    parametros = db.Column(db.Text, nullable=False)
+    afectados = db.Column(db.Integer, nullable=False)
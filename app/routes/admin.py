@@ -3,19 +3,32 @@ from flask_login import login_required, current_user
 from functools import wraps
 from werkzeug.utils import secure_filename
 import os
-import pandas as pd
+import re
+import tempfile
+import uuid
+import zipfile
 import pycountry
 
 from app import db
-from app.models.models import Participante, Committe, Pais, InstitucionEducativa, Configuracion, Registro, User
-
-from app.utils import generate_qr_code_img
-import io
-import zipfile
-from flask import send_file
+from app.models.models import Participante, ParticipanteArchivado, Committe, Pais, InstitucionEducativa, Configuracion, Registro, User
+
+from app.utils import datos_qr_participantes
+from app.services import (
+    agregados, exportacion, fotos, gestion_eventos, importacion, operaciones_masivas, qr_cache, qr_token, tareas,
+    tiempo,
+)
+from app.services import reportes as reportes_svc
+from app.services.config_cache import config_cache
+from app.services.consultas import presupuesto_consultas
+from app.services.eventos import canal_eventos
+from app.services.indice_participantes import indice_participantes
+from app.services.metricas import metricas
+from app.services.usuarios_cache import usuarios_cache
+from flask import send_file, jsonify, abort, Response, stream_with_context
 from app import bcrypt
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, raiseload
 
-from datetime import datetime, time
 
 # Creación del Blueprint para las rutas de administración
 admin_bp = Blueprint('admin', __name__)
@@ -51,29 +64,66 @@ def save_file(file, subfolder):
     file.save(os.path.join(upload_path, filename))
     return filename
 
+def _evento_activo_id():
+    """Id del evento activo (o None si aún no hay configuración)."""
+    config = config_cache.obtener()
+    return config.id_config if config else None
+
+def _resumen_dashboard():
+    """Contadores del dashboard, con el día de hoy en la zona horaria del evento activo."""
+    return agregados.resumen(db.session, zona_horaria=tiempo.zona_del_evento(config_cache.obtener()))
+
+def _guardar_foto_subida(foto_file, participante_id):
+    """Guarda la foto subida de un participante y genera sus miniaturas; devuelve el nombre del archivo."""
+    _, extension = os.path.splitext(secure_filename(foto_file.filename))
+    return fotos.guardar_foto(
+        foto_file.read(), extension, participante_id,
+        current_app.config['PHOTOS_FOLDER'], current_app.config['PHOTO_THUMBS_FOLDER'],
+    )
+
+def _eliminar_foto(nombre):
+    """Borra la foto de un participante y sus miniaturas."""
+    fotos.eliminar_foto(nombre, current_app.config['PHOTOS_FOLDER'], current_app.config['PHOTO_THUMBS_FOLDER'])
+
 # --- Rutas del Panel de Administración ---
 
 @admin_bp.route('/')
 @login_required
 # @admin_required
+@presupuesto_consultas(6)
 def dashboard():
-    """Página principal del dashboard del administrador."""
-    total_participantes = Participante.query.count()
-    meriendas_entregadas = Registro.query.count()
-    config = Configuracion.query.first()
-    return render_template('admin/dashboard.html', total_participantes=total_participantes, meriendas_entregadas=meriendas_entregadas, config=config)
+    """Página principal del dashboard del administrador (lee los contadores precalculados)."""
+    return render_template('admin/dashboard.html', resumen=_resumen_dashboard())
+
+@admin_bp.route('/api/dashboard')
+@login_required
+@presupuesto_consultas(6)
+def api_dashboard():
+    """Contadores del dashboard en JSON; la página los consulta periódicamente."""
+    return jsonify(_resumen_dashboard())
 
 @admin_bp.route('/configuracion', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def configuracion():
-    """Página para configurar los detalles del evento."""
-    config = Configuracion.query.first()
+    """Página para configurar los detalles del evento activo y gestionar los eventos."""
+    config = gestion_eventos.evento_activo(db.session)
     if request.method == 'POST':
         config.nombre_evento = request.form.get('nombre_evento')
         config.fechas_evento = request.form.get('fechas_evento')
         config.meriendas_totales = int(request.form.get('meriendas_totales'))
         config.cooldown_minutos = int(request.form.get('cooldown_minutos'))
+        if request.form.get('formato_qr') in (qr_token.FORMATO_JSON, qr_token.FORMATO_COMPACTO):
+            config.formato_qr = request.form.get('formato_qr')
+        zona_horaria = (request.form.get('zona_horaria') or '').strip() or config.zona_horaria
+        try:
+            tiempo.zona(zona_horaria)
+        except tiempo.ZonaInvalida as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+            return redirect(url_for('admin.configuracion'))
+        cambio_zona = zona_horaria != config.zona_horaria
+        config.zona_horaria = zona_horaria
         
         if 'logo_evento' in request.files:
             logo_file = request.files['logo_evento']
@@ -82,23 +132,91 @@ def configuracion():
                 config.logo_evento = logo_filename
                 
         db.session.commit()
+        if cambio_zona:
+            # Los contadores por día y hora del dashboard se agrupan en la zona del evento
+            agregados.reconstruir(db.session, config.id_config)
+        config_cache.invalidar()
         flash('Configuración guardada con éxito.', 'success')
+        if request.form.get('restablecer_saldos'):
+            afectados = operaciones_masivas.aplicar(
+                db.session, config.id_config, operaciones_masivas.RESTABLECER,
+                operaciones_masivas.filtro(todos=True), current_user.username, cantidad=config.meriendas_totales,
+            )
+            indice_participantes.invalidar()
+            flash(f'Saldo restablecido a {config.meriendas_totales} para {afectados} participantes.', 'success')
+        return redirect(url_for('admin.configuracion'))
+    return render_template('admin/configuracion.html', config=config,
+                           eventos_mun=gestion_eventos.listar_eventos(db.session),
+                           zonas_horarias=tiempo.zonas_disponibles())
+
+# --- Rutas para la Gestión de Eventos ---
+
+@admin_bp.route('/evento/add', methods=['POST'])
+@login_required
+@admin_required
+def add_evento():
+    """Crea un evento nuevo con los parámetros del activo (sin activarlo)."""
+    actual = config_cache.obtener()
+    gestion_eventos.crear_evento(
+        db.session,
+        request.form.get('nombre_evento'),
+        request.form.get('fechas_evento'),
+        actual.meriendas_totales if actual else 6,
+        actual.cooldown_minutos if actual else 60,
+        actual.formato_qr if actual else qr_token.FORMATO_JSON,
+        actual.logo_evento if actual else None,
+        tiempo.zona_del_evento(actual),
+    )
+    flash('Evento creado. Actívelo para empezar a inscribir participantes y escanear.', 'success')
+    return redirect(url_for('admin.configuracion'))
+
+@admin_bp.route('/evento/<int:id>/activar', methods=['POST'])
+@login_required
+@admin_required
+def activar_evento(id):
+    """Cambia el evento activo: escáner, dashboard y listados pasan a usar el nuevo."""
+    try:
+        gestion_eventos.activar_evento(db.session, id)
+    except gestion_eventos.OperacionEventoInvalida as e:
+        flash(str(e), 'danger')
         return redirect(url_for('admin.configuracion'))
-    return render_template('admin/configuracion.html', config=config)
+    config_cache.invalidar()
+    flash('Evento activado.', 'success')
+    return redirect(url_for('admin.configuracion'))
+
+@admin_bp.route('/evento/<int:id>/archivar', methods=['POST'])
+@login_required
+@admin_required
+def archivar_evento(id):
+    """Mueve los datos de un evento terminado a las tablas de archivo."""
+    try:
+        participantes, registros = gestion_eventos.archivar_evento(db.session, id)
+    except gestion_eventos.OperacionEventoInvalida as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.configuracion'))
+    flash(f'Evento archivado: {participantes} participantes y {registros} registros. '
+          'Sus reportes siguen disponibles en Reportes.', 'success')
+    return redirect(url_for('admin.configuracion'))
 
 # --- Rutas CRUD para Participantes ---
 
 @admin_bp.route('/participantes')
 @login_required
 @admin_required
+@presupuesto_consultas(6)
 def participantes():
     """Muestra y gestiona los participantes."""
-    lista_participantes = Participante.query.all()
+    # Comité y país se traen en la misma consulta; cualquier otra relación que la
+    # plantilla intente cargar fila por fila lanza un error en lugar de un N+1.
+    lista_participantes = Participante.query.filter_by(evento_id=_evento_activo_id()).options(
+        joinedload(Participante.committe),
+        joinedload(Participante.pais),
+        raiseload('*'),
+    ).all()
     committes = Committe.query.all()
     paises = Pais.query.all()
     instituciones = InstitucionEducativa.query.all()
-    config = Configuracion.query.first()
-    return render_template('admin/participantes.html', participantes=lista_participantes, committes=committes, paises=paises, instituciones=instituciones, config=config)
+    return render_template('admin/participantes.html', participantes=lista_participantes, committes=committes, paises=paises, instituciones=instituciones)
 
 @admin_bp.route('/participante/add', methods=['POST'])
 @login_required
@@ -109,35 +227,31 @@ def add_participante():
     committe_id = request.form.get('committe_id')
     pais_id = request.form.get('pais_id')
     institucion_id = request.form.get('institucion_id')
-    config = Configuracion.query.first()
+    config = config_cache.obtener()
 
     nuevo_participante = Participante(
         nombre_participante=nombre,
         committe_id=committe_id,
         pais_id=pais_id,
         institucion_id=institucion_id,
-        saldo_merienda=config.meriendas_totales if config else 6
+        saldo_merienda=config.meriendas_totales if config else 6,
+        evento_id=config.id_config if config else None,
     )
     
+    db.session.add(nuevo_participante)
     foto_file = request.files.get('foto_participante')
     if foto_file and foto_file.filename != '':
-        # Guardar primero para obtener el ID
-        db.session.add(nuevo_participante)
-        db.session.flush()  # Asigna el ID sin hacer commit
-        
-        # Renombrar la foto con el ID del participante
-        _, file_extension = os.path.splitext(secure_filename(foto_file.filename))
-        new_filename = f"{nuevo_participante.id_participante}{file_extension}"
-        
-        upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'fotos')
-        os.makedirs(upload_path, exist_ok=True)
-        foto_file.save(os.path.join(upload_path, new_filename))
-        
-        nuevo_participante.foto_participante = new_filename
-    else:
-        db.session.add(nuevo_participante)
-        
+        db.session.flush()  # Asigna el ID sin hacer commit, para nombrar la foto
+        try:
+            nuevo_participante.foto_participante = _guardar_foto_subida(foto_file, nuevo_participante.id_participante)
+        except fotos.FotoInvalida as e:
+            db.session.rollback()
+            flash(f'No se pudo guardar la foto: {e}', 'danger')
+            return redirect(url_for('admin.participantes'))
+
+    agregados.ajustar_participantes(db.session, 1, 1 if nuevo_participante.saldo_merienda > 0 else 0)
     db.session.commit()
+    indice_participantes.invalidar()
     flash('Participante añadido con éxito.', 'success')
     return redirect(url_for('admin.participantes'))
 
@@ -147,23 +261,129 @@ def add_participante():
 def delete_participante(id):
     """Elimina un participante de la base de datos."""
     participante = Participante.query.get_or_404(id)
-    # Opcional: eliminar también el archivo de foto del servidor
+    # Eliminar también la foto del servidor y sus miniaturas
     if participante.foto_participante:
-        try:
-            os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], 'fotos', participante.foto_participante))
-        except OSError as e:
-            print(f"Error eliminando archivo de foto: {e}")
+        _eliminar_foto(participante.foto_participante)
 
+    agregados.ajustar_participantes(db.session, -1, -1 if participante.saldo_merienda > 0 else 0)
     db.session.delete(participante)
     db.session.commit()
+    indice_participantes.invalidar()
     flash('Participante eliminado correctamente.', 'success')
     return redirect(url_for('admin.participantes'))
 
+@admin_bp.route('/participantes/masivo', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def operaciones_masivas_participantes():
+    """Restablece o recarga saldos y reasigna comité o institución de un grupo de participantes."""
+    config = config_cache.obtener()
+    evento_id = config.id_config if config else None
+    if request.method == 'POST':
+        form = request.form
+        try:
+            filtro = operaciones_masivas.filtro(
+                form.get('committe_id'), form.get('institucion_id'), form.get('pais_id'), form.get('ids', ''),
+                todos=bool(form.get('todos')),
+            )
+            afectados = operaciones_masivas.aplicar(
+                db.session, evento_id, form.get('tipo'), filtro, current_user.username,
+                cantidad=form.get('cantidad'),
+                committe_id=form.get('committe_destino_id'),
+                institucion_id=form.get('institucion_destino_id'),
+            )
+        except operaciones_masivas.OperacionInvalida as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+            return redirect(url_for('admin.operaciones_masivas_participantes'))
+        indice_participantes.invalidar()
+        flash(f'Operación aplicada a {afectados} participantes.', 'success')
+        return redirect(url_for('admin.operaciones_masivas_participantes'))
+
+    return render_template(
+        'admin/operaciones_masivas.html',
+        config=config,
+        committes=Committe.query.order_by(Committe.nombre_committe).all(),
+        instituciones=InstitucionEducativa.query.order_by(InstitucionEducativa.nombre_institucion).all(),
+        paises=Pais.query.order_by(Pais.nombre_pais).all(),
+        operaciones=operaciones_masivas.recientes(db.session, evento_id),
+    )
+
+@admin_bp.route('/participantes/fotos/<nombre>')
+@login_required
+@admin_required
+def foto_miniatura(nombre):
+    """
+    Sirve una miniatura (JPEG o WebP) de la foto de un participante.
+
+    El nombre de las fotos incluye un hash de su contenido, así que la respuesta se
+    cachea en el navegador por un año. Si la miniatura aún no existe (fotos subidas
+    antes de que se generaran derivadas) se genera en este momento.
+    """
+    carpeta = current_app.config['PHOTO_THUMBS_FOLDER']
+    if nombre != secure_filename(nombre):
+        abort(404)
+    if not os.path.exists(os.path.join(carpeta, nombre)):
+        original = fotos.original_de_derivada(nombre, current_app.config['PHOTOS_FOLDER'])
+        if not original:
+            abort(404)
+        try:
+            fotos.generar_derivadas(original, carpeta)
+        except fotos.FotoInvalida:
+            abort(404)
+    respuesta = send_from_directory(carpeta, nombre, max_age=fotos.MAX_AGE_DERIVADAS)
+    respuesta.cache_control.immutable = True
+    return respuesta
+
+@admin_bp.route('/participantes/importar_fotos', methods=['POST'])
+@login_required
+@admin_required
+def importar_fotos():
+    """
+    Importa un ZIP con fotos nombradas con el ID del participante (`15.jpg`).
+
+    Las fotos se procesan en segundo plano y en paralelo; la página de progreso
+    muestra al final las importadas y las omitidas.
+    """
+    archivo = request.files.get('archivo_zip')
+    if not archivo or not archivo.filename.lower().endswith('.zip'):
+        flash('Seleccione un archivo ZIP con las fotos.', 'danger')
+        return redirect(url_for('admin.participantes'))
+
+    carpeta = current_app.config['EXPORTS_FOLDER']
+    os.makedirs(carpeta, exist_ok=True)
+    descriptor, ruta_zip = tempfile.mkstemp(suffix='.zip', dir=carpeta)
+    with os.fdopen(descriptor, 'wb') as destino:
+        archivo.save(destino)
+
+    ids_validos = set(db.session.scalars(
+        select(Participante.id_participante).where(Participante.evento_id == _evento_activo_id())
+    ))
+    try:
+        asignaciones, omitidas = fotos.asignar_fotos_zip(ruta_zip, ids_validos)
+    except zipfile.BadZipFile:
+        os.remove(ruta_zip)
+        flash('El archivo no es un ZIP válido.', 'danger')
+        return redirect(url_for('admin.participantes'))
+
+    tarea_id = tareas.iniciar_importacion_fotos(
+        current_app._get_current_object(),
+        ruta_zip,
+        asignaciones,
+        omitidas,
+        carpeta,
+        current_app.config['PHOTOS_FOLDER'],
+        current_app.config['PHOTO_THUMBS_FOLDER'],
+        current_app.config['QR_WORKERS'],
+    )
+    return redirect(url_for('admin.tarea_qrs', tarea_id=tarea_id))
+
 # --- Rutas CRUD para Committes ---
 
 @admin_bp.route('/committes', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(3)
 def committes():
     """Muestra y gestiona los comités."""
     if request.method == 'POST':
@@ -182,8 +402,7 @@ def committes():
         return redirect(url_for('admin.committes'))
 
     lista_committes = Committe.query.all()
-    config = Configuracion.query.first()
-    return render_template('admin/committes.html', committes=lista_committes, config=config)
+    return render_template('admin/committes.html', committes=lista_committes)
 
 @admin_bp.route('/committe/delete/<int:id>', methods=['POST'])
 @login_required
@@ -201,6 +420,7 @@ def delete_committe(id):
 @admin_bp.route('/paises', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(3)
 def paises():
     """Muestra y gestiona los países, generando el código de bandera automáticamente."""
     if request.method == 'POST':
@@ -230,8 +450,7 @@ def paises():
         return redirect(url_for('admin.paises'))
 
     lista_paises = Pais.query.all()
-    config = Configuracion.query.first()
-    return render_template('admin/paises.html', paises=lista_paises, config=config)
+    return render_template('admin/paises.html', paises=lista_paises)
 
 # La ruta de eliminar país no necesita cambios
 @admin_bp.route('/pais/delete/<int:id>', methods=['POST'])
@@ -250,6 +469,7 @@ def delete_pais(id):
 @admin_bp.route('/instituciones', methods=['GET', 'POST'])
 @login_required
 @admin_required
+@presupuesto_consultas(3)
 def instituciones():
     """Muestra y gestiona las instituciones."""
     if request.method == 'POST':
@@ -268,8 +488,7 @@ def instituciones():
         return redirect(url_for('admin.instituciones'))
     
     lista_instituciones = InstitucionEducativa.query.all()
-    config = Configuracion.query.first()
-    return render_template('admin/instituciones.html', instituciones=lista_instituciones, config=config)
+    return render_template('admin/instituciones.html', instituciones=lista_instituciones)
 
 @admin_bp.route('/institucion/delete/<int:id>', methods=['POST'])
 @login_required
@@ -295,17 +514,23 @@ def edit_participante(id):
     participante.pais_id = request.form.get('pais_id')
     participante.institucion_id = request.form.get('institucion_id')
     
+    foto_anterior = None
     foto_file = request.files.get('foto_participante')
     if foto_file and foto_file.filename != '':
-        # Si se sube una nueva foto, la guardamos/reemplazamos
-        _, file_extension = os.path.splitext(secure_filename(foto_file.filename))
-        new_filename = f"{participante.id_participante}{file_extension}"
-        
-        upload_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'fotos')
-        foto_file.save(os.path.join(upload_path, new_filename))
-        participante.foto_participante = new_filename
+        # Si se sube una nueva foto, se guarda con un nombre nuevo y se borra la anterior
+        try:
+            nueva_foto = _guardar_foto_subida(foto_file, participante.id_participante)
+        except fotos.FotoInvalida as e:
+            db.session.rollback()
+            flash(f'No se pudo guardar la foto: {e}', 'danger')
+            return redirect(url_for('admin.participantes'))
+        foto_anterior, participante.foto_participante = participante.foto_participante, nueva_foto
 
     db.session.commit()
+    indice_participantes.invalidar()
+    # La foto reemplazada se borra solo cuando el cambio ya está confirmado
+    if foto_anterior and foto_anterior != participante.foto_participante:
+        _eliminar_foto(foto_anterior)
     flash('Participante actualizado con éxito.', 'success')
     return redirect(url_for('admin.participantes'))
 
@@ -348,77 +573,85 @@ def edit_institucion(id):
     return redirect(url_for('admin.instituciones'))
 # --- Rutas para Importación de Datos y Reportes ---
 
+# Libros subidos para una vista previa, a la espera de que se confirme la importación
+_TOKEN_IMPORTACION = re.compile(r'^[0-9a-f]{32}$')
+
+def _ruta_importacion(token):
+    return os.path.join(current_app.config['EXPORTS_FOLDER'], f'importacion-{token}.xlsx')
+
 @admin_bp.route('/importar', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def importar_datos():
-    config = Configuracion.query.first()
+    """
+    Importa el libro Excel. En modo "sincronizar" el libro es la lista completa
+    del evento y solo se aplican las diferencias; con vista previa el libro se
+    guarda hasta que se confirma, sin cambiar la base de datos.
+    """
+    config = config_cache.obtener()
     if request.method == 'POST':
-        file = request.files.get('file')
-        if not file or not file.filename.endswith('.xlsx'):
-            flash('Por favor, suba un archivo Excel (.xlsx) válido.', 'danger')
-            return redirect(request.url)
+        modo = request.form.get('modo', importacion.AGREGAR)
+        if modo not in (importacion.AGREGAR, importacion.SINCRONIZAR):
+            modo = importacion.AGREGAR
+        eliminar_ausentes = bool(request.form.get('eliminar_ausentes'))
+        vista_previa = bool(request.form.get('vista_previa'))
+        token = request.form.get('token') or ''
+
+        if token:
+            # Confirmación de una vista previa: se usa el libro ya subido
+            if not _TOKEN_IMPORTACION.match(token) or not os.path.exists(_ruta_importacion(token)):
+                flash('La vista previa ya no está disponible. Suba el archivo de nuevo.', 'danger')
+                return redirect(url_for('admin.importar_datos'))
+            archivo = _ruta_importacion(token)
+        else:
+            file = request.files.get('file')
+            if not file or not file.filename.endswith('.xlsx'):
+                flash('Por favor, suba un archivo Excel (.xlsx) válido.', 'danger')
+                return redirect(request.url)
+            archivo = file
+            if vista_previa:
+                os.makedirs(current_app.config['EXPORTS_FOLDER'], exist_ok=True)
+                token = uuid.uuid4().hex
+                file.save(_ruta_importacion(token))
+                archivo = _ruta_importacion(token)
 
         try:
-            xls = pd.ExcelFile(file, engine='openpyxl')
-            
-            # Procesar Instituciones y Committes (sin cambios)
-            df_instituciones = pd.read_excel(xls, 'Instituciones')
-            for _, row in df_instituciones.iterrows():
-                if not InstitucionEducativa.query.filter_by(nombre_institucion=row['nombre_institucion']).first():
-                    db.session.add(InstitucionEducativa(nombre_institucion=row['nombre_institucion']))
-
-            df_committes = pd.read_excel(xls, 'Committes')
-            for _, row in df_committes.iterrows():
-                if not Committe.query.filter_by(nombre_committe=row['nombre_committe']).first():
-                    db.session.add(Committe(nombre_committe=row['nombre_committe']))
-
-            # --- CORRECCIÓN AQUÍ: Procesar Países con pycountry ---
-            df_paises = pd.read_excel(xls, 'Paises')
-            for _, row in df_paises.iterrows():
-                nombre_pais = row['nombre_pais'].strip()
-                if not Pais.query.filter_by(nombre_pais=nombre_pais).first():
-                    country_code = None
-                    try:
-                        # Intenta encontrar el código del país
-                        country = pycountry.countries.search_fuzzy(nombre_pais)[0]
-                        country_code = country.alpha_2.lower()
-                    except (LookupError, AttributeError):
-                        # Si no lo encuentra, el código quedará como None
-                        print(f"Advertencia: No se encontró código de bandera para '{nombre_pais}' durante la importación.")
-                    
-                    nuevo_pais = Pais(nombre_pais=nombre_pais, country_code=country_code)
-                    db.session.add(nuevo_pais)
-
-            db.session.commit()
-
-            # Procesar Estudiantes (sin cambios)
-            df_estudiantes = pd.read_excel(xls, 'Estudiantes')
-            # ... (el resto de la función sigue igual) ...
-            for _, row in df_estudiantes.iterrows():
-                institucion = InstitucionEducativa.query.filter_by(nombre_institucion=row['institucion_educativa']).first()
-                pais = Pais.query.filter_by(nombre_pais=row['pais_representado']).first()
-                committe = Committe.query.filter_by(nombre_committe=row['committe']).first()
-
-                if institucion and pais and committe:
-                    nuevo_participante = Participante(
-                        nombre_participante=row['nombre_participante'],
-                        institucion_id=institucion.id_institucion,
-                        pais_id=pais.id_pais,
-                        committe_id=committe.id_committe,
-                        saldo_merienda=config.meriendas_totales if config else 6
-                    )
-                    db.session.add(nuevo_participante)
-
-            db.session.commit()
-            flash('Datos importados con éxito.', 'success')
+            reporte = importacion.importar_libro(
+                archivo, config.meriendas_totales if config else 6, config.id_config if config else None,
+                modo=modo, eliminar_ausentes=eliminar_ausentes, vista_previa=vista_previa,
+            )
         except Exception as e:
-            db.session.rollback()
+            if token:
+                os.remove(_ruta_importacion(token))
             flash(f'Error al importar el archivo: {e}', 'danger')
-        
-        return redirect(url_for('admin.importar_datos'))
-
-    return render_template('admin/importar.html', config=config)
+            return redirect(url_for('admin.importar_datos'))
+
+        if vista_previa:
+            return render_template('admin/importar.html', reporte=reporte, token=token, modo=modo,
+                                   eliminar_ausentes=eliminar_ausentes)
+        if token:
+            os.remove(_ruta_importacion(token))
+        indice_participantes.invalidar()
+        for foto in reporte.fotos_eliminadas:
+            _eliminar_foto(foto)
+
+        if modo == importacion.SINCRONIZAR:
+            flash(
+                f'Datos sincronizados: {reporte.participantes} participantes nuevos, {reporte.actualizados} '
+                f'actualizados, {reporte.eliminados} eliminados y {reporte.sin_cambios} sin cambios.',
+                'success',
+            )
+        else:
+            flash(
+                f'Datos importados con éxito: {reporte.participantes} participantes, '
+                f'{reporte.instituciones} instituciones, {reporte.committes} comités y {reporte.paises} países nuevos.',
+                'success',
+            )
+        if reporte.omitidos:
+            flash(f'{len(reporte.omitidos)} filas fueron omitidas. Revise el detalle abajo.', 'danger')
+        return render_template('admin/importar.html', reporte=reporte)
+
+    return render_template('admin/importar.html')
 
 @admin_bp.route('/descargar_plantilla')
 @login_required
@@ -428,142 +661,332 @@ def descargar_plantilla():
     project_root = os.path.join(current_app.root_path, '..')
     return send_from_directory(directory=project_root, path='plantilla_importacion.xlsx', as_attachment=True)
 
+def _resolver_evento_reporte(filtros):
+    """Fija el evento y la zona horaria del reporte (ver `reportes.resolver_evento`)."""
+    config = config_cache.obtener()
+    return reportes_svc.resolver_evento(
+        db.session, filtros, config.id_config if config else None, tiempo.zona_del_evento(config)
+    )
+
 @admin_bp.route('/reportes')
 @login_required
 # @admin_required
+@presupuesto_consultas(6)
 def reportes():
-    """Muestra un reporte de meriendas con filtros y ordenación."""
-    # --- 1. OBTENER PARÁMETROS DE LA URL ---
-    fecha_str = request.args.get('fecha')
-    participante_id = request.args.get('participante_id')
-    committe_id = request.args.get('committe_id')
-    institucion_id = request.args.get('institucion_id')
-    sort_by = request.args.get('sort_by', 'fecha_hora') # Default: ordenar por fecha
-    order = request.args.get('order', 'desc') # Default: descendente (más nuevos primero)
-
-    # --- 2. CONSTRUIR LA CONSULTA BASE ---
-    query = Registro.query.join(Participante).join(User).join(Committe).join(InstitucionEducativa)
-
-    # --- 3. APLICAR FILTROS DINÁMICAMENTE ---
-    if fecha_str:
-        try:
-            fecha_obj = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-            start_of_day = datetime.combine(fecha_obj, time.min)
-            end_of_day = datetime.combine(fecha_obj, time.max)
-            query = query.filter(Registro.fecha_hora.between(start_of_day, end_of_day))
-        except ValueError:
-            flash('Formato de fecha inválido.', 'danger')
-    
-    if participante_id:
-        query = query.filter(Registro.id_participante == participante_id)
-    
-    if committe_id:
-        query = query.filter(Participante.committe_id == committe_id)
-        
-    if institucion_id:
-        query = query.filter(Participante.institucion_id == institucion_id)
-
-    # --- 4. APLICAR ORDENACIÓN DINÁMICAMENTE ---
-    sort_columns = {
-        'fecha_hora': Registro.fecha_hora,
-        'participante': Participante.nombre_participante,
-        'saldo': Participante.saldo_merienda,
-        'committe': Committe.nombre_committe,
-        'institucion': InstitucionEducativa.nombre_institucion,
-        'operador': User.username
-    }
-    
-    sort_column = sort_columns.get(sort_by, Registro.fecha_hora)
-    
-    if order == 'asc':
-        query = query.order_by(sort_column.asc())
-    else:
-        query = query.order_by(sort_column.desc())
+    """Muestra un reporte de meriendas con filtros, ordenación y paginación por cursor."""
+    filtros = reportes_svc.filtros_desde_args(request.args)
+    pagina = {'registros': [], 'siguiente': None, 'anterior': None, 'por_pagina': reportes_svc.POR_PAGINA}
+    try:
+        _resolver_evento_reporte(filtros)
+        pagina = reportes_svc.paginar(
+            db.session,
+            reportes_svc.consulta_reporte(filtros),
+            filtros,
+            cursor=request.args.get('cursor'),
+            por_pagina=request.args.get('por_pagina', type=int),
+        )
+    except reportes_svc.FiltroInvalido as e:
+        flash(str(e), 'danger')
+
+    # El filtro de participante se resuelve con búsqueda; solo se carga el nombre del seleccionado
+    participante_nombre = None
+    if filtros['participante_id']:
+        modelo = ParticipanteArchivado if filtros.get('archivado') else Participante
+        participante = db.session.get(modelo, filtros['participante_id'])
+        participante_nombre = participante.nombre_participante if participante else None
 
-    # --- 5. EJECUTAR LA CONSULTA Y PREPARAR DATOS PARA LA PLANTILLA ---
-    registros = query.all()
-    
-    # Obtener datos para los menús desplegables del filtro
-    participantes = Participante.query.order_by(Participante.nombre_participante).all()
     committes = Committe.query.order_by(Committe.nombre_committe).all()
     instituciones = InstitucionEducativa.query.order_by(InstitucionEducativa.nombre_institucion).all()
-    config = Configuracion.query.first()
+    eventos_mun = gestion_eventos.listar_eventos(db.session)
 
     return render_template(
         'admin/reportes.html', 
-        registros=registros, 
-        config=config,
+        registros=pagina['registros'], 
+        # Fechas de la página ya convertidas a la hora local del evento, en una sola operación
+        fechas_locales=tiempo.formatear_lote(
+            [r.fecha_hora for r in pagina['registros']], filtros.get('zona', tiempo.ZONA_PREDETERMINADA)
+        ),
+        siguiente=pagina['siguiente'],
+        anterior=pagina['anterior'],
+        por_pagina=pagina['por_pagina'],
         # Pasar los datos para los filtros
-        participantes=participantes,
+        participante_nombre=participante_nombre,
         committes=committes,
         instituciones=instituciones,
+        eventos_mun=eventos_mun,
         # Pasar los valores actuales de los filtros para mantener el estado del formulario
-        fecha=fecha_str,
-        participante_id=participante_id,
-        committe_id=committe_id,
-        institucion_id=institucion_id,
+        evento_id=str(filtros['evento']) if filtros.get('evento') is not None else filtros['evento_id'],
+        fecha=filtros['fecha'],
+        participante_id=filtros['participante_id'],
+        committe_id=filtros['committe_id'],
+        institucion_id=filtros['institucion_id'],
         # Pasar los valores de ordenación para construir los enlaces de las columnas
-        sort_by=sort_by,
-        order=order
+        sort_by=filtros['sort_by'],
+        order=filtros['order']
+    )
+
+@admin_bp.route('/api/reportes')
+@login_required
+# Usuario, configuración, página y, si se pide un evento que no es el activo, su fila
+@presupuesto_consultas(4)
+def api_reportes():
+    """Versión JSON del reporte: mismos filtros, ordenación y cursores que la página."""
+    filtros = reportes_svc.filtros_desde_args(request.args)
+    try:
+        _resolver_evento_reporte(filtros)
+        pagina = reportes_svc.paginar(
+            db.session,
+            reportes_svc.consulta_reporte(filtros),
+            filtros,
+            cursor=request.args.get('cursor'),
+            por_pagina=request.args.get('por_pagina', type=int),
+        )
+    except reportes_svc.FiltroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    fechas_locales = tiempo.formatear_lote([r.fecha_hora for r in pagina['registros']], filtros['zona'])
+    return jsonify({
+        'registros': [
+            {
+                'id_registro': r.id_registro,
+                'fecha_hora': r.fecha_hora.isoformat(),
+                'fecha_hora_local': fecha_local,
+                'id_participante': r.id_participante,
+                'participante': r.nombre_participante,
+                'saldo': r.saldo_merienda,
+                'committe': r.nombre_committe,
+                'institucion': r.nombre_institucion,
+                'operador': r.username,
+            }
+            for r, fecha_local in zip(pagina['registros'], fechas_locales)
+        ],
+        'siguiente': pagina['siguiente'],
+        'anterior': pagina['anterior'],
+        'por_pagina': pagina['por_pagina'],
+    })
+
+FORMATOS_EXPORTACION = {
+    'csv': (exportacion.generar_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (exportacion.generar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+@admin_bp.route('/reportes/exportar/<formato>')
+@login_required
+def exportar_reportes(formato):
+    """
+    Descarga el reporte completo (todas las páginas) con los filtros y el orden actuales.
+
+    La respuesta se envía en streaming a medida que se leen las filas, sin cargar
+    el reporte completo en memoria.
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        abort(404)
+    filtros = reportes_svc.filtros_desde_args(request.args)
+    try:
+        # Valida los filtros antes de empezar a enviar la respuesta
+        _resolver_evento_reporte(filtros)
+        reportes_svc.consulta_reporte(filtros)
+    except reportes_svc.FiltroInvalido as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.reportes'))
+
+    generar, mimetype = FORMATOS_EXPORTACION[formato]
+    nombre = f"reporte_meriendas_{filtros['fecha'] or 'completo'}.{formato}"
+    return Response(
+        stream_with_context(generar(db.session, filtros)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={nombre}'},
     )
 
-# --- RUTA PARA GENERACIÓN DE CÓDIGOS QR ---
+@admin_bp.route('/en-vivo')
+@login_required
+def en_vivo():
+    """Feed en vivo de los escaneos para los supervisores de la fila."""
+    return render_template('admin/en_vivo.html')
+
+@admin_bp.route('/eventos')
+@login_required
+def eventos():
+    """
+    Flujo SSE con el resultado de cada escaneo (exitoso o rechazado).
+
+    Al reconectarse, el navegador envía `Last-Event-ID` y recibe los eventos que
+    se perdió mientras sigan en el buffer del canal.
+    """
+    nombres_committe = {}
+
+    def enriquecer(datos):
+        committe_id = datos.get('committe_id')
+        if committe_id is not None and committe_id not in nombres_committe:
+            nombres_committe.update(db.session.execute(select(Committe.id_committe, Committe.nombre_committe)).all())
+            # Devuelve la conexión al pool: el flujo puede quedar abierto varios minutos
+            db.session.close()
+        return {**datos, 'committe': nombres_committe.get(committe_id)}
+
+    flujo = canal_eventos.flujo(
+        ultimo_id=request.headers.get('Last-Event-ID') or request.args.get('ultimo_id'),
+        duracion=current_app.config['EVENTOS_DURACION_CONEXION'],
+        enriquecer=enriquecer,
+    )
+    return Response(
+        stream_with_context(flujo),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@admin_bp.route('/api/participantes/buscar')
+@login_required
+def buscar_participantes():
+    """Sugerencias para el filtro de participante del reporte (autocompletado)."""
+    filtros = reportes_svc.filtros_desde_args(request.args)
+    try:
+        _resolver_evento_reporte(filtros)
+    except reportes_svc.FiltroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(reportes_svc.buscar_participantes(
+        db.session, request.args.get('q'), evento_id=filtros['evento'], archivado=filtros['archivado']
+    ))
+
+# --- RUTAS PARA GENERACIÓN DE CÓDIGOS QR ---
+
+def _contenido_qr(datos):
+    """Texto del QR de un participante según el formato elegido en la configuración."""
+    config = config_cache.obtener()
+    return qr_token.contenido_qr(
+        datos,
+        config.formato_qr if config else qr_token.FORMATO_JSON,
+        current_app.config['SECRET_KEY'],
+        config.id_config if config else None,
+    )
+
+def _carpeta_cache_qr():
+    """Subcarpeta de la caché de QR del evento activo y su formato de QR."""
+    config = config_cache.obtener()
+    return qr_cache.carpeta_de(
+        current_app.config['QR_CACHE_FOLDER'],
+        config.id_config if config else None,
+        config.formato_qr if config else qr_token.FORMATO_JSON,
+    )
 
 @admin_bp.route('/participantes/generar_qrs')
 @login_required
 @admin_required
 def generar_todos_los_qrs():
     """
-    Genera los códigos QR de todos los participantes y los ofrece como descarga en un archivo ZIP.
+    Lanza en segundo plano la generación del ZIP con los códigos QR de todos los participantes
+    y redirige a la página de progreso.
     """
-    participantes = Participante.query.all()
-    if not participantes:
+    datos = datos_qr_participantes(evento_id=_evento_activo_id())
+    if not datos:
         flash('No hay participantes para generar códigos QR.', 'warning')
         return redirect(url_for('admin.participantes'))
 
-    # Crear un archivo ZIP en memoria
-    memory_file = io.BytesIO()
-    with zipfile.ZipFile(memory_file, 'w', zipfile.ZIP_DEFLATED) as zf:
-        for p in participantes:
-            # Preparar los datos para el QR
-            participante_data = {
-                "id": p.id_participante,
-                "nombre": p.nombre_participante,
-                "committe": p.committe.nombre_committe,
-                "pais": p.pais.nombre_pais,
-                "institucion": p.institucion.nombre_institucion
-            }
-            
-            # Generar la imagen del QR
-            qr_img_buffer = generate_qr_code_img(participante_data)
-            
-            # Definir el nombre del archivo PNG
-            file_name = f"{p.id_participante}.png"
-            
-            # Escribir la imagen en el archivo ZIP
-            zf.writestr(file_name, qr_img_buffer.getvalue())
+    items = [(f"{d['id']}.png", _contenido_qr(d)) for d in datos]
+    tarea_id = tareas.iniciar_zip_qrs(
+        items,
+        current_app.config['EXPORTS_FOLDER'],
+        _carpeta_cache_qr(),
+        current_app.config['QR_WORKERS'],
+    )
+    return redirect(url_for('admin.tarea_qrs', tarea_id=tarea_id))
 
-    # Rebobinar el archivo en memoria para prepararlo para la lectura
-    memory_file.seek(0)
+@admin_bp.route('/participante/<int:id>/qr')
+@login_required
+@admin_required
+def qr_participante(id):
+    """
+    Devuelve el QR de un participante desde la caché en disco.
 
-    # Enviar el archivo ZIP para su descarga
+    La ETag es la clave de contenido del QR, así que una reimpresión sin cambios
+    en los datos se resuelve con un 304 sin volver a generar ni enviar la imagen.
+    """
+    datos = datos_qr_participantes(ids=[id])
+    if not datos:
+        abort(404)
+    contenido = _contenido_qr(datos[0])
+    ruta = qr_cache.obtener_o_generar(_carpeta_cache_qr(), contenido)
     return send_file(
-        memory_file,
+        ruta,
+        mimetype='image/png',
+        download_name=f'{id}.png',
+        etag=qr_cache.clave_qr(contenido),
+        last_modified=os.path.getmtime(ruta),
+        max_age=0,
+        conditional=True
+    )
+
+@admin_bp.route('/tareas/<tarea_id>')
+@login_required
+@admin_required
+def tarea_qrs(tarea_id):
+    """Página de progreso de una tarea en segundo plano (códigos QR o importación de fotos)."""
+    estado = tareas.obtener_estado(current_app.config['EXPORTS_FOLDER'], tarea_id)
+    if not estado:
+        abort(404)
+    if estado.get('tipo') == 'fotos':
+        return render_template('admin/tarea_fotos.html', tarea_id=tarea_id)
+    return render_template('admin/tarea_qrs.html', tarea_id=tarea_id)
+
+@admin_bp.route('/tareas/<tarea_id>/estado')
+@login_required
+@admin_required
+def estado_tarea(tarea_id):
+    """Devuelve en JSON el progreso de una tarea en segundo plano."""
+    estado = tareas.obtener_estado(current_app.config['EXPORTS_FOLDER'], tarea_id)
+    if not estado:
+        return jsonify({'error': 'Tarea no encontrada.'}), 404
+    return jsonify(estado)
+
+@admin_bp.route('/tareas/<tarea_id>/descargar')
+@login_required
+@admin_required
+def descargar_tarea(tarea_id):
+    """Descarga el ZIP generado por una tarea completada."""
+    carpeta = current_app.config['EXPORTS_FOLDER']
+    estado = tareas.obtener_estado(carpeta, tarea_id)
+    if not estado or estado['estado'] != tareas.COMPLETADA or estado.get('tipo') == 'fotos':
+        abort(404)
+    return send_file(
+        tareas.ruta_zip(carpeta, tarea_id),
         download_name='codigos_qr_participantes.zip',
         as_attachment=True,
         mimetype='application/zip'
     )
 
+# --- Métricas de rendimiento ---
+
+@admin_bp.route('/metricas')
+@login_required
+@admin_required
+def metricas_prometheus():
+    """Métricas por endpoint en formato de texto de Prometheus."""
+    return Response(metricas.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@admin_bp.route('/api/metricas')
+@login_required
+@admin_required
+def api_metricas():
+    """Resumen JSON por endpoint: percentiles de latencia, consultas SQL, tiempo de BD y tamaño."""
+    return jsonify(metricas.resumen())
+
+@admin_bp.route('/api/metricas/reiniciar', methods=['POST'])
+@login_required
+@admin_required
+def reiniciar_metricas():
+    """Pone las métricas a cero (p. ej. al comenzar una jornada del evento)."""
+    metricas.reiniciar()
+    return jsonify({'success': True})
+
 # --- Rutas CRUD para Usuarios ---
 
 @admin_bp.route('/usuarios', methods=['GET'])
 @login_required
 @admin_required
+@presupuesto_consultas(3)
 def usuarios():
     """Muestra la página de gestión de usuarios."""
     lista_usuarios = User.query.all()
-    config = Configuracion.query.first()
-    return render_template('admin/usuarios.html', users=lista_usuarios, config=config)
+    return render_template('admin/usuarios.html', users=lista_usuarios)
 
 @admin_bp.route('/usuario/add', methods=['POST'])
 @login_required
@@ -609,6 +1032,7 @@ def edit_user(id):
     user.username = new_username
     user.role = new_role
     db.session.commit()
+    usuarios_cache.invalidar()
     flash('Usuario actualizado correctamente.', 'success')
     return redirect(url_for('admin.usuarios'))
 
@@ -643,5 +1067,6 @@ def delete_user(id):
     user_to_delete = User.query.get_or_404(id)
     db.session.delete(user_to_delete)
     db.session.commit()
+    usuarios_cache.invalidar()
     flash('Usuario eliminado con éxito.', 'success')
     return redirect(url_for('admin.usuarios'))
\ No newline at end of file
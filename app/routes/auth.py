@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db, bcrypt
 from app.models.models import User
+from app.services.usuarios_cache import costo_hash
 
 auth_bp = Blueprint('auth', __name__)
 # --- RUTA RAÍZ / ÍNDICE ---
@@ -32,6 +33,12 @@ def login():
         user = User.query.filter_by(username=username).first()
 
         if user and bcrypt.check_password_hash(user.password, password):
+            # Si BCRYPT_LOG_ROUNDS cambió, se aprovecha que tenemos la contraseña en
+            # claro para guardar el hash con el costo actual
+            costo = current_app.config['BCRYPT_LOG_ROUNDS']
+            if costo_hash(user.password) != costo:
+                user.password = bcrypt.generate_password_hash(password, costo).decode('utf-8')
+                db.session.commit()
             login_user(user)
             flash('Inicio de sesión exitoso.', 'success')
             if user.role == 'admin':
@@ -1,69 +1,153 @@
-from flask import Blueprint, render_template, jsonify, request
+from flask import Blueprint, render_template, jsonify, request, current_app
 from flask_login import login_required, current_user
-from app import db
-from app.models.models import Participante, Registro, Configuracion
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+from app.services.config_cache import config_cache
+from app.services.eventos import canal_eventos, datos_escaneo
+from app.services.idempotencia import clave_valida, resultados_recientes
+from app.services.indice_participantes import indice_participantes
+from app.services.qr_token import participante_desde_escaneo, QRInvalido
+from app.services.redencion import redimir_merienda, redimir_lote, DESCONOCIDO
+from app.services.tiempo import zona_del_evento
 
 operador_bp = Blueprint('operador', __name__)
 
 @operador_bp.route('/escaner')
 @login_required
 def escaner():
-    config = Configuracion.query.first()
-    return render_template('operador/escaner.html', config=config)
+    return render_template('operador/escaner.html')
 
 @operador_bp.route('/validar_qr', methods=['POST'])
 @login_required
 def validar_qr():
-    data = request.get_json()
-    if not data or 'id_participante' not in data:
-        return jsonify({'success': False, 'message': 'ID de participante no proporcionado.'}), 400
+    """
+    Valida un escaneo y entrega la merienda.
 
+    Con la cabecera `Idempotency-Key` (una por lectura, la misma en cada
+    reintento) un reintento recibe la respuesta original sin repetir la
+    redención (ver services/idempotencia.py).
+    """
+    config = config_cache.obtener()
+    clave = request.headers.get('Idempotency-Key')
+    if clave is None:
+        cuerpo, estado = _validar_escaneo(config)
+        return jsonify(cuerpo), estado
+    if not clave_valida(clave):
+        return jsonify({'success': False, 'message': 'Clave de idempotencia inválida.'}), 400
+
+    (cuerpo, estado), repetida = resultados_recientes.ejecutar(
+        current_user.id, clave, lambda: _validar_escaneo(config)
+    )
+    respuesta = jsonify(cuerpo)
+    if repetida:
+        respuesta.headers['Idempotent-Replayed'] = 'true'
+    return respuesta, estado
+
+def _validar_escaneo(config):
+    """Procesa un escaneo de `validar_qr`; devuelve (cuerpo JSON, código HTTP)."""
     try:
-        participante_id = int(data['id_participante'])
-    except ValueError:
-        return jsonify({'success': False, 'message': 'ID inválido. Debe ser un número.'}), 400
-    
-    participante = Participante.query.get(participante_id)
+        participante_id = participante_desde_escaneo(
+            request.get_json(silent=True),
+            current_app.config['SECRET_KEY'],
+            config.id_config if config else None,
+            solo_firmados=current_app.config['QR_REQUIRE_SIGNED'],
+        )
+    except QRInvalido as e:
+        canal_eventos.publicar('escaneo', {
+            'estado': 'invalido',
+            'success': False,
+            'message': str(e),
+            'fecha_hora': datetime.utcnow().isoformat() + 'Z',
+            'operador': current_user.username,
+            'origen': 'escaner',
+        })
+        return {'success': False, 'message': str(e)}, 400
+
+    cooldown_minutos = config.cooldown_minutos if config else 60
+    evento_id = config.id_config if config else None
+    ahora = datetime.utcnow()
+    # Desconocido, sin saldo o en cooldown se responden desde memoria; el resto va al UPDATE atómico
+    resultado = indice_participantes.prevalidar(participante_id, cooldown_minutos, ahora, evento_id)
+    if resultado is None:
+        resultado = redimir_merienda(
+            participante_id,
+            current_user.id,
+            cooldown_minutos,
+            ahora=ahora,
+            evento_id=evento_id,
+            zona_horaria=zona_del_evento(config),
+        )
+        indice_participantes.registrar(resultado, ahora)
+    canal_eventos.publicar('escaneo', datos_escaneo(resultado, current_user.username))
+
+    return resultado.como_respuesta(), 404 if resultado.estado == DESCONOCIDO else 200
+
+# Máximo de escaneos aceptados en una sola sincronización
+MAX_LOTE_SINCRONIZACION = 500
 
-    if not participante:
-        return jsonify({'success': False, 'message': 'Participante no encontrado.'}), 404
-    
-    # --- INICIO: LÓGICA DE COOLDOWN ---
-    config = Configuracion.query.first()
-    cooldown_period = timedelta(minutes=config.cooldown_minutos if config else 60)
-    
-    # Buscar el último registro para este participante
-    ultimo_registro = Registro.query.filter_by(id_participante=participante.id_participante).order_by(Registro.fecha_hora.desc()).first()
+@operador_bp.route('/sincronizar', methods=['POST'])
+@login_required
+def sincronizar():
+    """
+    Recibe los escaneos que un dispositivo guardó mientras estaba sin conexión.
+
+    Cuerpo esperado: {"escaneos": [{"id_local": "...", "qr": "<texto del QR>", "fecha_hora": "2025-12-01T15:04:05Z"}, ...]}
+    En lugar de `qr` cada escaneo puede traer directamente `id_participante`.
+    Devuelve un resultado por escaneo, identificado por su `id_local`. El
+    `id_local` es también la clave de idempotencia: un escaneo que ya llegó por
+    `validar_qr` o en un lote anterior recibe la respuesta original.
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('escaneos'), list):
+        return jsonify({'success': False, 'message': 'Lote de escaneos no proporcionado.'}), 400
+    if len(data['escaneos']) > MAX_LOTE_SINCRONIZACION:
+        return jsonify({'success': False, 'message': f'El lote supera el máximo de {MAX_LOTE_SINCRONIZACION} escaneos.'}), 413
 
-    if ultimo_registro:
-        tiempo_desde_ultimo_registro = datetime.utcnow() - ultimo_registro.fecha_hora
-        if tiempo_desde_ultimo_registro < cooldown_period:
-            tiempo_restante = cooldown_period - tiempo_desde_ultimo_registro
-            minutos_restantes = round(tiempo_restante.total_seconds() / 60)
-            return jsonify({
+    config = config_cache.obtener()
+    ahora = datetime.utcnow()
+    validos, resultados = [], []
+    for item in data['escaneos']:
+        clave = item.get('id_local') if isinstance(item, dict) else None
+        guardada = resultados_recientes.obtener(current_user.id, clave) if clave_valida(clave) else None
+        if guardada is not None:
+            resultados.append({'id_local': clave, **guardada[0]})
+            continue
+        try:
+            fecha = datetime.fromisoformat(str(item['fecha_hora']))
+            if fecha.tzinfo is not None:
+                fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+            validos.append({
+                'id_local': item.get('id_local'),
+                'id_participante': participante_desde_escaneo(
+                    item, current_app.config['SECRET_KEY'], config.id_config if config else None,
+                    solo_firmados=current_app.config['QR_REQUIRE_SIGNED'],
+                ),
+                # Un reloj adelantado en el dispositivo no puede registrar entregas en el futuro
+                'fecha_hora': min(fecha, ahora),
+            })
+        except QRInvalido as e:
+            resultados.append({
+                'id_local': item.get('id_local'),
+                'success': False,
+                'estado': 'invalido',
+                'message': str(e),
+            })
+        except (KeyError, TypeError, ValueError, AttributeError):
+            resultados.append({
+                'id_local': item.get('id_local') if isinstance(item, dict) else None,
                 'success': False,
-                'message': f'Este participante ya fue registrado hace poco. Inténtelo de nuevo en {minutos_restantes} minutos.'
+                'estado': 'invalido',
+                'message': 'Escaneo con formato inválido.',
             })
-    # --- FIN: LÓGICA DE COOLDOWN ---
 
-    if participante.saldo_merienda > 0:
-        participante.saldo_merienda -= 1
-        nuevo_registro = Registro(
-            id_participante=participante.id_participante,
-            operador_responsable_id=current_user.id,
-            fecha_hora=datetime.utcnow()
-        )
-        db.session.add(nuevo_registro)
-        db.session.commit()
-        return jsonify({
-            'success': True,
-            'message': f'Merienda registrada para {participante.nombre_participante}.',
-            'saldo_restante': participante.saldo_merienda
-        })
-    else:
-        return jsonify({
-            'success': False,
-            'message': f'{participante.nombre_participante} no tiene meriendas disponibles.',
-            'saldo_restante': 0
-        })
\ No newline at end of file
+    for escaneo, resultado in redimir_lote(validos, current_user.id, config.cooldown_minutos if config else 60,
+                                           evento_id=config.id_config if config else None,
+                                           zona_horaria=zona_del_evento(config)):
+        indice_participantes.registrar(resultado, escaneo['fecha_hora'])
+        canal_eventos.publicar('escaneo', datos_escaneo(
+            resultado, current_user.username, origen='sincronizacion', fecha_hora=escaneo['fecha_hora']
+        ))
+        resultados.append({'id_local': escaneo['id_local'], **resultado.como_respuesta()})
+        if clave_valida(escaneo['id_local']):
+            resultados_recientes.guardar(current_user.id, escaneo['id_local'], (resultado.como_respuesta(), 200))
+
+    return jsonify({'success': True, 'resultados': resultados})
@@ -0,0 +1,22 @@
+from flask import Blueprint, jsonify
+
+from app.services.salud import comprobar_base_de_datos, estado_pool
+
+salud_bp = Blueprint('salud', __name__)
+
+
+@salud_bp.route('/healthz')
+def healthz():
+    """
+    Estado del servicio para el balanceador o el monitoreo (no requiere sesión).
+
+    Responde 200 si la base de datos contesta y 503 si no, junto con el uso del
+    pool de conexiones del worker que atendió la petición.
+    """
+    base_de_datos = comprobar_base_de_datos()
+    cuerpo = {
+        'status': 'ok' if base_de_datos['ok'] else 'error',
+        'base_de_datos': base_de_datos,
+        'pool': estado_pool(),
+    }
+    return jsonify(cuerpo), 200 if base_de_datos['ok'] else 503
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+
+from flask import current_app, render_template, request, url_for
+
+# Carpeta (dentro de `static`) con los archivos generados por `flask build-assets`
+CARPETA_DIST = 'dist'
+MANIFIESTO = 'manifest-activos.json'
+
+# Activos que genera el build: nombre lógico -> origen (relativo a la raíz del proyecto).
+# 'app.css' es la salida de Tailwind; los demás se copian tal cual.
+ORIGENES = {
+    'app.css': 'app/static/src/app.css',
+    'html5-qrcode.min.js': 'node_modules/html5-qrcode/html5-qrcode.min.js',
+    'scanner.js': 'app/static/js/scanner.js',
+}
+
+# Sin build (entorno de desarrollo) las plantillas usan estas URL, como antes
+RESPALDOS = {
+    'app.css': 'https://cdn.tailwindcss.com',
+    'html5-qrcode.min.js': 'https://unpkg.com/html5-qrcode@2.0.9/dist/html5-qrcode.min.js',
+}
+
+# Archivos estáticos sin hash que el service worker guarda para funcionar sin conexión
+PRECACHE_FIJOS = ['manifest.json', 'icons/icon-192x192.png', 'icons/icon-512x512.png']
+
+# Los archivos con hash en el nombre nunca cambian: caché de un año en el navegador
+MAX_AGE_INMUTABLE = 365 * 24 * 3600
+
+
+def _nombre_con_hash(nombre, contenido):
+    base, extension = nombre.split('.', 1)
+    return f'{base}.{hashlib.sha256(contenido).hexdigest()[:12]}.{extension}'
+
+
+def construir(raiz, carpeta_static):
+    """
+    Compila y versiona los activos estáticos.
+
+    Genera el CSS de Tailwind minificado (solo con las clases que usan las
+    plantillas y los scripts, ver tailwind.config.js), copia html5-qrcode desde
+    node_modules y el script del escáner, y guarda cada archivo en `static/dist`
+    con el hash de su contenido en el nombre. El manifiesto resultante relaciona
+    cada nombre lógico con su archivo; los archivos de builds anteriores se borran.
+
+    Returns:
+        dict: el manifiesto (nombre lógico -> archivo dentro de `static/dist`).
+
+    Raises:
+        RuntimeError: si falta una dependencia de npm o falla la compilación del CSS.
+    """
+    tailwind = os.path.join(raiz, 'node_modules', '.bin', 'tailwindcss')
+    if not os.path.exists(tailwind):
+        raise RuntimeError('No se encontró tailwindcss: ejecute "npm install" en la raíz del proyecto.')
+
+    destino = os.path.join(carpeta_static, CARPETA_DIST)
+    temporal = destino + '.tmp'
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    try:
+        css = os.path.join(temporal, 'app.css')
+        resultado = subprocess.run(
+            [tailwind, '-c', 'tailwind.config.js', '-i', ORIGENES['app.css'], '-o', css, '--minify'],
+            cwd=raiz, capture_output=True, text=True,
+        )
+        if resultado.returncode != 0:
+            raise RuntimeError(f'No se pudo compilar el CSS: {resultado.stderr.strip()}')
+
+        manifiesto = {}
+        for nombre, origen in ORIGENES.items():
+            ruta = css if nombre == 'app.css' else os.path.join(raiz, origen)
+            if not os.path.exists(ruta):
+                raise RuntimeError(f'No se encontró {origen}: ejecute "npm install" en la raíz del proyecto.')
+            with open(ruta, 'rb') as f:
+                contenido = f.read()
+            manifiesto[nombre] = _nombre_con_hash(nombre, contenido)
+            with open(os.path.join(temporal, manifiesto[nombre]), 'wb') as f:
+                f.write(contenido)
+        os.remove(css)
+
+        with open(os.path.join(temporal, MANIFIESTO), 'w') as f:
+            json.dump(manifiesto, f, indent=2, sort_keys=True)
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(temporal, destino)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+    return manifiesto
+
+
+class ActivosEstaticos:
+    """
+    Resuelve las URL de los activos versionados y sirve el service worker.
+
+    Lee al arrancar el manifiesto generado por `flask build-assets`. Las
+    plantillas piden los archivos por nombre lógico con `activo('app.css')`; si
+    no hay build se usan las URL de respaldo (CDN y `static/js`). Los archivos de
+    `static/dist` se sirven con caché inmutable y la versión de la caché del
+    service worker se calcula con sus hashes, así que cada despliegue con activos
+    nuevos reemplaza la caché de los teléfonos sin pasos manuales.
+    """
+
+    def __init__(self, app=None):
+        self.manifiesto = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        ruta = os.path.join(app.static_folder, CARPETA_DIST, MANIFIESTO)
+        try:
+            with open(ruta) as f:
+                self.manifiesto = json.load(f)
+        except FileNotFoundError:
+            self.manifiesto = {}
+        app.extensions['activos'] = self
+        self.version = self._calcular_version(app.static_folder)
+
+        app.jinja_env.globals['activo'] = self.url
+        app.jinja_env.globals['activo_compilado'] = self.compilado
+        app.add_url_rule('/sw.js', 'service_worker', self.service_worker)
+
+        prefijo = f'{app.static_url_path}/{CARPETA_DIST}/'
+
+        @app.after_request
+        def cachear_inmutables(response):
+            if request.path.startswith(prefijo) and response.status_code == 200:
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = MAX_AGE_INMUTABLE
+                response.cache_control.immutable = True
+            return response
+
+    def compilado(self, nombre):
+        """True si el activo salió del build (y no de la URL de respaldo)."""
+        return nombre in self.manifiesto
+
+    def url(self, nombre):
+        """URL del activo: la versión con hash si hay build, si no la de respaldo."""
+        if nombre in self.manifiesto:
+            return url_for('static', filename=f'{CARPETA_DIST}/{self.manifiesto[nombre]}')
+        return RESPALDOS.get(nombre) or url_for('static', filename=f'js/{nombre}', v=self.version)
+
+    def _calcular_version(self, carpeta_static):
+        """
+        Versión de la caché del service worker: hash de los nombres con hash del
+        build y del contenido de los archivos sin hash que se precargan.
+        """
+        resumen = hashlib.sha256(json.dumps(self.manifiesto, sort_keys=True).encode())
+        locales = PRECACHE_FIJOS if self.manifiesto else ['js/scanner.js'] + PRECACHE_FIJOS
+        for nombre in locales:
+            try:
+                with open(os.path.join(carpeta_static, nombre), 'rb') as f:
+                    resumen.update(f.read())
+            except FileNotFoundError:
+                pass
+        return resumen.hexdigest()[:12]
+
+    def service_worker(self):
+        """
+        Sirve `/sw.js` con la versión de caché y la lista de precarga del despliegue
+        actual. El propio script no se cachea para que el navegador detecte cada
+        versión nueva.
+        """
+        precache = [self.url(nombre) for nombre in ORIGENES]
+        precache += [url_for('static', filename=nombre) for nombre in PRECACHE_FIJOS]
+        respuesta = current_app.response_class(
+            render_template('sw.js', version=self.version, precache=precache,
+                            prefijo_inmutable=url_for('static', filename=f'{CARPETA_DIST}/')),
+            mimetype='application/javascript',
+        )
+        respuesta.cache_control.no_cache = True
+        return respuesta
+
+
+activos = ActivosEstaticos()
@@ -0,0 +1,227 @@
+import random
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from app.models.models import (
+    Committe, Configuracion, ContadorAgregado, InstitucionEducativa, Participante, Registro, User,
+)
+from app.services import tiempo
+
+# Dimensiones de los contadores
+TOTAL = 'total'
+DIA = 'dia'
+HORA = 'hora'
+COMMITTE = 'committe'
+INSTITUCION = 'institucion'
+OPERADOR = 'operador'
+PARTICIPANTES = 'participantes'
+
+# Claves fijas de las dimensiones TOTAL y PARTICIPANTES
+ENTREGAS = 'entregas'
+INSCRITOS = 'total'
+CON_SALDO = 'con_saldo'
+
+# Los días y las horas se agrupan en la hora local del evento (`Configuracion.zona_horaria`).
+# Al reconstruir, las fechas se convierten a hora local en lotes de este tamaño.
+LOTE_FECHAS = 5000
+
+# Cantidad de filas del ranking por comité, institución y operador
+TOP = 10
+
+# Cada entrega suma en uno de estos fragmentos de los contadores compartidos
+# (total, día, hora, comité, institución, con saldo), elegido al azar y guardado
+# como sufijo de la clave ('2025-12-01#7'). Así dos estaciones que entregan a la
+# vez casi nunca esperan por la misma fila de InnoDB; al leer se suman los
+# fragmentos. Los contadores reconstruidos o ajustados fuera de una entrega se
+# guardan sin sufijo.
+FRAGMENTOS = 16
+SEPARADOR_FRAGMENTO = '#'
+
+
+def _claves_tiempo(fecha_utc, zona_horaria):
+    """Devuelve (día, hora) locales de una fecha UTC naive, p. ej. ('2025-12-01', '2025-12-01 10')."""
+    local = tiempo.a_local(fecha_utc, zona_horaria)
+    return local.strftime('%Y-%m-%d'), local.strftime('%Y-%m-%d %H')
+
+
+def _incrementar(session, deltas):
+    """
+    Suma los `deltas` {(dimension, clave): cantidad} con un único INSERT ... ON CONFLICT.
+
+    Las filas se ordenan siempre igual para que dos transacciones concurrentes
+    bloqueen los contadores en el mismo orden y no se produzcan deadlocks.
+    """
+    filas = [
+        {'dimension': dimension, 'clave': clave, 'valor': valor}
+        for (dimension, clave), valor in sorted(deltas.items()) if valor
+    ]
+    if not filas:
+        return
+
+    tabla = ContadorAgregado.__table__
+    dialecto = session.get_bind().dialect.name
+    if dialecto == 'mysql':
+        stmt = mysql.insert(tabla).values(filas)
+        session.execute(stmt.on_duplicate_key_update(valor=tabla.c.valor + stmt.inserted.valor))
+    elif dialecto in ('sqlite', 'postgresql'):
+        stmt = (sqlite if dialecto == 'sqlite' else postgresql).insert(tabla).values(filas)
+        session.execute(stmt.on_conflict_do_update(
+            index_elements=[tabla.c.dimension, tabla.c.clave],
+            set_={'valor': tabla.c.valor + stmt.excluded.valor},
+        ))
+    else:
+        for fila in filas:
+            actualizadas = session.execute(
+                update(tabla)
+                .where(tabla.c.dimension == fila['dimension'], tabla.c.clave == fila['clave'])
+                .values(valor=tabla.c.valor + fila['valor'])
+            ).rowcount
+            if not actualizadas:
+                session.execute(insert(tabla).values(fila))
+
+
+def registrar_entrega(session, fecha_utc, operador_id, committe_id, institucion_id, saldo_restante,
+                      zona_horaria=tiempo.ZONA_PREDETERMINADA):
+    """
+    Actualiza los contadores por una merienda entregada.
+
+    Debe llamarse dentro de la transacción de la redención, antes del COMMIT, para
+    que los contadores y Registro nunca queden desfasados. Los contadores que
+    comparten todas las estaciones se suman en un fragmento al azar (ver
+    FRAGMENTOS); el del operador ya es propio de cada uno.
+    """
+    dia, hora = _claves_tiempo(fecha_utc, zona_horaria)
+    sufijo = f'{SEPARADOR_FRAGMENTO}{random.randrange(FRAGMENTOS)}'
+    deltas = {
+        (TOTAL, ENTREGAS + sufijo): 1,
+        (DIA, dia + sufijo): 1,
+        (HORA, hora + sufijo): 1,
+        (COMMITTE, str(committe_id) + sufijo): 1,
+        (INSTITUCION, str(institucion_id) + sufijo): 1,
+        (OPERADOR, str(operador_id)): 1,
+    }
+    if saldo_restante == 0:
+        deltas[(PARTICIPANTES, CON_SALDO + sufijo)] = -1
+    _incrementar(session, deltas)
+
+
+def ajustar_participantes(session, inscritos, con_saldo):
+    """Suma (o resta) participantes inscritos y con saldo al crear, importar o eliminar participantes."""
+    _incrementar(session, {(PARTICIPANTES, INSCRITOS): inscritos, (PARTICIPANTES, CON_SALDO): con_saldo})
+
+
+def reconstruir(session, evento_id):
+    """
+    Recalcula todos los contadores desde Registro y Participante del evento indicado.
+
+    Para usar si los contadores se desfasan (p. ej. tras editar la base de datos a
+    mano), al cambiar de evento activo o al cambiar su zona horaria. Las fechas se
+    recorren por lotes y cada lote se convierte de una vez a día y hora local. Con
+    `evento_id` None se cuentan todas las filas (en la zona predeterminada).
+
+    Returns:
+        int: cantidad de registros contabilizados.
+    """
+    def del_evento(consulta, modelo):
+        return consulta if evento_id is None else consulta.where(modelo.evento_id == evento_id)
+
+    deltas = Counter()
+    for columna, dimension in (
+        (Participante.committe_id, COMMITTE),
+        (Participante.institucion_id, INSTITUCION),
+    ):
+        consulta = select(columna, func.count()).select_from(Registro).join(Registro.participante).group_by(columna)
+        for clave, cantidad in session.execute(del_evento(consulta, Registro)):
+            deltas[(dimension, str(clave))] = cantidad
+    consulta = select(Registro.operador_responsable_id, func.count()).group_by(Registro.operador_responsable_id)
+    for clave, cantidad in session.execute(del_evento(consulta, Registro)):
+        deltas[(OPERADOR, str(clave))] = cantidad
+
+    zona_horaria = tiempo.ZONA_PREDETERMINADA
+    if evento_id is not None:
+        zona_horaria = session.scalar(
+            select(Configuracion.zona_horaria).where(Configuracion.id_config == evento_id)
+        ) or zona_horaria
+
+    total = 0
+    fechas = del_evento(select(Registro.fecha_hora), Registro).execution_options(yield_per=LOTE_FECHAS)
+    for lote in session.execute(fechas).scalars().partitions():
+        for dia, hora in tiempo.claves_dia_hora_lote(lote, zona_horaria):
+            deltas[(DIA, dia)] += 1
+            deltas[(HORA, hora)] += 1
+        total += len(lote)
+    deltas[(TOTAL, ENTREGAS)] = total
+
+    participantes = del_evento(select(func.count()).select_from(Participante), Participante)
+    deltas[(PARTICIPANTES, INSCRITOS)] = session.scalar(participantes)
+    deltas[(PARTICIPANTES, CON_SALDO)] = session.scalar(participantes.where(Participante.saldo_merienda > 0))
+
+    session.execute(delete(ContadorAgregado))
+    filas = [{'dimension': d, 'clave': c, 'valor': v} for (d, c), v in deltas.items()]
+    if filas:
+        session.execute(insert(ContadorAgregado), filas)
+    session.commit()
+    return total
+
+
+def _ranking(contadores, nombres):
+    """Ordena {id: cantidad} de mayor a menor y reemplaza los ids por nombres."""
+    mejores = sorted(contadores.items(), key=lambda item: item[1], reverse=True)[:TOP]
+    return [{'nombre': nombres.get(int(clave), f'#{clave}'), 'valor': valor} for clave, valor in mejores]
+
+
+def resumen(session, ahora=None, zona_horaria=tiempo.ZONA_PREDETERMINADA):
+    """
+    Lee los contadores del dashboard.
+
+    Solo consulta la tabla de contadores (a lo sumo unos cientos de filas, contando
+    los fragmentos) y los nombres de los comités, instituciones y operadores que
+    aparecen en el ranking, sin importar cuántos registros haya.
+
+    Returns:
+        dict: totales, entregas de hoy, entregas por hora de hoy y rankings.
+    """
+    hoy, _ = _claves_tiempo(ahora or datetime.utcnow(), zona_horaria)
+    consulta = select(ContadorAgregado.dimension, ContadorAgregado.clave, ContadorAgregado.valor).where(or_(
+        ContadorAgregado.dimension.in_([TOTAL, PARTICIPANTES, COMMITTE, INSTITUCION, OPERADOR]),
+        and_(ContadorAgregado.dimension == DIA, or_(
+            ContadorAgregado.clave == hoy, ContadorAgregado.clave.like(f'{hoy}{SEPARADOR_FRAGMENTO}%'),
+        )),
+        and_(ContadorAgregado.dimension == HORA, ContadorAgregado.clave.like(f'{hoy} %')),
+    ))
+
+    # Se suman los fragmentos de cada contador
+    valores = defaultdict(int)
+    for dimension, clave, valor in session.execute(consulta):
+        valores[(dimension, clave.split(SEPARADOR_FRAGMENTO, 1)[0])] += valor
+    por_dimension = {COMMITTE: {}, INSTITUCION: {}, OPERADOR: {}, HORA: {}}
+    for (dimension, clave), valor in valores.items():
+        if dimension in por_dimension and valor:
+            por_dimension[dimension][clave] = valor
+
+    def nombres(modelo_id, modelo_nombre, dimension):
+        ids = [int(clave) for clave in por_dimension[dimension]]
+        if not ids:
+            return {}
+        return dict(session.execute(select(modelo_id, modelo_nombre).where(modelo_id.in_(ids))).all())
+
+    return {
+        'entregadas': valores.get((TOTAL, ENTREGAS), 0),
+        'participantes': valores.get((PARTICIPANTES, INSCRITOS), 0),
+        'con_saldo': valores.get((PARTICIPANTES, CON_SALDO), 0),
+        'hoy': valores.get((DIA, hoy), 0),
+        'por_hora': [
+            {'hora': clave[-2:], 'valor': valor} for clave, valor in sorted(por_dimension[HORA].items())
+        ],
+        'por_committe': _ranking(
+            por_dimension[COMMITTE], nombres(Committe.id_committe, Committe.nombre_committe, COMMITTE)
+        ),
+        'por_institucion': _ranking(
+            por_dimension[INSTITUCION],
+            nombres(InstitucionEducativa.id_institucion, InstitucionEducativa.nombre_institucion, INSTITUCION),
+        ),
+        'por_operador': _ranking(por_dimension[OPERADOR], nombres(User.id, User.username, OPERADOR)),
+    }
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+from app import db
+from app.models.models import Configuracion
+from app.services.gestion_eventos import consulta_evento_activo
+
+
+class CacheConfiguracion:
+    """
+    Caché en memoria de la fila de `Configuracion` del evento activo.
+
+    Cada proceso guarda una copia de solo lectura durante `CONFIG_CACHE_TTL` segundos.
+    Al guardar la configuración se llama a `invalidar()`, que además reescribe el
+    archivo de versión en la carpeta `instance`: los demás workers comparan su
+    fecha de modificación (un simple `stat`, sin ir a la base de datos) y recargan
+    en cuanto cambia.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._valor = None
+        self._cargado_en = 0.0
+        self._version = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CONFIG_CACHE_TTL', 30)
+        app.config.setdefault('CONFIG_VERSION_FILE', os.path.join(app.instance_path, 'config.version'))
+        os.makedirs(os.path.dirname(app.config['CONFIG_VERSION_FILE']), exist_ok=True)
+        app.extensions['config_cache'] = self
+        self._ttl = app.config['CONFIG_CACHE_TTL']
+        self._archivo_version = app.config['CONFIG_VERSION_FILE']
+
+        # Las plantillas reciben `config` sin que cada vista tenga que consultarlo
+        @app.context_processor
+        def inyectar_configuracion():
+            return {'config': self.obtener()}
+
+    def obtener(self):
+        """Devuelve la configuración del evento activo (o None si aún no existe)."""
+        version = self._leer_version()
+        if version == self._version and time.monotonic() - self._cargado_en < self._ttl:
+            return self._valor
+
+        with self._lock:
+            # Otro hilo pudo haberla recargado mientras esperábamos el lock
+            if version == self._version and time.monotonic() - self._cargado_en < self._ttl:
+                return self._valor
+            config = db.session.scalars(consulta_evento_activo()).first()
+            self._valor = _copiar(config) if config else None
+            self._version = version
+            self._cargado_en = time.monotonic()
+            return self._valor
+
+    def invalidar(self):
+        """Descarta la copia local y avisa al resto de workers."""
+        with self._lock:
+            self._cargado_en = 0.0
+            with open(self._archivo_version, 'w') as f:
+                f.write(str(time.time_ns()))
+
+    def _leer_version(self):
+        try:
+            return os.stat(self._archivo_version).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+
+def _copiar(config):
+    """Copia las columnas a un objeto simple que no depende de la sesión de SQLAlchemy."""
+    return SimpleNamespace(**{c.key: getattr(config, c.key) for c in Configuracion.__table__.columns})
+
+
+config_cache = CacheConfiguracion()
@@ -0,0 +1,73 @@
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class PresupuestoExcedido(AssertionError):
+    """Una vista ejecutó más consultas SQL que las declaradas en su presupuesto."""
+
+
+class ContadorConsultas:
+    """
+    Cuenta las consultas SQL que ejecuta cada petición.
+
+    Las vistas declaran cuántas consultas pueden hacer con el decorador
+    `presupuesto_consultas`. En modo de pruebas (`TESTING`, o
+    `QUERY_BUDGET_ENFORCE = True`) superar el presupuesto lanza
+    `PresupuestoExcedido`, de modo que un N+1 nuevo hace fallar la prueba; fuera
+    de ese modo solo se registra una advertencia en el log.
+    """
+
+    def __init__(self, app=None):
+        self._escuchando = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['contador_consultas'] = self
+        if not self._escuchando:
+            event.listen(Engine, 'before_cursor_execute', self._contar)
+            self._escuchando = True
+        app.before_request(self._reiniciar)
+        app.after_request(self._verificar)
+
+    @staticmethod
+    def _reiniciar():
+        # `g` vive en el contexto de aplicación, que puede abarcar varias peticiones
+        g.consultas_sql = 0
+
+    @staticmethod
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.consultas_sql = g.get('consultas_sql', 0) + 1
+
+    @staticmethod
+    def actuales():
+        """Consultas ejecutadas hasta ahora en la petición en curso."""
+        return g.get('consultas_sql', 0)
+
+    def _verificar(self, response):
+        vista = current_app.view_functions.get(request.endpoint)
+        maximo = getattr(vista, 'presupuesto_consultas', None)
+        if maximo is None or self.actuales() <= maximo:
+            return response
+
+        mensaje = f'{request.endpoint} ejecutó {self.actuales()} consultas SQL (presupuesto: {maximo}).'
+        if current_app.config.get('QUERY_BUDGET_ENFORCE', current_app.testing):
+            raise PresupuestoExcedido(mensaje)
+        current_app.logger.warning(mensaje)
+        return response
+
+
+def presupuesto_consultas(maximo):
+    """
+    Declara cuántas consultas SQL puede ejecutar una vista, incluidas la carga del
+    usuario de la sesión y de la configuración. Debe ir justo encima de la función.
+    """
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
+
+
+contador_consultas = ContadorConsultas()
@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+
+class CanalEventos:
+    """
+    Canal en memoria de los resultados de escaneo, para el feed en vivo (SSE).
+
+    Guarda los últimos `EVENTOS_CAPACIDAD` eventos en un buffer circular. Publicar
+    solo agrega un elemento al buffer y despierta a los clientes en espera: no
+    hace E/S ni consultas, así que no retrasa la respuesta al escáner. Cada
+    cliente SSE lee del buffer en su propio hilo.
+
+    Los ids de evento llevan un prefijo propio del proceso (`<época>-<n>`): un
+    cliente que se reconecta con un `Last-Event-ID` de otro proceso o de antes de
+    un reinicio recibe el buffer completo en lugar de quedarse esperando un id
+    que nunca llegará. Con varios workers, cada proceso tiene su propio canal.
+    """
+
+    def __init__(self, app=None):
+        self._condicion = threading.Condition()
+        self._buffer = deque(maxlen=500)
+        self._epoca = uuid.uuid4().hex[:8]
+        self._ultimo = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('EVENTOS_CAPACIDAD', 500)
+        # Duración máxima de una conexión SSE; el navegador se reconecta solo
+        app.config.setdefault('EVENTOS_DURACION_CONEXION', 300)
+        app.extensions['canal_eventos'] = self
+        with self._condicion:
+            self._buffer = deque(self._buffer, maxlen=app.config['EVENTOS_CAPACIDAD'])
+
+    def publicar(self, tipo, datos):
+        """Agrega un evento al buffer y avisa a los clientes conectados. Devuelve su id."""
+        with self._condicion:
+            self._ultimo += 1
+            evento_id = f'{self._epoca}-{self._ultimo}'
+            self._buffer.append((self._ultimo, evento_id, tipo, datos))
+            self._condicion.notify_all()
+        return evento_id
+
+    def _secuencia(self, evento_id):
+        """Número de secuencia local de un id recibido del cliente (0 si es de otro proceso o inválido)."""
+        epoca, _, numero = (evento_id or '').partition('-')
+        if epoca != self._epoca or not numero.isdigit():
+            return 0
+        return int(numero)
+
+    def esperar(self, desde, timeout):
+        """
+        Devuelve los eventos posteriores al número de secuencia `desde`, esperando hasta
+        `timeout` segundos si todavía no hay ninguno.
+
+        Returns:
+            list[tuple]: (secuencia, id, tipo, datos) en orden de publicación.
+        """
+        with self._condicion:
+            self._condicion.wait_for(lambda: self._ultimo > desde, timeout)
+            return [evento for evento in self._buffer if evento[0] > desde]
+
+    def flujo(self, ultimo_id=None, duracion=300, latido=15, enriquecer=None):
+        """
+        Genera el cuerpo de una respuesta `text/event-stream`.
+
+        Empieza después de `ultimo_id` (el `Last-Event-ID` del navegador al
+        reconectarse) y envía un comentario de latido cada `latido` segundos para
+        que los proxies no cierren la conexión. Termina tras `duracion` segundos.
+        `enriquecer(datos)`, si se indica, completa cada evento antes de enviarlo
+        (p. ej. nombres de catálogos) en el hilo del cliente y no en el del escáner.
+        """
+        desde = self._secuencia(ultimo_id)
+        limite = time.monotonic() + duracion
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < limite:
+            eventos = self.esperar(desde, min(latido, max(limite - time.monotonic(), 0)))
+            if not eventos:
+                yield ': latido\n\n'
+                continue
+            for secuencia, evento_id, tipo, datos in eventos:
+                desde = secuencia
+                if enriquecer:
+                    datos = enriquecer(datos)
+                yield f'id: {evento_id}\nevent: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False)}\n\n'
+
+
+def datos_escaneo(resultado, operador, origen='escaner', fecha_hora=None):
+    """
+    Arma el contenido del evento de un escaneo a partir de un ResultadoRedencion.
+
+    Solo usa datos que la redención ya tiene en memoria; el nombre del comité se
+    completa al enviar el evento a cada cliente.
+    """
+    return {
+        'estado': resultado.estado,
+        'success': resultado.exitoso,
+        'message': resultado.mensaje,
+        'fecha_hora': (fecha_hora or datetime.utcnow()).isoformat() + 'Z',
+        'operador': operador,
+        'participante_id': resultado.participante_id,
+        'participante': resultado.nombre,
+        'committe_id': resultado.committe_id,
+        'saldo_restante': resultado.saldo_restante,
+        'minutos_restantes': resultado.minutos_restantes,
+        'origen': origen,
+    }
+
+
+canal_eventos = CanalEventos()
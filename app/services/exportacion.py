@@ -0,0 +1,91 @@
+import csv
+import io
+import os
+import tempfile
+
+import openpyxl
+
+from app.services import tiempo
+from app.services.reportes import columnas_orden, consulta_reporte
+
+# Filas que se traen de la base de datos en cada vuelta del cursor del servidor
+FILAS_POR_LOTE = 2000
+# Bytes por bloque al enviar el archivo XLSX
+BLOQUE_ARCHIVO = 64 * 1024
+
+ENCABEZADOS = ['Fecha y Hora', 'ID Participante', 'Participante', 'Saldo Actual', 'Comité', 'Institución', 'Operador']
+
+
+def filas_exportacion(session, filtros):
+    """
+    Recorre el reporte filtrado fila a fila con un cursor del lado del servidor.
+
+    `yield_per` hace que SQLAlchemy use `stream_results` (SSCursor en PyMySQL):
+    las filas llegan por lotes y nunca se materializa el resultado completo. Las
+    fechas de cada lote se convierten a la hora local del evento de una sola vez.
+    """
+    consulta = consulta_reporte(filtros)
+    columna, id_registro = columnas_orden(consulta, filtros['sort_by'])
+    if filtros['order'] == 'asc':
+        orden = (columna.asc(), id_registro.asc())
+    else:
+        orden = (columna.desc(), id_registro.desc())
+    consulta = consulta.order_by(*orden).execution_options(yield_per=FILAS_POR_LOTE)
+
+    zona_horaria = filtros.get('zona', tiempo.ZONA_PREDETERMINADA)
+    for lote in session.execute(consulta).partitions():
+        fechas = tiempo.formatear_lote([r.fecha_hora for r in lote], zona_horaria)
+        for r, fecha in zip(lote, fechas):
+            yield [
+                fecha,
+                r.id_participante,
+                r.nombre_participante,
+                r.saldo_merienda,
+                r.nombre_committe,
+                r.nombre_institucion,
+                r.username,
+            ]
+
+
+def generar_csv(session, filtros):
+    """Genera el CSV por bloques de texto, listo para una respuesta en streaming."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    # BOM para que Excel reconozca el archivo como UTF-8
+    buffer.write('\ufeff')
+    escritor.writerow(ENCABEZADOS)
+    for i, fila in enumerate(filas_exportacion(session, filtros), start=1):
+        escritor.writerow(fila)
+        if i % FILAS_POR_LOTE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def generar_xlsx(session, filtros):
+    """
+    Genera el XLSX en modo `write_only` de openpyxl y lo envía por bloques.
+
+    En ese modo openpyxl escribe cada fila a un archivo temporal en lugar de
+    guardar la hoja en memoria; el libro final se escribe en disco y se borra
+    cuando termina la descarga.
+    """
+    libro = openpyxl.Workbook(write_only=True)
+    hoja = libro.create_sheet('Meriendas')
+    hoja.append(ENCABEZADOS)
+    for fila in filas_exportacion(session, filtros):
+        hoja.append(fila)
+
+    descriptor, ruta = tempfile.mkstemp(suffix='.xlsx')
+    os.close(descriptor)
+    try:
+        libro.save(ruta)
+        with open(ruta, 'rb') as f:
+            while True:
+                bloque = f.read(BLOQUE_ARCHIVO)
+                if not bloque:
+                    break
+                yield bloque
+    finally:
+        os.remove(ruta)
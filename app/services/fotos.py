@@ -0,0 +1,214 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Derivadas que se generan de cada foto: nombre -> (lado en px, recortar a cuadrado).
+# 'mini' cubre el avatar de 40x40 de los listados en pantallas de alta densidad.
+TAMANOS = {
+    'mini': (80, True),
+    'media': (320, False),
+}
+# Formatos de cada derivada: WebP para los navegadores actuales y JPEG de respaldo
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+EXTENSIONES_VALIDAS = {'.jpg', '.jpeg', '.png', '.webp'}
+# Las derivadas llevan el hash de la foto en el nombre: se cachean un año en el navegador
+MAX_AGE_DERIVADAS = 365 * 24 * 3600
+# Fotos de teléfono de hasta ~60 megapíxeles; más que eso se rechaza
+MAX_PIXELES = 60_000_000
+
+
+class FotoInvalida(ValueError):
+    """El archivo subido no es una imagen que se pueda procesar."""
+
+
+def nombre_foto(participante_id, contenido, extension):
+    """
+    Nombre con el que se guarda la foto original: `<id>_<hash>.<ext>`.
+
+    El hash del contenido hace que cada foto nueva tenga una URL nueva, de modo que
+    las derivadas se pueden servir con caché de larga duración sin quedar obsoletas.
+    """
+    resumen = hashlib.sha256(contenido).hexdigest()[:10]
+    return f'{participante_id}_{resumen}{extension.lower()}'
+
+
+def nombre_derivada(nombre_original, tamano, formato):
+    base, _ = os.path.splitext(nombre_original)
+    return f'{base}-{tamano}.{formato}'
+
+
+def original_de_derivada(derivada, carpeta_fotos):
+    """
+    Ruta de la foto original de la que sale una derivada (`5_ab12cd34ef-mini.webp`),
+    o None si el nombre no corresponde a ninguna derivada o la original no existe.
+    """
+    base, _, resto = derivada.rpartition('-')
+    tamano, _, formato = resto.partition('.')
+    if not base or tamano not in TAMANOS or formato not in FORMATOS:
+        return None
+    # Las fotos anteriores a las derivadas pueden tener la extensión en mayúsculas
+    for extension in sorted(EXTENSIONES_VALIDAS | {e.upper() for e in EXTENSIONES_VALIDAS}):
+        ruta = os.path.join(carpeta_fotos, base + extension)
+        if os.path.isfile(ruta):
+            return ruta
+    return None
+
+
+def _reemplazar(destino, escribir):
+    """
+    Escribe `destino` de forma atómica: `escribir(archivo)` llena un temporal con
+    nombre único en la misma carpeta (dos hilos pueden generar la misma foto a la
+    vez) y después se reemplaza el destino.
+    """
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(destino), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            escribir(archivo)
+        os.replace(temporal, destino)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def generar_derivadas(ruta_original, carpeta_derivadas, forzar=False):
+    """
+    Genera las miniaturas de una foto en todos los tamaños y formatos.
+
+    Corrige la orientación EXIF (las fotos de teléfono suelen venir giradas) y
+    escribe cada archivo de forma atómica. Sin `forzar`, omite las que ya existen.
+
+    Returns:
+        int: cantidad de archivos generados.
+
+    Raises:
+        FotoInvalida: si el archivo no es una imagen válida.
+    """
+    nombre = os.path.basename(ruta_original)
+    pendientes = [
+        (tamano, formato) for tamano in TAMANOS for formato in FORMATOS
+        if forzar or not os.path.exists(os.path.join(carpeta_derivadas, nombre_derivada(nombre, tamano, formato)))
+    ]
+    if not pendientes:
+        return 0
+
+    try:
+        with Image.open(ruta_original) as imagen:
+            if imagen.width * imagen.height > MAX_PIXELES:
+                raise FotoInvalida('La imagen es demasiado grande.')
+            # draft() deja que el decodificador JPEG reduzca la escala al leer, mucho más rápido
+            lado_maximo = max(lado for lado, _ in TAMANOS.values())
+            imagen.draft('RGB', (lado_maximo * 2, lado_maximo * 2))
+            imagen = ImageOps.exif_transpose(imagen).convert('RGB')
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise FotoInvalida('El archivo no es una imagen válida.') from e
+
+    os.makedirs(carpeta_derivadas, exist_ok=True)
+    for tamano in {t for t, _ in pendientes}:
+        lado, cuadrada = TAMANOS[tamano]
+        if cuadrada:
+            reducida = ImageOps.fit(imagen, (lado, lado), Image.Resampling.LANCZOS)
+        else:
+            reducida = imagen.copy()
+            reducida.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+        for formato in (f for t, f in pendientes if t == tamano):
+            formato_pil, opciones = FORMATOS[formato]
+            destino = os.path.join(carpeta_derivadas, nombre_derivada(nombre, tamano, formato))
+            _reemplazar(destino, lambda archivo: reducida.save(archivo, formato_pil, **opciones))
+    return len(pendientes)
+
+
+def guardar_foto(contenido, extension, participante_id, carpeta_fotos, carpeta_derivadas):
+    """
+    Guarda la foto original con nombre versionado y genera sus derivadas.
+
+    Returns:
+        str: nombre del archivo guardado (el valor de `foto_participante`).
+
+    Raises:
+        FotoInvalida: si la extensión no es de imagen o el contenido no se puede leer.
+    """
+    extension = extension.lower()
+    if extension not in EXTENSIONES_VALIDAS:
+        raise FotoInvalida(f'Formato de imagen no admitido: {extension or "sin extensión"}.')
+    nombre = nombre_foto(participante_id, contenido, extension)
+    ruta = os.path.join(carpeta_fotos, nombre)
+    os.makedirs(carpeta_fotos, exist_ok=True)
+    _reemplazar(ruta, lambda archivo: archivo.write(contenido))
+    try:
+        generar_derivadas(ruta, carpeta_derivadas)
+    except FotoInvalida:
+        eliminar_foto(nombre, carpeta_fotos, carpeta_derivadas)
+        raise
+    return nombre
+
+
+def eliminar_foto(nombre, carpeta_fotos, carpeta_derivadas):
+    """Borra la foto original y todas sus derivadas (las que falten se ignoran)."""
+    rutas = [os.path.join(carpeta_fotos, nombre)] + [
+        os.path.join(carpeta_derivadas, nombre_derivada(nombre, tamano, formato))
+        for tamano in TAMANOS for formato in FORMATOS
+    ]
+    for ruta in rutas:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def _derivadas_de_archivo(item):
+    """Se ejecuta en un proceso del pool: genera las derivadas de una foto existente."""
+    ruta, carpeta_derivadas, forzar = item
+    try:
+        return os.path.basename(ruta), generar_derivadas(ruta, carpeta_derivadas, forzar), None
+    except FotoInvalida as e:
+        return os.path.basename(ruta), 0, str(e)
+
+
+def generar_derivadas_carpeta(carpeta_fotos, carpeta_derivadas, pool, forzar=False):
+    """
+    Genera en paralelo las derivadas de todas las fotos de la carpeta (relleno inicial).
+
+    Returns:
+        list[tuple[str, int, str | None]]: (foto, derivadas generadas, error) por foto.
+    """
+    fotos = sorted(
+        nombre for nombre in os.listdir(carpeta_fotos)
+        if os.path.splitext(nombre)[1].lower() in EXTENSIONES_VALIDAS
+        and os.path.isfile(os.path.join(carpeta_fotos, nombre))
+    )
+    items = [(os.path.join(carpeta_fotos, nombre), carpeta_derivadas, forzar) for nombre in fotos]
+    return list(pool.map(_derivadas_de_archivo, items, chunksize=8))
+
+
+def asignar_fotos_zip(ruta_zip, ids_validos):
+    """
+    Relaciona cada archivo de un ZIP de fotos con un participante por su nombre (`<id>.jpg`).
+
+    Returns:
+        tuple[list[tuple[str, int]], list[tuple[str, str]]]: (archivo, id) de las fotos a
+        importar y (archivo, motivo) de las omitidas.
+    """
+    asignaciones, omitidas = [], []
+    with zipfile.ZipFile(ruta_zip) as zf:
+        for miembro in zf.infolist():
+            nombre = os.path.basename(miembro.filename)
+            # Carpetas y archivos ocultos o de metadatos (p. ej. __MACOSX/._foto.jpg)
+            if miembro.is_dir() or not nombre or nombre.startswith('.') or '__MACOSX' in miembro.filename:
+                continue
+            base, extension = os.path.splitext(nombre)
+            if extension.lower() not in EXTENSIONES_VALIDAS:
+                omitidas.append((miembro.filename, 'No es una imagen JPG, PNG o WebP.'))
+            elif not base.isdigit() or int(base) not in ids_validos:
+                omitidas.append((miembro.filename, 'El nombre no corresponde al ID de un participante del evento.'))
+            else:
+                asignaciones.append((miembro.filename, int(base)))
+    return asignaciones, omitidas
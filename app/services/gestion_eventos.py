@@ -0,0 +1,148 @@
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, update
+
+from app.models.models import (
+    Committe, Configuracion, InstitucionEducativa, Pais, Participante, ParticipanteArchivado, Registro,
+    RegistroArchivado, User,
+)
+from app.services import agregados, tiempo
+
+
+class OperacionEventoInvalida(ValueError):
+    """La operación no se puede aplicar al evento en su estado actual."""
+
+
+def consulta_evento_activo():
+    """
+    Consulta del evento en uso: el marcado como activo o, si ninguno lo está
+    (bases anteriores a los eventos múltiples), el primero creado.
+    """
+    return select(Configuracion).order_by(Configuracion.activo.desc(), Configuracion.id_config).limit(1)
+
+
+def evento_activo(session):
+    return session.scalars(consulta_evento_activo()).first()
+
+
+def listar_eventos(session):
+    """Todos los eventos, del más reciente al más antiguo."""
+    return session.scalars(select(Configuracion).order_by(Configuracion.id_config.desc())).all()
+
+
+def crear_evento(session, nombre_evento, fechas_evento, meriendas_totales, cooldown_minutos, formato_qr, logo_evento=None,
+                 zona_horaria=tiempo.ZONA_PREDETERMINADA):
+    """Crea un evento nuevo (sin activarlo) y devuelve su fila."""
+    evento = Configuracion(
+        zona_horaria=zona_horaria,
+        nombre_evento=nombre_evento,
+        fechas_evento=fechas_evento,
+        meriendas_totales=meriendas_totales,
+        cooldown_minutos=cooldown_minutos,
+        formato_qr=formato_qr,
+        logo_evento=logo_evento,
+        activo=False,
+    )
+    session.add(evento)
+    session.commit()
+    return evento
+
+
+def activar_evento(session, evento_id):
+    """
+    Marca un evento como el activo y recalcula los contadores del dashboard, que
+    siempre reflejan solo el evento en uso.
+
+    Quien llama debe invalidar `config_cache` para que los workers lo vean.
+
+    Returns:
+        int: registros contabilizados en los contadores del nuevo evento.
+
+    Raises:
+        OperacionEventoInvalida: si el evento no existe o ya está archivado.
+    """
+    evento = session.get(Configuracion, evento_id)
+    if evento is None:
+        raise OperacionEventoInvalida('El evento no existe.')
+    if evento.archivado_at is not None:
+        raise OperacionEventoInvalida('No se puede activar un evento archivado.')
+
+    session.execute(update(Configuracion).where(Configuracion.id_config != evento_id).values(activo=False))
+    evento.activo = True
+    session.commit()
+    return agregados.reconstruir(session, evento_id)
+
+
+def archivar_evento(session, evento_id):
+    """
+    Mueve los participantes y registros de un evento terminado a las tablas de archivo.
+
+    Todo se hace con INSERT ... SELECT y DELETE en el servidor de base de datos, en
+    una sola transacción: si algo falla, el evento queda como estaba. Después, las
+    tablas en uso (y sus índices) solo contienen los eventos vigentes, mientras que
+    los reportes del evento archivado se siguen consultando desde `registro_archivado`.
+
+    Returns:
+        tuple[int, int]: participantes y registros archivados.
+
+    Raises:
+        OperacionEventoInvalida: si el evento no existe, es el activo o ya está archivado.
+    """
+    evento = session.get(Configuracion, evento_id)
+    if evento is None:
+        raise OperacionEventoInvalida('El evento no existe.')
+    if evento.archivado_at is not None:
+        raise OperacionEventoInvalida('El evento ya está archivado.')
+    activo = evento_activo(session)
+    if activo is not None and activo.id_config == evento_id:
+        raise OperacionEventoInvalida('No se puede archivar el evento activo. Active otro evento primero.')
+
+    registros = session.execute(
+        insert(RegistroArchivado).from_select(
+            ['id_registro', 'evento_id', 'fecha_hora', 'id_participante', 'nombre_participante', 'saldo_merienda',
+             'committe_id', 'nombre_committe', 'institucion_id', 'nombre_institucion', 'operador_id', 'username'],
+            select(
+                Registro.id_registro, Registro.evento_id, Registro.fecha_hora, Participante.id_participante,
+                Participante.nombre_participante, Participante.saldo_merienda, Committe.id_committe,
+                Committe.nombre_committe, InstitucionEducativa.id_institucion,
+                InstitucionEducativa.nombre_institucion, User.id, User.username,
+            )
+            .join(Participante, Registro.participante)
+            .join(Committe, Participante.committe)
+            .join(InstitucionEducativa, Participante.institucion)
+            .join(User, Registro.operador)
+            .where(Registro.evento_id == evento_id),
+        )
+    ).rowcount
+    participantes = session.execute(
+        insert(ParticipanteArchivado).from_select(
+            ['id_participante', 'evento_id', 'nombre_participante', 'saldo_merienda', 'foto_participante',
+             'committe_id', 'nombre_committe', 'pais_id', 'nombre_pais', 'institucion_id', 'nombre_institucion'],
+            select(
+                Participante.id_participante, Participante.evento_id, Participante.nombre_participante,
+                Participante.saldo_merienda, Participante.foto_participante, Committe.id_committe,
+                Committe.nombre_committe, Pais.id_pais, Pais.nombre_pais, InstitucionEducativa.id_institucion,
+                InstitucionEducativa.nombre_institucion,
+            )
+            .join(Committe, Participante.committe)
+            .join(Pais, Participante.pais)
+            .join(InstitucionEducativa, Participante.institucion)
+            .where(Participante.evento_id == evento_id),
+        )
+    ).rowcount
+
+    # Si alguna fila no se pudo copiar (p. ej. su operador ya no existe) se aborta
+    for modelo, copiadas in ((Registro, registros), (Participante, participantes)):
+        total = session.scalar(select(func.count()).select_from(modelo).where(modelo.evento_id == evento_id))
+        if total != copiadas:
+            session.rollback()
+            raise OperacionEventoInvalida(
+                f'{total - copiadas} filas de {modelo.__tablename__} hacen referencia a datos inexistentes; '
+                'no se archivó nada.'
+            )
+
+    session.execute(delete(Registro).where(Registro.evento_id == evento_id))
+    session.execute(delete(Participante).where(Participante.evento_id == evento_id))
+    evento.archivado_at = datetime.utcnow()
+    session.commit()
+    return participantes, registros
@@ -0,0 +1,121 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Claves que genera el escáner (UUID o marca de tiempo + aleatorio)
+PATRON_CLAVE = re.compile(r'^[A-Za-z0-9._:-]{8,64}$')
+
+
+def clave_valida(clave):
+    return isinstance(clave, str) and PATRON_CLAVE.match(clave) is not None
+
+
+class _Entrada:
+    __slots__ = ('respuesta', 'expira', 'lista')
+
+    def __init__(self, expira):
+        self.respuesta = None
+        self.expira = expira
+        self.lista = threading.Event()
+
+
+class ResultadosRecientes:
+    """
+    Respuestas recientes del escáner por clave de idempotencia, en memoria de cada proceso.
+
+    El escáner genera una clave por lectura y la reenvía en cada reintento (y
+    como `id_local` si el escaneo termina en la cola sin conexión). Si la clave
+    ya se procesó, se devuelve la respuesta original sin volver a la base de
+    datos: un reintento tras un timeout recibe "entregado" y no un cooldown.
+
+    Las claves son por operador y caducan a los `SCAN_IDEMPOTENCY_TTL` segundos;
+    se guardan como mucho `SCAN_IDEMPOTENCY_MAX` (se descartan las más antiguas).
+    Un reintento que llega mientras el original sigue en curso espera su
+    respuesta hasta `SCAN_IDEMPOTENCY_WAIT` segundos. Con varios workers un
+    reintento puede llegar a otro proceso: ahí no hay respuesta guardada, pero el
+    UPDATE atómico de `redencion` sigue impidiendo la doble entrega.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SCAN_IDEMPOTENCY_TTL', 300)
+        app.config.setdefault('SCAN_IDEMPOTENCY_MAX', 10_000)
+        app.config.setdefault('SCAN_IDEMPOTENCY_WAIT', 10)
+        app.extensions['resultados_recientes'] = self
+        self._ttl = app.config['SCAN_IDEMPOTENCY_TTL']
+        self._maximo = app.config['SCAN_IDEMPOTENCY_MAX']
+        self._espera = app.config['SCAN_IDEMPOTENCY_WAIT']
+
+    def _purgar(self, ahora):
+        # Todas las entradas viven lo mismo: el orden de inserción es el de caducidad
+        while self._entradas:
+            entrada = next(iter(self._entradas.values()))
+            if entrada.expira > ahora and len(self._entradas) <= self._maximo:
+                break
+            self._entradas.popitem(last=False)
+
+    def ejecutar(self, operador_id, clave, funcion):
+        """
+        Ejecuta `funcion()` una sola vez por (operador, clave) mientras no caduque.
+
+        Returns:
+            tuple: (respuesta de `funcion`, True si es una respuesta guardada).
+        """
+        llave = (operador_id, clave)
+        ahora = time.monotonic()
+        with self._lock:
+            self._purgar(ahora)
+            entrada = self._entradas.get(llave)
+            propia = entrada is None
+            if propia:
+                entrada = self._entradas[llave] = _Entrada(ahora + self._ttl)
+                self._purgar(ahora)
+
+        if not propia:
+            if entrada.lista.wait(self._espera) and entrada.respuesta is not None:
+                return entrada.respuesta, True
+            # El original falló o tarda demasiado: se procesa de nuevo
+            return funcion(), False
+
+        try:
+            entrada.respuesta = funcion()
+        except BaseException:
+            with self._lock:
+                if self._entradas.get(llave) is entrada:
+                    del self._entradas[llave]
+            raise
+        finally:
+            entrada.lista.set()
+        return entrada.respuesta, False
+
+    def obtener(self, operador_id, clave):
+        """Respuesta ya terminada para la clave, o None."""
+        with self._lock:
+            entrada = self._entradas.get((operador_id, clave))
+        if entrada is None or entrada.expira <= time.monotonic():
+            return None
+        return entrada.respuesta
+
+    def guardar(self, operador_id, clave, respuesta):
+        """Guarda la respuesta de una clave procesada fuera de `ejecutar` (sincronización por lotes)."""
+        ahora = time.monotonic()
+        entrada = _Entrada(ahora + self._ttl)
+        entrada.respuesta = respuesta
+        entrada.lista.set()
+        with self._lock:
+            self._entradas.pop((operador_id, clave), None)
+            self._entradas[(operador_id, clave)] = entrada
+            self._purgar(ahora)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entradas)
+
+
+resultados_recientes = ResultadosRecientes()
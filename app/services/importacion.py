@@ -0,0 +1,305 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import openpyxl
+import pycountry
+from sqlalchemy import delete, insert, select, update
+
+from app import db
+from app.models.models import Committe, InstitucionEducativa, Pais, Participante, Registro
+from app.services import agregados
+
+# Filas enviadas por cada INSERT múltiple
+TAMANO_LOTE = 1000
+
+# Modos de importación de la hoja Estudiantes
+AGREGAR = 'agregar'          # solo inserta (importación inicial)
+SINCRONIZAR = 'sincronizar'  # inserta, actualiza y (opcionalmente) elimina según la diferencia
+
+# Cambios que se muestran en la vista previa (los totales se cuentan siempre completos)
+MAX_CAMBIOS_VISTA_PREVIA = 200
+
+# Columnas que la reimportación compara y actualiza (el saldo nunca se toca)
+CAMPOS_SINCRONIZADOS = ('nombre_participante', 'committe_id', 'pais_id', 'institucion_id', 'id_externo')
+
+
+@dataclass
+class ReporteImportacion:
+    """Resumen de una importación: lo que se creó y las filas que se omitieron."""
+    instituciones: int = 0
+    committes: int = 0
+    paises: int = 0
+    participantes: int = 0
+    omitidos: list = field(default_factory=list)  # [{'hoja', 'fila', 'nombre', 'motivo'}]
+    # Reimportación (modo SINCRONIZAR)
+    modo: str = AGREGAR
+    vista_previa: bool = False
+    actualizados: int = 0
+    eliminados: int = 0
+    sin_cambios: int = 0
+    ausentes: int = 0      # participantes que no están en el libro (se eliminan solo si se pide)
+    conservados: int = 0   # ausentes que no se eliminan porque ya recibieron meriendas
+    cambios: list = field(default_factory=list)  # [{'accion', 'nombre', 'detalle'}], hasta MAX_CAMBIOS_VISTA_PREVIA
+    fotos_eliminadas: list = field(default_factory=list)
+
+    def omitir(self, hoja, fila, nombre, motivo):
+        self.omitidos.append({'hoja': hoja, 'fila': fila, 'nombre': nombre, 'motivo': motivo})
+
+    def anotar(self, accion, nombre, detalle=''):
+        if len(self.cambios) < MAX_CAMBIOS_VISTA_PREVIA:
+            self.cambios.append({'accion': accion, 'nombre': nombre, 'detalle': detalle})
+
+
+def leer_hoja(libro, nombre_hoja):
+    """
+    Recorre una hoja en modo streaming y devuelve (número de fila, dict por columna).
+
+    La primera fila se toma como encabezado. Las filas completamente vacías se saltan.
+    """
+    filas = libro[nombre_hoja].iter_rows(values_only=True)
+    encabezado = [str(c).strip() if c is not None else '' for c in next(filas, ())]
+    for numero, valores in enumerate(filas, start=2):
+        if all(v is None or str(v).strip() == '' for v in valores):
+            continue
+        yield numero, {
+            columna: (str(valor).strip() if valor is not None else '')
+            for columna, valor in zip(encabezado, valores)
+        }
+
+
+def _codigo_pais(nombre_pais):
+    """Busca el código ISO de 2 letras del país; None si pycountry no lo reconoce."""
+    try:
+        return pycountry.countries.search_fuzzy(nombre_pais)[0].alpha_2.lower()
+    except (LookupError, AttributeError):
+        print(f"Advertencia: No se encontró código de bandera para '{nombre_pais}' durante la importación.")
+        return None
+
+
+def _mapa(columna_nombre, columna_id):
+    """Carga en una sola consulta el diccionario nombre -> id de un catálogo."""
+    return dict(db.session.execute(select(columna_nombre, columna_id)).all())
+
+
+def _insertar_en_lotes(modelo, filas):
+    for inicio in range(0, len(filas), TAMANO_LOTE):
+        db.session.execute(insert(modelo), filas[inicio:inicio + TAMANO_LOTE])
+
+
+def _importar_catalogo(libro, hoja, columna_excel, modelo, columna_nombre, columna_id, reporte, extra=None):
+    """
+    Inserta en bloque los nombres nuevos de un catálogo.
+
+    Returns:
+        tuple[dict, int]: el mapa nombre -> id actualizado y la cantidad de registros creados.
+    """
+    existentes = _mapa(columna_nombre, columna_id)
+    nuevos = {}
+    for numero, fila in leer_hoja(libro, hoja):
+        nombre = fila.get(columna_excel, '')
+        if not nombre:
+            reporte.omitir(hoja, numero, nombre, f"La columna '{columna_excel}' está vacía.")
+        elif nombre not in existentes and nombre not in nuevos:
+            nuevos[nombre] = {columna_nombre.key: nombre, **(extra(nombre) if extra else {})}
+
+    if not nuevos:
+        return existentes, 0
+    _insertar_en_lotes(modelo, list(nuevos.values()))
+    return _mapa(columna_nombre, columna_id), len(nuevos)
+
+
+def _clave_nombre(nombre, institucion_id):
+    """Clave de emparejamiento sin id externo: nombre sin mayúsculas ni espacios repetidos, e institución."""
+    return ' '.join(nombre.split()).casefold(), institucion_id
+
+
+def _leer_estudiantes(libro, instituciones, paises, committes, reporte):
+    """Filas válidas de la hoja Estudiantes, con los catálogos ya resueltos a ids."""
+    for numero, fila in leer_hoja(libro, 'Estudiantes'):
+        nombre = fila.get('nombre_participante', '')
+        faltantes = [
+            etiqueta for etiqueta, columna, mapa in (
+                ('institución', 'institucion_educativa', instituciones),
+                ('país', 'pais_representado', paises),
+                ('comité', 'committe', committes),
+            )
+            if fila.get(columna, '') not in mapa
+        ]
+        if not nombre:
+            reporte.omitir('Estudiantes', numero, nombre, 'Falta el nombre del participante.')
+            continue
+        if faltantes:
+            reporte.omitir('Estudiantes', numero, nombre, f"No se encontró: {', '.join(faltantes)}.")
+            continue
+
+        yield numero, {
+            'nombre_participante': nombre,
+            'institucion_id': instituciones[fila['institucion_educativa']],
+            'pais_id': paises[fila['pais_representado']],
+            'committe_id': committes[fila['committe']],
+            'id_externo': fila.get('id_externo') or None,
+        }
+
+
+def _agregar_participantes(filas, saldo_inicial, evento_id, reporte):
+    lote = []
+    for _, datos in filas:
+        lote.append({**datos, 'saldo_merienda': saldo_inicial, 'evento_id': evento_id})
+        if len(lote) >= TAMANO_LOTE:
+            _insertar_en_lotes(Participante, lote)
+            reporte.participantes += len(lote)
+            lote = []
+
+    _insertar_en_lotes(Participante, lote)
+    reporte.participantes += len(lote)
+    agregados.ajustar_participantes(
+        db.session, reporte.participantes, reporte.participantes if saldo_inicial > 0 else 0
+    )
+
+
+def _sincronizar_participantes(filas, saldo_inicial, evento_id, eliminar_ausentes, reporte):
+    """
+    Aplica al evento solo la diferencia entre el libro y la base de datos.
+
+    Los participantes del evento se cargan en una consulta y se emparejan en
+    memoria: primero por `id_externo` y, si la fila no lo trae (o aún no está
+    asignado en la base), por nombre e institución. Las filas sin pareja se
+    insertan, las que cambiaron se actualizan con un UPDATE por clave primaria
+    en lote (el saldo se conserva) y las que no están en el libro se eliminan
+    si se pide, salvo las que ya tienen entregas registradas.
+    """
+    existentes = db.session.execute(
+        select(Participante.id_participante, Participante.saldo_merienda, Participante.foto_participante,
+               *(getattr(Participante, campo) for campo in CAMPOS_SINCRONIZADOS))
+        .where(Participante.evento_id == evento_id)
+        .order_by(Participante.id_participante)
+    ).all()
+    por_externo = {p.id_externo: p for p in existentes if p.id_externo}
+    por_nombre = {}
+    for p in existentes:
+        por_nombre.setdefault(_clave_nombre(p.nombre_participante, p.institucion_id), []).append(p)
+
+    emparejados, claves_libro = set(), set()
+    nuevos, cambios = [], []
+    for numero, datos in filas:
+        clave_libro = datos['id_externo'] or _clave_nombre(datos['nombre_participante'], datos['institucion_id'])
+        if clave_libro in claves_libro:
+            reporte.omitir('Estudiantes', numero, datos['nombre_participante'], 'Participante repetido en el libro.')
+            continue
+        claves_libro.add(clave_libro)
+
+        actual = por_externo.get(datos['id_externo']) if datos['id_externo'] else None
+        if actual is None:
+            candidatos = por_nombre.get(_clave_nombre(datos['nombre_participante'], datos['institucion_id']), [])
+            actual = next((
+                p for p in candidatos
+                if p.id_participante not in emparejados and (not p.id_externo or not datos['id_externo'])
+            ), None)
+        if actual is None or actual.id_participante in emparejados:
+            nuevos.append({**datos, 'saldo_merienda': saldo_inicial, 'evento_id': evento_id})
+            reporte.anotar('nuevo', datos['nombre_participante'])
+            continue
+
+        emparejados.add(actual.id_participante)
+        if not datos['id_externo']:
+            datos['id_externo'] = actual.id_externo  # una fila sin id no borra el ya asignado
+        distintos = [campo for campo in CAMPOS_SINCRONIZADOS if getattr(actual, campo) != datos[campo]]
+        if distintos:
+            cambios.append({'id_participante': actual.id_participante, **datos})
+            reporte.anotar('actualizado', datos['nombre_participante'], ', '.join(distintos))
+        else:
+            reporte.sin_cambios += 1
+
+    ausentes = [p for p in existentes if p.id_participante not in emparejados]
+    reporte.ausentes = len(ausentes)
+    borrar = []
+    if eliminar_ausentes and ausentes:
+        ids_ausentes = [p.id_participante for p in ausentes]
+        con_entregas = set()
+        for inicio in range(0, len(ids_ausentes), TAMANO_LOTE):
+            con_entregas.update(db.session.scalars(
+                select(Registro.id_participante).distinct()
+                .where(Registro.id_participante.in_(ids_ausentes[inicio:inicio + TAMANO_LOTE]))
+            ))
+        borrar = [p for p in ausentes if p.id_participante not in con_entregas]
+        reporte.conservados = len(ausentes) - len(borrar)
+        for p in borrar:
+            reporte.anotar('eliminado', p.nombre_participante)
+
+    _insertar_en_lotes(Participante, nuevos)
+    if cambios:
+        ahora = datetime.utcnow()
+        for inicio in range(0, len(cambios), TAMANO_LOTE):
+            # UPDATE por clave primaria en lote (executemany)
+            db.session.execute(update(Participante), [
+                {**fila, 'actualizado_at': ahora} for fila in cambios[inicio:inicio + TAMANO_LOTE]
+            ])
+    ids_borrar = [p.id_participante for p in borrar]
+    for inicio in range(0, len(ids_borrar), TAMANO_LOTE):
+        db.session.execute(
+            delete(Participante)
+            .where(Participante.id_participante.in_(ids_borrar[inicio:inicio + TAMANO_LOTE]))
+            .execution_options(synchronize_session=False)
+        )
+
+    reporte.participantes = len(nuevos)
+    reporte.actualizados = len(cambios)
+    reporte.eliminados = len(borrar)
+    reporte.fotos_eliminadas = [p.foto_participante for p in borrar if p.foto_participante]
+    agregados.ajustar_participantes(
+        db.session,
+        len(nuevos) - len(borrar),
+        (len(nuevos) if saldo_inicial > 0 else 0) - sum(1 for p in borrar if p.saldo_merienda > 0),
+    )
+
+
+def importar_libro(archivo, saldo_inicial, evento_id=None, modo=AGREGAR, eliminar_ausentes=False, vista_previa=False):
+    """
+    Importa instituciones, comités, países y estudiantes desde la plantilla Excel.
+
+    Los catálogos se cargan una vez en memoria (nombre -> id), el libro se lee en
+    modo solo lectura y los registros nuevos se insertan con INSERT múltiples por
+    lotes. Todo ocurre en una única transacción: si algo falla no se guarda nada.
+    Los participantes quedan inscritos en el evento `evento_id`.
+
+    Con `modo` SINCRONIZAR el libro se toma como la lista completa del evento y
+    solo se aplican las diferencias (ver `_sincronizar_participantes`); con
+    `eliminar_ausentes` se borran los participantes que ya no figuran. Con
+    `vista_previa` se calcula todo y se deshace la transacción al final.
+
+    Returns:
+        ReporteImportacion: cantidades creadas y filas omitidas con su motivo.
+    """
+    reporte = ReporteImportacion(modo=modo, vista_previa=vista_previa)
+    libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        instituciones, reporte.instituciones = _importar_catalogo(
+            libro, 'Instituciones', 'nombre_institucion', InstitucionEducativa,
+            InstitucionEducativa.nombre_institucion, InstitucionEducativa.id_institucion, reporte,
+        )
+        committes, reporte.committes = _importar_catalogo(
+            libro, 'Committes', 'nombre_committe', Committe,
+            Committe.nombre_committe, Committe.id_committe, reporte,
+        )
+        paises, reporte.paises = _importar_catalogo(
+            libro, 'Paises', 'nombre_pais', Pais, Pais.nombre_pais, Pais.id_pais, reporte,
+            extra=lambda nombre: {'country_code': _codigo_pais(nombre)},
+        )
+
+        filas = _leer_estudiantes(libro, instituciones, paises, committes, reporte)
+        if modo == SINCRONIZAR:
+            _sincronizar_participantes(filas, saldo_inicial, evento_id, eliminar_ausentes, reporte)
+        else:
+            _agregar_participantes(filas, saldo_inicial, evento_id, reporte)
+
+        if vista_previa:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        libro.close()
+
+    return reporte
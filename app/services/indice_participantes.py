@@ -0,0 +1,227 @@
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app import db
+from app.models.models import Participante
+from app.services.redencion import COOLDOWN, DESCONOCIDO, OK, SIN_SALDO, ResultadoRedencion, minutos_restantes
+
+# Las filas con `actualizado_at` dentro de este margen antes de la última marca se
+# vuelven a leer en cada refresco: cubre relojes desfasados entre servidores y
+# transacciones que confirmaron con una marca algo anterior.
+MARGEN_REFRESCO = timedelta(seconds=10)
+# Presupuesto de memoria documentado (ver README y benchmarks/bench_indice.py)
+BYTES_POR_PARTICIPANTE_MAX = 160
+
+_EPOCA = datetime(1970, 1, 1)
+
+
+def _segundos(fecha):
+    """Fecha UTC naive -> segundos desde la época (0.0 si no hay fecha)."""
+    return (fecha - _EPOCA).total_seconds() if fecha else 0.0
+
+
+class IndiceParticipantes:
+    """
+    Índice en memoria de los participantes del evento activo, para rechazar sin
+    ir a la base de datos los escaneos que no pueden prosperar.
+
+    Guarda por participante el saldo, la fecha de la última merienda, el comité y
+    el nombre en arreglos (`array`) paralelos ordenados por id; la búsqueda es
+    binaria. Con 10 000 participantes ocupa unos 1,2 MB por worker, casi todo en
+    los nombres (ver `memoria_bytes`).
+
+    El índice se carga completo al arrancar (wsgi.py) y cada vez que cambia el
+    archivo de versión (`invalidar()`, tras crear, editar, eliminar o importar
+    participantes o cambiar de evento). Cada `PARTICIPANT_INDEX_REFRESH` segundos
+    lee solo las filas con `actualizado_at` reciente, para ver las entregas de
+    otros workers.
+
+    Solo se responde desde memoria lo que es seguro: el saldo del índice nunca es
+    menor que el real (fuera de `invalidar()` solo baja) y su última entrega nunca
+    es posterior a la real, así que un id desconocido, un saldo en cero o un
+    cooldown vigente en el índice también lo están en la base de datos. Todo lo
+    demás pasa por el UPDATE atómico de `redencion`, que sigue siendo la autoridad.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        # Solo un hilo recarga o refresca a la vez; los demás siguen con los datos actuales
+        self._carga_lock = threading.Lock()
+        self._vaciar()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PARTICIPANT_INDEX_REFRESH', 5)
+        app.config.setdefault('PARTICIPANT_INDEX_VERSION_FILE', os.path.join(app.instance_path, 'participantes.version'))
+        os.makedirs(os.path.dirname(app.config['PARTICIPANT_INDEX_VERSION_FILE']), exist_ok=True)
+        app.extensions['indice_participantes'] = self
+        self._intervalo = app.config['PARTICIPANT_INDEX_REFRESH']
+        self._archivo_version = app.config['PARTICIPANT_INDEX_VERSION_FILE']
+
+    def _vaciar(self):
+        self._evento = None
+        self._cargado = False
+        self._version = None
+        self._marca = None
+        self._refrescado_en = 0.0
+        self._ids = array('i')
+        self._saldos = array('i')
+        self._ultimos = array('d')
+        self._committes = array('i')
+        self._nombres = []
+
+    # --- Carga y refresco ---
+
+    def precargar(self, evento_id):
+        """Carga completa de los participantes del evento (al arrancar o tras `invalidar()`)."""
+        version = self._leer_version()
+        filas = db.session.execute(
+            select(
+                Participante.id_participante, Participante.saldo_merienda, Participante.ultimo_registro_at,
+                Participante.committe_id, Participante.nombre_participante, Participante.actualizado_at,
+            )
+            .where(Participante.evento_id == evento_id)
+            .order_by(Participante.id_participante)
+        ).all()
+        ids, saldos, ultimos, committes = array('i'), array('i'), array('d'), array('i')
+        nombres, marca = [], None
+        for fila in filas:
+            ids.append(fila.id_participante)
+            saldos.append(fila.saldo_merienda)
+            ultimos.append(_segundos(fila.ultimo_registro_at))
+            committes.append(fila.committe_id)
+            nombres.append(fila.nombre_participante)
+            if fila.actualizado_at and (marca is None or fila.actualizado_at > marca):
+                marca = fila.actualizado_at
+        with self._lock:
+            self._ids, self._saldos, self._ultimos, self._committes, self._nombres = (
+                ids, saldos, ultimos, committes, nombres
+            )
+            # Sin marcas (filas anteriores a la columna) se empieza a contar desde ahora
+            self._evento, self._version, self._marca = evento_id, version, marca or datetime.utcnow()
+            self._refrescado_en = time.monotonic()
+            self._cargado = True
+        return len(ids)
+
+    def _refrescar(self):
+        """Aplica los cambios de saldo y última entrega hechos desde la última marca."""
+        consulta = select(
+            Participante.id_participante, Participante.saldo_merienda, Participante.ultimo_registro_at,
+            Participante.actualizado_at,
+        ).where(Participante.evento_id == self._evento)
+        if self._marca is not None:
+            consulta = consulta.where(Participante.actualizado_at >= self._marca - MARGEN_REFRESCO)
+        filas = db.session.execute(consulta).all()
+        with self._lock:
+            for fila in filas:
+                posicion = self._posicion(fila.id_participante)
+                if posicion is None:
+                    # Participante nuevo que aún no se avisó con invalidar(): se recarga todo
+                    self._version = None
+                    continue
+                self._saldos[posicion] = fila.saldo_merienda
+                self._ultimos[posicion] = _segundos(fila.ultimo_registro_at)
+                if fila.actualizado_at and (self._marca is None or fila.actualizado_at > self._marca):
+                    self._marca = fila.actualizado_at
+            self._refrescado_en = time.monotonic()
+
+    def _desactualizado(self, evento_id):
+        return not self._cargado or evento_id != self._evento or self._leer_version() != self._version
+
+    def _sincronizar(self, evento_id):
+        if self._desactualizado(evento_id):
+            with self._carga_lock:
+                if self._desactualizado(evento_id):
+                    self.precargar(evento_id)
+        elif time.monotonic() - self._refrescado_en >= self._intervalo:
+            # Con datos algo atrasados el índice sigue siendo seguro: no hace falta esperar
+            if self._carga_lock.acquire(blocking=False):
+                try:
+                    self._refrescar()
+                finally:
+                    self._carga_lock.release()
+
+    def invalidar(self):
+        """Obliga a todos los workers a recargar el índice en el próximo escaneo."""
+        with self._lock:
+            self._version = None
+            with open(self._archivo_version, 'w') as f:
+                f.write(str(time.time_ns()))
+
+    def _leer_version(self):
+        try:
+            return os.stat(self._archivo_version).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def _posicion(self, participante_id):
+        posicion = bisect_left(self._ids, participante_id)
+        if posicion < len(self._ids) and self._ids[posicion] == participante_id:
+            return posicion
+        return None
+
+    # --- Escaneo ---
+
+    def prevalidar(self, participante_id, cooldown_minutos, ahora, evento_id):
+        """
+        Resultado del escaneo si se puede rechazar desde memoria, o None si hay que
+        intentar la redención en la base de datos.
+        """
+        if evento_id is None:
+            return None
+        self._sincronizar(evento_id)
+        with self._lock:
+            posicion = self._posicion(participante_id)
+            if posicion is None:
+                return ResultadoRedencion(DESCONOCIDO, participante_id)
+            saldo, ultimo = self._saldos[posicion], self._ultimos[posicion]
+            nombre, committe_id = self._nombres[posicion], self._committes[posicion]
+
+        if saldo <= 0:
+            return ResultadoRedencion(SIN_SALDO, participante_id, nombre=nombre, saldo_restante=0,
+                                      committe_id=committe_id)
+        if ultimo and ultimo > _segundos(ahora - timedelta(minutes=cooldown_minutos)):
+            fecha_ultimo = _EPOCA + timedelta(seconds=ultimo)
+            return ResultadoRedencion(COOLDOWN, participante_id, nombre=nombre, saldo_restante=saldo,
+                                      minutos_restantes=minutos_restantes(cooldown_minutos, ahora, fecha_ultimo),
+                                      committe_id=committe_id)
+        return None
+
+    def registrar(self, resultado, fecha_hora):
+        """
+        Actualiza el participante con el resultado de una redención hecha en la base
+        de datos; `fecha_hora` es la que se guardó como última entrega.
+        """
+        with self._lock:
+            posicion = self._posicion(resultado.participante_id)
+            if posicion is None:
+                return
+            if resultado.estado == OK:
+                self._saldos[posicion] = resultado.saldo_restante
+                self._ultimos[posicion] = _segundos(fecha_hora)
+            elif resultado.estado == SIN_SALDO:
+                self._saldos[posicion] = 0
+
+    # --- Diagnóstico ---
+
+    def memoria_bytes(self):
+        """Memoria aproximada del índice: arreglos, lista de nombres y los textos."""
+        with self._lock:
+            arreglos = sum(sys.getsizeof(a) for a in (self._ids, self._saldos, self._ultimos, self._committes))
+            nombres = sys.getsizeof(self._nombres) + sum(sys.getsizeof(n) for n in self._nombres)
+            return arreglos + nombres
+
+    def estado(self):
+        with self._lock:
+            return {'evento_id': self._evento, 'participantes': len(self._ids), 'cargado': self._cargado}
+
+
+indice_participantes = IndiceParticipantes()
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.services.consultas import contador_consultas
+
+# Límites (en segundos) de los buckets del histograma de latencia
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Latencias recientes que se guardan por endpoint para calcular percentiles exactos
+MUESTRAS_PERCENTILES = 2000
+
+
+class _EstadisticasEndpoint:
+    """Acumulados de un endpoint. Se modifica siempre bajo el lock de `Metricas`."""
+
+    def __init__(self):
+        self.peticiones = 0
+        self.errores = 0
+        self.buckets = [0] * len(BUCKETS_LATENCIA)
+        self.latencia_total = 0.0
+        self.consultas_sql = 0
+        self.tiempo_sql = 0.0
+        self.bytes_respuesta = 0
+        self.recientes = deque(maxlen=MUESTRAS_PERCENTILES)
+
+    def registrar(self, latencia, consultas, tiempo_sql, tamano, error=False):
+        self.peticiones += 1
+        self.errores += error
+        self.latencia_total += latencia
+        for i, limite in enumerate(BUCKETS_LATENCIA):
+            if latencia <= limite:
+                self.buckets[i] += 1
+                break
+        self.consultas_sql += consultas
+        self.tiempo_sql += tiempo_sql
+        self.bytes_respuesta += tamano
+        self.recientes.append(latencia)
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)]
+
+
+class Metricas:
+    """
+    Instrumentación de las peticiones: latencia, consultas SQL, tiempo de base de
+    datos y tamaño de respuesta por endpoint.
+
+    La cantidad de consultas la aporta `contador_consultas`; el tiempo de cada
+    sentencia se mide con los eventos `before/after_cursor_execute` del motor
+    (o `handle_error` si falla), y las que superan `SLOW_QUERY_MS` se registran
+    en el log junto con su SQL. Las peticiones que terminan con una excepción o
+    un 5xx también se cuentan, como errores. Los datos viven en memoria del
+    proceso: con varios workers, cada uno informa los suyos.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._desde = time.time()
+        self._escuchando = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SLOW_QUERY_MS', 200)
+        app.extensions['metricas'] = self
+        if not self._escuchando:
+            event.listen(Engine, 'before_cursor_execute', self._antes_de_sql)
+            event.listen(Engine, 'after_cursor_execute', self._despues_de_sql)
+            event.listen(Engine, 'handle_error', self._error_de_sql)
+            self._escuchando = True
+        app.before_request(self._iniciar)
+        app.after_request(self._finalizar)
+        app.teardown_request(self._finalizar_con_error)
+
+    # --- Medición de SQL ---
+
+    # El inicio se guarda en el contexto de ejecución de la sentencia: si falla, se
+    # descarta con ella y no queda nada pendiente en la conexión.
+
+    @staticmethod
+    def _antes_de_sql(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.inicio_sql = time.perf_counter()
+
+    @classmethod
+    def _despues_de_sql(cls, conn, cursor, statement, parameters, context, executemany):
+        cls._medir_sql(context, statement)
+
+    @classmethod
+    def _error_de_sql(cls, contexto_error):
+        cls._medir_sql(contexto_error.execution_context, contexto_error.statement)
+
+    @staticmethod
+    def _medir_sql(context, statement):
+        inicio = getattr(context, 'inicio_sql', None)
+        if inicio is None:
+            return
+        context.inicio_sql = None
+        duracion = time.perf_counter() - inicio
+        if has_request_context():
+            g.tiempo_sql = g.get('tiempo_sql', 0.0) + duracion
+        if has_app_context() and duracion * 1000 >= current_app.config['SLOW_QUERY_MS']:
+            current_app.logger.warning(
+                'Consulta lenta (%.0f ms) en %s: %s',
+                duracion * 1000, request.endpoint if has_request_context() else '-',
+                ' '.join((statement or '').split()),
+            )
+
+    # --- Medición de peticiones ---
+
+    @staticmethod
+    def _iniciar():
+        g.inicio_peticion = time.perf_counter()
+        g.tiempo_sql = 0.0
+
+    def _registrar(self, tamano, error):
+        inicio = g.pop('inicio_peticion', None)
+        if inicio is None:
+            return
+        latencia = time.perf_counter() - inicio
+        with self._lock:
+            estadisticas = self._endpoints.setdefault(request.endpoint or 'sin_endpoint', _EstadisticasEndpoint())
+            estadisticas.registrar(latencia, contador_consultas.actuales(), g.get('tiempo_sql', 0.0), tamano, error)
+
+    def _finalizar(self, response):
+        # Las respuestas en streaming no tienen tamaño conocido al salir de la vista
+        self._registrar(response.content_length or 0, response.status_code >= 500)
+        return response
+
+    def _finalizar_con_error(self, exc):
+        # Sin after_request (excepción propagada o un after_request que falló): la petición
+        # sigue pendiente y se registra como error
+        self._registrar(0, True)
+
+    # --- Exportación ---
+
+    def resumen(self):
+        """Resumen por endpoint con percentiles de latencia (ms) y promedios de SQL y tamaño."""
+        with self._lock:
+            copia = {
+                endpoint: (e.peticiones, e.errores, e.latencia_total, e.consultas_sql, e.tiempo_sql, e.bytes_respuesta,
+                           sorted(e.recientes))
+                for endpoint, e in self._endpoints.items()
+            }
+
+        resultado = {}
+        for endpoint, (peticiones, errores, latencia_total, consultas, tiempo_sql, bytes_respuesta,
+                       recientes) in sorted(copia.items()):
+            resultado[endpoint] = {
+                'peticiones': peticiones,
+                'errores': errores,
+                'latencia_ms': {
+                    'promedio': round(latencia_total / peticiones * 1000, 2),
+                    'p50': round(_percentil(recientes, 0.50) * 1000, 2),
+                    'p90': round(_percentil(recientes, 0.90) * 1000, 2),
+                    'p99': round(_percentil(recientes, 0.99) * 1000, 2),
+                    'max': round(recientes[-1] * 1000, 2),
+                    'muestras': len(recientes),
+                },
+                'sql_consultas_promedio': round(consultas / peticiones, 2),
+                'sql_tiempo_ms_promedio': round(tiempo_sql / peticiones * 1000, 2),
+                'bytes_promedio': round(bytes_respuesta / peticiones),
+            }
+        return {'desde': self._desde, 'endpoints': resultado}
+
+    def prometheus(self):
+        """Métricas en el formato de texto de Prometheus."""
+        with self._lock:
+            copia = {
+                endpoint: (list(e.buckets), e.peticiones, e.latencia_total, e.consultas_sql, e.tiempo_sql,
+                           e.bytes_respuesta, e.errores)
+                for endpoint, e in self._endpoints.items()
+            }
+
+        lineas = [
+            '# HELP mun_request_duration_seconds Latencia de las peticiones por endpoint.',
+            '# TYPE mun_request_duration_seconds histogram',
+        ]
+        for endpoint, (buckets, peticiones, latencia_total, *_resto) in sorted(copia.items()):
+            acumulado = 0
+            for limite, cantidad in zip(BUCKETS_LATENCIA, buckets):
+                acumulado += cantidad
+                lineas.append(f'mun_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{limite}"}} {acumulado}')
+            lineas.append(f'mun_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {peticiones}')
+            lineas.append(f'mun_request_duration_seconds_sum{{endpoint="{endpoint}"}} {latencia_total}')
+            lineas.append(f'mun_request_duration_seconds_count{{endpoint="{endpoint}"}} {peticiones}')
+
+        contadores = (
+            ('mun_sql_statements_total', 'Sentencias SQL ejecutadas por endpoint.', 3),
+            ('mun_sql_duration_seconds_total', 'Tiempo total en la base de datos por endpoint.', 4),
+            ('mun_response_bytes_total', 'Bytes de respuesta enviados por endpoint.', 5),
+            ('mun_request_errors_total', 'Peticiones terminadas con una excepción o un 5xx por endpoint.', 6),
+        )
+        for nombre, ayuda, indice in contadores:
+            lineas.append(f'# HELP {nombre} {ayuda}')
+            lineas.append(f'# TYPE {nombre} counter')
+            for endpoint, valores in sorted(copia.items()):
+                lineas.append(f'{nombre}{{endpoint="{endpoint}"}} {valores[indice]}')
+        return '\n'.join(lineas) + '\n'
+
+    def reiniciar(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._desde = time.time()
+
+
+metricas = Metricas()
@@ -0,0 +1,195 @@
+import json
+import re
+
+from sqlalchemy import and_, insert, literal, select, update
+
+from app.models.models import Committe, InstitucionEducativa, OperacionMasiva, Participante
+from app.services import agregados
+
+# Tipos de operación
+RESTABLECER = 'restablecer'  # fija el saldo (por defecto, las meriendas totales del evento)
+RECARGAR = 'recargar'        # suma meriendas al saldo actual
+REASIGNAR = 'reasignar'      # cambia el comité y/o la institución
+TIPOS = (RESTABLECER, RECARGAR, REASIGNAR)
+
+# Límites de los parámetros
+MAX_MERIENDAS = 1000
+MAX_IDS = 10_000
+
+
+class OperacionInvalida(ValueError):
+    """Los filtros o los parámetros de la operación masiva no son válidos."""
+
+
+def _entero(valor, nombre):
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise OperacionInvalida(f'{nombre} inválido.')
+
+
+def leer_ids(texto):
+    """Lista de ids escrita a mano ('1, 2 3' o uno por línea), sin repetidos."""
+    partes = [p for p in re.split(r'[\s,;]+', texto or '') if p]
+    if not all(p.isdigit() for p in partes):
+        raise OperacionInvalida('La lista de ids solo puede contener números.')
+    if len(partes) > MAX_IDS:
+        raise OperacionInvalida(f'La lista supera el máximo de {MAX_IDS} ids.')
+    return sorted({int(p) for p in partes})
+
+
+def filtro(committe_id=None, institucion_id=None, pais_id=None, ids=None, todos=False):
+    """
+    Normaliza el filtro de participantes de una operación masiva.
+
+    Los criterios se combinan (comité Y institución Y país Y lista de ids). Para
+    aplicar la operación a todo el evento hay que pedirlo con `todos`, de modo
+    que un formulario vacío no cambie a todos los participantes por error.
+
+    Raises:
+        OperacionInvalida: si un criterio no es numérico o no hay ninguno.
+    """
+    datos = {
+        'committe_id': _entero(committe_id, 'Comité'),
+        'institucion_id': _entero(institucion_id, 'Institución'),
+        'pais_id': _entero(pais_id, 'País'),
+        'ids': leer_ids(ids) if isinstance(ids, str) else sorted(set(ids or [])),
+    }
+    if not todos and not any(datos.values()):
+        raise OperacionInvalida('Elija al menos un filtro (comité, institución, país o lista de ids) '
+                                'o marque "todos los participantes".')
+    datos['todos'] = bool(todos) and not any(datos.values())
+    return datos
+
+
+def _condicion(evento_id, filtro_):
+    condiciones = [Participante.evento_id == evento_id]
+    for columna, clave in (
+        (Participante.committe_id, 'committe_id'),
+        (Participante.institucion_id, 'institucion_id'),
+        (Participante.pais_id, 'pais_id'),
+    ):
+        if filtro_[clave] is not None:
+            condiciones.append(columna == filtro_[clave])
+    if filtro_['ids']:
+        condiciones.append(Participante.id_participante.in_(filtro_['ids']))
+    return and_(*condiciones)
+
+
+def _actualizar(session, condicion, valores):
+    return session.execute(
+        update(Participante).where(condicion).values(**valores).execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _actualizar_saldos(session, condicion, valores, saldo_nuevo):
+    """
+    Cambia el saldo de las filas del filtro y mide cuántas ganan o pierden saldo.
+
+    El cambio en el contador de participantes con saldo sale de los propios
+    UPDATE condicionales (su `rowcount`), no de una lectura previa: un escaneo
+    simultáneo podría agotar un saldo entre la lectura y la escritura. Cada grupo
+    se actualiza con una sentencia y en un orden tal que ninguna fila vuelve a
+    entrar en un grupo posterior por el propio UPDATE. Un escaneo solo puede dejar
+    sin saldo una fila que aún no se actualizó (las ya actualizadas quedan
+    bloqueadas hasta el COMMIT): si iba a conservarlo, cae en un grupo posterior;
+    si iba a perderlo, ya quedó como debía y el escaneo ajustó el contador.
+
+    Returns:
+        tuple[int, int]: (filas modificadas, cambio en los participantes con saldo).
+    """
+    con_saldo, sin_saldo = Participante.saldo_merienda > 0, Participante.saldo_merienda <= 0
+    conservan = _actualizar(session, and_(condicion, con_saldo, saldo_nuevo > 0), valores)
+    ganan = _actualizar(session, and_(condicion, sin_saldo, saldo_nuevo > 0), valores)
+    siguen_sin = _actualizar(session, and_(condicion, sin_saldo, saldo_nuevo <= 0), valores)
+    pierden = _actualizar(session, and_(condicion, con_saldo, saldo_nuevo <= 0), valores)
+    return conservan + ganan + siguen_sin + pierden, ganan - pierden
+
+
+def aplicar(session, evento_id, tipo, filtro_, usuario, cantidad=None, committe_id=None, institucion_id=None):
+    """
+    Aplica una operación masiva a los participantes del evento que cumplen el filtro.
+
+    El cambio es un único UPDATE con la condición del filtro, sin cargar las filas,
+    así que cuesta lo mismo para 10 que para 10 000 participantes. En la misma
+    transacción se ajusta el contador de participantes con saldo del dashboard y
+    se guarda la operación en `OperacionMasiva`.
+
+    Quien llama debe invalidar `indice_participantes` para que los escáneres
+    vean los saldos nuevos.
+
+    Args:
+        tipo: RESTABLECER (saldo = `cantidad`), RECARGAR (saldo += `cantidad`) o
+            REASIGNAR (a `committe_id` y/o `institucion_id`).
+        filtro_: resultado de `filtro()`.
+        usuario: nombre del usuario que la aplica ('cli' desde la línea de comandos).
+
+    Returns:
+        int: participantes modificados.
+
+    Raises:
+        OperacionInvalida: si el tipo o los parámetros no son válidos.
+    """
+    condicion = _condicion(evento_id, filtro_)
+    saldo_nuevo = None
+    if tipo == RESTABLECER:
+        cantidad = _entero(cantidad, 'Cantidad')
+        if cantidad is None or not 0 <= cantidad <= MAX_MERIENDAS:
+            raise OperacionInvalida(f'El saldo debe estar entre 0 y {MAX_MERIENDAS}.')
+        saldo_nuevo = literal(cantidad)
+        valores = {'saldo_merienda': cantidad}
+        parametros = {'cantidad': cantidad}
+    elif tipo == RECARGAR:
+        cantidad = _entero(cantidad, 'Cantidad')
+        if cantidad is None or not 1 <= cantidad <= MAX_MERIENDAS:
+            raise OperacionInvalida(f'La recarga debe estar entre 1 y {MAX_MERIENDAS} meriendas.')
+        saldo_nuevo = Participante.saldo_merienda + cantidad
+        valores = {'saldo_merienda': saldo_nuevo}
+        parametros = {'cantidad': cantidad}
+    elif tipo == REASIGNAR:
+        committe_id = _entero(committe_id, 'Comité de destino')
+        institucion_id = _entero(institucion_id, 'Institución de destino')
+        if committe_id is None and institucion_id is None:
+            raise OperacionInvalida('Elija el comité o la institución de destino.')
+        if committe_id is not None and session.get(Committe, committe_id) is None:
+            raise OperacionInvalida('El comité de destino no existe.')
+        if institucion_id is not None and session.get(InstitucionEducativa, institucion_id) is None:
+            raise OperacionInvalida('La institución de destino no existe.')
+        valores = {}
+        if committe_id is not None:
+            valores['committe_id'] = committe_id
+        if institucion_id is not None:
+            valores['institucion_id'] = institucion_id
+        parametros = dict(valores)
+    else:
+        raise OperacionInvalida('Operación desconocida.')
+
+    # El contador de participantes con saldo se ajusta con lo que cambia en las filas del filtro
+    if saldo_nuevo is not None:
+        afectados, delta = _actualizar_saldos(session, condicion, valores, saldo_nuevo)
+    else:
+        afectados, delta = _actualizar(session, condicion, valores), 0
+    if delta:
+        agregados.ajustar_participantes(session, 0, delta)
+    session.execute(insert(OperacionMasiva).values(
+        evento_id=evento_id,
+        usuario=usuario,
+        tipo=tipo,
+        filtros=json.dumps(filtro_, separators=(',', ':')),
+        parametros=json.dumps(parametros, separators=(',', ':')),
+        afectados=afectados,
+    ))
+    session.commit()
+    return afectados
+
+
+def recientes(session, evento_id, limite=20):
+    """Últimas operaciones masivas del evento, para la página de administración."""
+    return session.scalars(
+        select(OperacionMasiva)
+        .where(OperacionMasiva.evento_id == evento_id)
+        .order_by(OperacionMasiva.id_operacion.desc())
+        .limit(limite)
+    ).all()
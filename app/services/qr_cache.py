@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from app.utils import QR_PARAMETROS, generate_qr_code_img
+
+
+def clave_qr(datos):
+    """
+    Clave de contenido del QR: hash de lo que se codifica y de los parámetros de renderizado.
+
+    `datos` es el diccionario del participante o el texto ya preparado (token
+    compacto). Cualquier cambio en el nombre, comité, país, institución, en el
+    formato del QR o en `QR_PARAMETROS` produce una clave nueva.
+    """
+    contenido = json.dumps({'datos': datos, 'render': QR_PARAMETROS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:40]
+
+
+def carpeta_de(carpeta, evento_id, formato):
+    """
+    Subcarpeta de la caché para un evento y un formato de QR.
+
+    Cada ZIP desaloja solo su subcarpeta: generar los QR de un evento (o con otro
+    formato) no borra los que ya se generaron para los demás.
+    """
+    return os.path.join(carpeta, f'evento_{evento_id or 0}', formato)
+
+
+def ruta_en_cache(carpeta, datos):
+    return os.path.join(carpeta, f'{clave_qr(datos)}.png')
+
+
+def escribir_png(ruta, datos):
+    """
+    Genera el PNG y lo guarda de forma atómica (nunca queda un archivo a medio escribir).
+
+    El temporal tiene un nombre único: dos hilos que generan el mismo QR a la vez
+    escriben cada uno el suyo y el último `os.replace` gana.
+    """
+    descriptor, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(generate_qr_code_img(datos).getvalue())
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.remove(temporal)
+        except FileNotFoundError:
+            pass
+        raise
+    return ruta
+
+
+def obtener_o_generar(carpeta, datos):
+    """Devuelve la ruta del PNG en caché, generándolo solo si los datos cambiaron."""
+    ruta = ruta_en_cache(carpeta, datos)
+    if not os.path.exists(ruta):
+        os.makedirs(carpeta, exist_ok=True)
+        escribir_png(ruta, datos)
+    return ruta
+
+
+def desalojar(carpeta, datos_vigentes):
+    """
+    Borra de la caché los PNG que no corresponden a ningún participante actual.
+
+    `carpeta` es la subcarpeta del evento y formato (`carpeta_de`) a la que
+    pertenecen todos los `datos_vigentes`; el resto de la caché no se toca.
+
+    Returns:
+        int: cantidad de archivos eliminados.
+    """
+    vigentes = {f'{clave_qr(datos)}.png' for datos in datos_vigentes}
+    eliminados = 0
+    for nombre in os.listdir(carpeta):
+        if nombre.endswith('.png') and nombre not in vigentes:
+            try:
+                os.remove(os.path.join(carpeta, nombre))
+                eliminados += 1
+            except FileNotFoundError:
+                pass
+    return eliminados
@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import hmac
+import json
+import re
+
+# Formatos de contenido del QR seleccionables en la configuración
+FORMATO_JSON = 'json'
+FORMATO_COMPACTO = 'compacto'
+
+PREFIJO = 'M1'
+# Bytes de la firma HMAC-SHA256 que se conservan (80 bits)
+BYTES_FIRMA = 10
+_ALFABETO_36 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+# Partes del token: id y evento en base 36, firma en base 32 (RFC 4648, sin relleno)
+_PATRON_BASE36 = re.compile(r'[0-9A-Z]+')
+_PATRON_FIRMA = re.compile(r'[A-Z2-7]+')
+
+
+class QRInvalido(ValueError):
+    """El contenido escaneado no es un código de participante válido."""
+
+
+def _base36(numero):
+    if numero == 0:
+        return '0'
+    digitos = []
+    while numero:
+        numero, resto = divmod(numero, 36)
+        digitos.append(_ALFABETO_36[resto])
+    return ''.join(reversed(digitos))
+
+
+def _firma(cuerpo, secret_key):
+    digest = hmac.new(secret_key.encode('utf-8'), cuerpo.encode('ascii'), hashlib.sha256).digest()
+    return base64.b32encode(digest[:BYTES_FIRMA]).decode('ascii')
+
+
+def firmar(participante_id, evento_id, secret_key):
+    """
+    Genera el token compacto de un participante: `M1:<id>:<evento>:<firma>`.
+
+    Solo usa mayúsculas, dígitos y ':' para que el QR se codifique en modo
+    alfanumérico, que es el más denso: el token cabe en un QR versión 2
+    sin importar el largo del nombre o de la institución.
+    """
+    cuerpo = f'{PREFIJO}:{_base36(participante_id)}:{_base36(evento_id or 0)}'
+    return f'{cuerpo}:{_firma(cuerpo, secret_key)}'
+
+
+def verificar(token, secret_key):
+    """
+    Comprueba la firma de un token compacto.
+
+    Returns:
+        tuple[int, int]: (id del participante, id del evento).
+
+    Raises:
+        QRInvalido: si el token está mal formado o la firma no coincide.
+    """
+    partes = token.strip().upper().split(':')
+    # Se valida el alfabeto antes de firmar: un carácter fuera de ASCII haría fallar la codificación y compare_digest
+    if (len(partes) != 4 or partes[0] != PREFIJO or not _PATRON_BASE36.fullmatch(partes[1])
+            or not _PATRON_BASE36.fullmatch(partes[2]) or not _PATRON_FIRMA.fullmatch(partes[3])):
+        raise QRInvalido('Código QR no válido.')
+    cuerpo = ':'.join(partes[:3])
+    if not hmac.compare_digest(partes[3], _firma(cuerpo, secret_key)):
+        raise QRInvalido('Código QR no válido o alterado.')
+    return int(partes[1], 36), int(partes[2], 36)
+
+
+def contenido_qr(datos, formato, secret_key, evento_id=None):
+    """Texto que se codifica en el QR de un participante según el formato configurado."""
+    if formato == FORMATO_COMPACTO:
+        return firmar(datos['id'], evento_id, secret_key)
+    return json.dumps(datos, ensure_ascii=False)
+
+
+def participante_desde_escaneo(data, secret_key, evento_id=None, solo_firmados=False):
+    """
+    Obtiene el id del participante a partir del cuerpo enviado por el escáner.
+
+    Acepta el texto del QR en `qr` (token compacto firmado o JSON del formato
+    anterior) o directamente `id_participante`. Los tokens falsificados o de
+    otro evento se rechazan aquí, sin consultar la base de datos. Con
+    `solo_firmados` (`QR_REQUIRE_SIGNED`) solo se acepta el token compacto:
+    un JSON o un id escrito a mano se rechazan.
+
+    Raises:
+        QRInvalido: con el mensaje que se muestra al operador.
+    """
+    texto = data.get('qr') if isinstance(data, dict) else None
+    if texto is not None:
+        texto = str(texto).strip()
+        if texto.upper().startswith(PREFIJO + ':'):
+            participante_id, evento_token = verificar(texto, secret_key)
+            if evento_id and evento_token and evento_token != evento_id:
+                raise QRInvalido('Este código QR pertenece a otro evento.')
+            return participante_id
+        if solo_firmados:
+            raise QRInvalido('Solo se aceptan códigos QR firmados.')
+        try:
+            data = json.loads(texto)
+        except ValueError:
+            raise QRInvalido('Código QR no válido.')
+        if not isinstance(data, dict):
+            raise QRInvalido('Código QR no válido.')
+        data = {'id_participante': data.get('id')}
+
+    if not isinstance(data, dict) or data.get('id_participante') is None:
+        raise QRInvalido('ID de participante no proporcionado.')
+    if solo_firmados:
+        raise QRInvalido('Solo se aceptan códigos QR firmados.')
+    try:
+        return int(data['id_participante'])
+    except (TypeError, ValueError):
+        raise QRInvalido('ID inválido. Debe ser un número.')
@@ -0,0 +1,225 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, case, exists, insert, or_, select, update
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models.models import Participante, Registro
+from app.services import agregados, tiempo
+
+# Posibles resultados de un intento de redención
+OK = 'ok'
+COOLDOWN = 'cooldown'
+SIN_SALDO = 'sin_saldo'
+DESCONOCIDO = 'desconocido'
+
+# Reintentos ante bloqueos transitorios (deadlock de InnoDB, "database is locked" de SQLite)
+MAX_REINTENTOS = 3
+
+
+@dataclass
+class ResultadoRedencion:
+    """Resultado de un intento de entregar una merienda."""
+    estado: str
+    participante_id: int
+    nombre: Optional[str] = None
+    saldo_restante: Optional[int] = None
+    minutos_restantes: Optional[int] = None
+    committe_id: Optional[int] = None
+
+    @property
+    def exitoso(self):
+        return self.estado == OK
+
+    @property
+    def mensaje(self):
+        if self.estado == OK:
+            return f'Merienda registrada para {self.nombre}.'
+        if self.estado == COOLDOWN:
+            return f'Este participante ya fue registrado hace poco. Inténtelo de nuevo en {self.minutos_restantes} minutos.'
+        if self.estado == SIN_SALDO:
+            return f'{self.nombre} no tiene meriendas disponibles.'
+        return 'Participante no encontrado.'
+
+    def como_respuesta(self):
+        """Devuelve el cuerpo JSON que espera el escáner."""
+        respuesta = {'success': self.exitoso, 'estado': self.estado, 'message': self.mensaje}
+        if self.estado in (OK, SIN_SALDO):
+            respuesta['saldo_restante'] = self.saldo_restante
+        if self.estado == COOLDOWN:
+            respuesta['minutos_restantes'] = self.minutos_restantes
+        return respuesta
+
+
+def redimir_merienda(participante_id, operador_id, cooldown_minutos, ahora=None, evento_id=None,
+                     zona_horaria=tiempo.ZONA_PREDETERMINADA):
+    """
+    Descuenta una merienda y registra la entrega en una sola transacción.
+
+    El cooldown, el saldo y el descuento se evalúan en un único UPDATE condicional
+    sobre la fila del participante (usando `ultimo_registro_at`; el historial solo
+    se consulta para escaneos sin conexión anteriores a la última entrega), de modo
+    que dos estaciones que escanean el mismo carné a la vez no pueden entregar dos
+    meriendas: la fila queda bloqueada hasta el COMMIT y el segundo UPDATE vuelve
+    a evaluar la condición con los datos ya confirmados.
+    Los contadores del dashboard se actualizan en la misma transacción.
+
+    Con `evento_id` solo se aceptan participantes de ese evento; los de otros
+    eventos se tratan como desconocidos. `zona_horaria` es la del evento, para
+    agrupar la entrega por día y hora local en los contadores.
+
+    Returns:
+        ResultadoRedencion: el estado de la operación (ok, cooldown, sin_saldo o desconocido).
+    """
+    for intento in range(MAX_REINTENTOS):
+        try:
+            return _redimir(participante_id, operador_id, cooldown_minutos, ahora or datetime.utcnow(), evento_id,
+                            zona_horaria)
+        except OperationalError:
+            db.session.rollback()
+            if intento == MAX_REINTENTOS - 1:
+                raise
+
+
+def _del_participante(participante_id, evento_id):
+    """Condición que identifica al participante (dentro de su evento, si se indica)."""
+    condicion = Participante.id_participante == participante_id
+    if evento_id is not None:
+        condicion = and_(condicion, Participante.evento_id == evento_id)
+    return condicion
+
+
+def _fuera_de_cooldown(participante_id, cooldown_minutos, ahora):
+    """
+    Condición: ninguna entrega del participante cae a menos de `cooldown_minutos`
+    de `ahora`, ni antes ni después.
+
+    En un escaneo en línea basta con `ultimo_registro_at`. Un escaneo sin conexión
+    puede ser anterior a la última entrega; si esta queda a más de un cooldown de
+    distancia, se busca en el historial (índice participante + fecha) una entrega
+    dentro de la ventana.
+    """
+    ventana = timedelta(minutes=cooldown_minutos)
+    entrega_en_ventana = exists().where(
+        Registro.id_participante == participante_id,
+        Registro.fecha_hora > ahora - ventana,
+        Registro.fecha_hora < ahora + ventana,
+    )
+    return or_(
+        Participante.ultimo_registro_at.is_(None),
+        Participante.ultimo_registro_at <= ahora - ventana,
+        and_(Participante.ultimo_registro_at >= ahora + ventana, ~entrega_en_ventana),
+    )
+
+
+def _redimir(participante_id, operador_id, cooldown_minutos, ahora, evento_id, zona_horaria):
+    stmt = (
+        update(Participante)
+        .where(
+            _del_participante(participante_id, evento_id),
+            Participante.saldo_merienda > 0,
+            _fuera_de_cooldown(participante_id, cooldown_minutos, ahora),
+        )
+        .values(
+            saldo_merienda=Participante.saldo_merienda - 1,
+            # Un escaneo sin conexión anterior a la última entrega no la reemplaza
+            ultimo_registro_at=case(
+                (Participante.ultimo_registro_at > ahora, Participante.ultimo_registro_at), else_=ahora
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    # En los motores que lo soportan (SQLite, PostgreSQL) el UPDATE devuelve el nombre,
+    # el saldo nuevo y el comité/institución (para los contadores); en MySQL se leen por clave primaria dentro de la misma transacción.
+    columnas = (
+        Participante.nombre_participante,
+        Participante.saldo_merienda,
+        Participante.committe_id,
+        Participante.institucion_id,
+    )
+    if db.session.get_bind().dialect.update_returning:
+        fila = db.session.execute(stmt.returning(*columnas)).first()
+    else:
+        fila = None
+        if db.session.execute(stmt).rowcount:
+            fila = db.session.execute(
+                select(*columnas).where(Participante.id_participante == participante_id)
+            ).first()
+
+    if fila is None:
+        resultado = _clasificar_rechazo(participante_id, cooldown_minutos, ahora, evento_id)
+        db.session.rollback()
+        return resultado
+
+    db.session.execute(
+        insert(Registro).values(
+            id_participante=participante_id,
+            evento_id=evento_id,
+            operador_responsable_id=operador_id,
+            fecha_hora=ahora,
+        )
+    )
+    agregados.registrar_entrega(
+        db.session, ahora, operador_id, fila.committe_id, fila.institucion_id, fila.saldo_merienda, zona_horaria
+    )
+    db.session.commit()
+    return ResultadoRedencion(OK, participante_id, nombre=fila.nombre_participante, saldo_restante=fila.saldo_merienda,
+                              committe_id=fila.committe_id)
+
+
+def _clasificar_rechazo(participante_id, cooldown_minutos, ahora, evento_id):
+    """Determina por qué el UPDATE condicional no afectó ninguna fila."""
+    fila = db.session.execute(
+        select(Participante.nombre_participante, Participante.saldo_merienda, Participante.ultimo_registro_at,
+               Participante.committe_id)
+        .where(_del_participante(participante_id, evento_id))
+    ).first()
+
+    if fila is None:
+        return ResultadoRedencion(DESCONOCIDO, participante_id)
+
+    nombre, saldo, fecha_ultimo, committe_id = fila
+    if saldo <= 0:
+        return ResultadoRedencion(SIN_SALDO, participante_id, nombre=nombre, saldo_restante=0, committe_id=committe_id)
+
+    return ResultadoRedencion(COOLDOWN, participante_id, nombre=nombre, saldo_restante=saldo,
+                              minutos_restantes=minutos_restantes(cooldown_minutos, ahora, fecha_ultimo),
+                              committe_id=committe_id)
+
+
+def minutos_restantes(cooldown_minutos, ahora, fecha_ultimo):
+    """Minutos (redondeados) que faltan para que termine el cooldown de la última entrega."""
+    tiempo_restante = timedelta(minutes=cooldown_minutos) - (ahora - fecha_ultimo) if fecha_ultimo else timedelta(0)
+    return min(max(round(tiempo_restante.total_seconds() / 60), 0), cooldown_minutos)
+
+
+def redimir_lote(escaneos, operador_id, cooldown_minutos, evento_id=None, zona_horaria=tiempo.ZONA_PREDETERMINADA):
+    """
+    Aplica un lote de escaneos hechos sin conexión en un dispositivo.
+
+    Los escaneos se procesan en orden cronológico con las mismas reglas que un
+    escaneo en línea, usando como `ahora` la hora en que se escaneó el carné.
+    Cada escaneo es una transacción independiente, así que un rechazo no afecta
+    al resto del lote. Si otro dispositivo ya registró una entrega dentro de la
+    ventana de cooldown (antes o después de la hora del escaneo), el escaneo se
+    rechaza: nunca se entregan dos meriendas dentro del mismo periodo. Un escaneo
+    anterior a la última entrega, pero a más de un cooldown de ella y de
+    cualquier otra, se acepta.
+
+    Args:
+        escaneos (list[dict]): elementos con `id_participante` (int) y `fecha_hora` (datetime UTC naive).
+
+    Returns:
+        list[tuple[dict, ResultadoRedencion]]: cada escaneo junto a su resultado, en orden cronológico.
+    """
+    resultados = []
+    for escaneo in sorted(escaneos, key=lambda e: e['fecha_hora']):
+        resultado = redimir_merienda(
+            escaneo['id_participante'], operador_id, cooldown_minutos, ahora=escaneo['fecha_hora'], evento_id=evento_id,
+            zona_horaria=zona_horaria,
+        )
+        resultados.append((escaneo, resultado))
+    return resultados
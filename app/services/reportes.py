@@ -0,0 +1,274 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_, select, true
+
+from app.models.models import (
+    Committe, Configuracion, InstitucionEducativa, Participante, ParticipanteArchivado, Registro, RegistroArchivado, User,
+)
+from app.services import tiempo
+
+# Tamaño de página por defecto y máximo permitido
+POR_PAGINA = 50
+MAX_POR_PAGINA = 200
+
+# Columnas por las que se puede ordenar el reporte (nombre de la columna en la consulta,
+# que es el mismo en las tablas en uso y en las de archivo)
+SORT_COLUMNS = {
+    'fecha_hora': 'fecha_hora',
+    'participante': 'nombre_participante',
+    'saldo': 'saldo_merienda',
+    'committe': 'nombre_committe',
+    'institucion': 'nombre_institucion',
+    'operador': 'username',
+}
+
+
+class FiltroInvalido(ValueError):
+    """Un parámetro del reporte no tiene el formato esperado."""
+
+
+def filtros_desde_args(args):
+    """
+    Lee de la query string los filtros y la ordenación del reporte.
+
+    Returns:
+        dict: evento_id, fecha, participante_id, committe_id, institucion_id (como
+        texto, tal como llegan, para mantener el estado del formulario), sort_by y order.
+    """
+    sort_by = args.get('sort_by', 'fecha_hora')
+    return {
+        'evento_id': args.get('evento_id') or None,
+        'fecha': args.get('fecha') or None,
+        'participante_id': args.get('participante_id') or None,
+        'committe_id': args.get('committe_id') or None,
+        'institucion_id': args.get('institucion_id') or None,
+        'sort_by': sort_by if sort_by in SORT_COLUMNS else 'fecha_hora',
+        'order': 'asc' if args.get('order') == 'asc' else 'desc',
+    }
+
+
+def resolver_evento(session, filtros, evento_activo_id, zona_activa=tiempo.ZONA_PREDETERMINADA):
+    """
+    Fija el evento del reporte: el elegido en el filtro o, si no hay, el activo.
+
+    Añade a `filtros` las claves `evento` (id), `archivado` (si sus registros ya
+    están en las tablas de archivo) y `zona` (su zona horaria, para el filtro por
+    día y las fechas mostradas). Solo consulta la base de datos cuando se pide un
+    evento distinto del activo.
+
+    Raises:
+        FiltroInvalido: si el evento no existe.
+    """
+    filtros['evento'], filtros['archivado'], filtros['zona'] = evento_activo_id, False, zona_activa
+    if not filtros['evento_id'] or filtros['evento_id'] == str(evento_activo_id):
+        return filtros
+    try:
+        evento_id = int(filtros['evento_id'])
+    except ValueError:
+        raise FiltroInvalido('Evento inválido.')
+    fila = session.execute(
+        select(Configuracion.archivado_at, Configuracion.zona_horaria).where(Configuracion.id_config == evento_id)
+    ).first()
+    if fila is None:
+        raise FiltroInvalido('El evento no existe.')
+    filtros['evento'], filtros['archivado'] = evento_id, fila.archivado_at is not None
+    filtros['zona'] = fila.zona_horaria or tiempo.ZONA_PREDETERMINADA
+    return filtros
+
+
+def consulta_reporte(filtros):
+    """
+    Construye la consulta del reporte con los filtros aplicados.
+
+    Selecciona solo las columnas que se muestran (sin cargar objetos ni relaciones),
+    así que cada página se resuelve con una única consulta. Los eventos archivados
+    se leen de `registro_archivado`, que ya tiene los nombres resueltos. El filtro
+    por fecha se refiere al día local del evento y se traduce a un rango UTC sobre
+    `fecha_hora`, que puede resolverse con el índice (evento_id, fecha_hora).
+
+    Raises:
+        FiltroInvalido: si la fecha no tiene formato AAAA-MM-DD.
+    """
+    if filtros.get('archivado'):
+        r = RegistroArchivado
+        consulta = select(
+            r.id_registro, r.fecha_hora, r.id_participante, r.nombre_participante, r.saldo_merienda,
+            r.nombre_committe, r.nombre_institucion, r.username,
+        )
+        evento, fecha_hora, participante_id, committe_id, institucion_id = (
+            r.evento_id, r.fecha_hora, r.id_participante, r.committe_id, r.institucion_id
+        )
+    else:
+        consulta = (
+            select(
+                Registro.id_registro,
+                Registro.fecha_hora,
+                Participante.id_participante,
+                Participante.nombre_participante,
+                Participante.saldo_merienda,
+                Committe.nombre_committe,
+                InstitucionEducativa.nombre_institucion,
+                User.username,
+            )
+            .join(Participante, Registro.participante)
+            .join(User, Registro.operador)
+            .join(Committe, Participante.committe)
+            .join(InstitucionEducativa, Participante.institucion)
+        )
+        evento, fecha_hora, participante_id, committe_id, institucion_id = (
+            Registro.evento_id, Registro.fecha_hora, Registro.id_participante, Participante.committe_id,
+            Participante.institucion_id,
+        )
+
+    if filtros.get('evento') is not None:
+        consulta = consulta.where(evento == filtros['evento'])
+
+    if filtros['fecha']:
+        try:
+            fecha_obj = datetime.strptime(filtros['fecha'], '%Y-%m-%d').date()
+        except ValueError:
+            raise FiltroInvalido('Formato de fecha inválido.')
+        inicio, fin = tiempo.rango_utc_del_dia(fecha_obj, filtros.get('zona', tiempo.ZONA_PREDETERMINADA))
+        consulta = consulta.where(fecha_hora >= inicio, fecha_hora < fin)
+
+    if filtros['participante_id']:
+        consulta = consulta.where(participante_id == filtros['participante_id'])
+    if filtros['committe_id']:
+        consulta = consulta.where(committe_id == filtros['committe_id'])
+    if filtros['institucion_id']:
+        consulta = consulta.where(institucion_id == filtros['institucion_id'])
+
+    return consulta
+
+
+def columnas_orden(consulta, sort_by):
+    """Columna ordenada y `id_registro` (desempate) de una consulta de `consulta_reporte`."""
+    columnas = consulta.selected_columns
+    return columnas[SORT_COLUMNS[sort_by]], columnas['id_registro']
+
+
+# --- Paginación por cursor (keyset) ---
+
+# Dirección del cursor: página siguiente o anterior
+SIGUIENTE = 'sig'
+ANTERIOR = 'ant'
+
+def _codificar_cursor(valor, id_registro, direccion):
+    if isinstance(valor, datetime):
+        valor = valor.isoformat()
+    datos = json.dumps([valor, id_registro, direccion], separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decodificar_cursor(cursor, sort_by):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valor, id_registro, direccion = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if direccion not in (SIGUIENTE, ANTERIOR) or not isinstance(valor, (str, int, float)):
+            raise ValueError(direccion)
+        if sort_by == 'fecha_hora':
+            valor = datetime.fromisoformat(valor)
+        return valor, int(id_registro), direccion
+    except (ValueError, TypeError):
+        raise FiltroInvalido('Cursor de paginación inválido.')
+
+
+def paginar(session, consulta, filtros, cursor=None, por_pagina=POR_PAGINA):
+    """
+    Devuelve una página del reporte usando paginación por cursor sobre la columna ordenada.
+
+    En lugar de OFFSET (que obliga a recorrer todas las filas anteriores), cada
+    página continúa a partir del último valor visto de (columna, id_registro), por
+    lo que pedir la página 1 o la 500 cuesta lo mismo.
+
+    Returns:
+        dict: `registros` (filas), `siguiente` y `anterior` (cursores o None).
+    """
+    por_pagina = max(1, min(int(por_pagina or POR_PAGINA), MAX_POR_PAGINA))
+    columna, id_registro = columnas_orden(consulta, filtros['sort_by'])
+    ascendente = filtros['order'] == 'asc'
+
+    direccion = SIGUIENTE
+    if cursor:
+        valor, ultimo_id, direccion = _decodificar_cursor(cursor, filtros['sort_by'])
+        # Hacia atrás se recorre en el orden inverso y luego se da vuelta la página
+        avanza = ascendente if direccion == SIGUIENTE else not ascendente
+        if avanza:
+            condicion = or_(columna > valor, and_(columna == valor, id_registro > ultimo_id))
+        else:
+            condicion = or_(columna < valor, and_(columna == valor, id_registro < ultimo_id))
+        consulta = consulta.where(condicion)
+
+    orden_ascendente = ascendente if direccion == SIGUIENTE else not ascendente
+    if orden_ascendente:
+        consulta = consulta.order_by(columna.asc(), id_registro.asc())
+    else:
+        consulta = consulta.order_by(columna.desc(), id_registro.desc())
+
+    filas = session.execute(consulta.limit(por_pagina + 1)).all()
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+    if direccion == ANTERIOR:
+        filas.reverse()
+
+    def cursor_de(fila, dir_):
+        return _codificar_cursor(getattr(fila, columna.key), fila.id_registro, dir_)
+
+    siguiente = anterior = None
+    if filas:
+        if direccion == SIGUIENTE:
+            siguiente = cursor_de(filas[-1], SIGUIENTE) if hay_mas else None
+            anterior = cursor_de(filas[0], ANTERIOR) if cursor else None
+        else:
+            siguiente = cursor_de(filas[-1], SIGUIENTE)
+            anterior = cursor_de(filas[0], ANTERIOR) if hay_mas else None
+
+    return {'registros': filas, 'siguiente': siguiente, 'anterior': anterior, 'por_pagina': por_pagina}
+
+
+def buscar_participantes(session, texto, limite=20, evento_id=None, archivado=False):
+    """
+    Búsqueda para el autocompletado del filtro de participante.
+
+    Primero busca por prefijo del nombre (usa el índice por evento y nombre) y, si
+    faltan resultados, completa con coincidencias en cualquier parte del nombre. Un
+    número se interpreta además como id de participante.
+    """
+    texto = (texto or '').strip()
+    if len(texto) < 2 and not texto.isdigit():
+        return []
+
+    patron = texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    modelo = ParticipanteArchivado if archivado else Participante
+    columnas = select(modelo.id_participante, modelo.nombre_participante)
+    if evento_id is not None:
+        columnas = columnas.where(modelo.evento_id == evento_id)
+    resultados = []
+    if texto.isdigit():
+        resultados += session.execute(columnas.where(modelo.id_participante == int(texto))).all()
+
+    resultados += session.execute(
+        columnas.where(modelo.nombre_participante.like(f'{patron}%', escape='\\'))
+        .order_by(modelo.nombre_participante)
+        .limit(limite)
+    ).all()
+    if len(resultados) < limite:
+        vistos = [r.id_participante for r in resultados]
+        resultados += session.execute(
+            columnas.where(
+                modelo.nombre_participante.like(f'%{patron}%', escape='\\'),
+                modelo.id_participante.notin_(vistos) if vistos else true(),
+            )
+            .order_by(modelo.nombre_participante)
+            .limit(limite - len(resultados))
+        ).all()
+
+    vistos = set()
+    unicos = []
+    for r in resultados:
+        if r.id_participante not in vistos:
+            vistos.add(r.id_participante)
+            unicos.append({'id': r.id_participante, 'nombre': r.nombre_participante})
+    return unicos[:limite]
@@ -0,0 +1,93 @@
+import time
+
+from sqlalchemy import text
+
+from app import db
+
+
+def opciones_motor(uri, entorno):
+    """
+    Opciones del pool de conexiones (`SQLALCHEMY_ENGINE_OPTIONS`) a partir de variables de entorno.
+
+    - DB_POOL_PRE_PING (1): comprueba la conexión antes de usarla, así la primera
+      petición tras un periodo sin actividad no falla con una conexión muerta.
+    - DB_POOL_RECYCLE (280): segundos tras los que se renueva una conexión; debe
+      ser menor que el `wait_timeout` de MySQL y que el de cualquier proxy.
+    - DB_POOL_SIZE (10), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT (10): tamaño del
+      pool por proceso, conexiones extra permitidas y segundos de espera por una.
+    - DB_CONNECT_TIMEOUT (5), DB_READ_TIMEOUT / DB_WRITE_TIMEOUT (sin límite):
+      tiempos de espera de PyMySQL, en segundos.
+    """
+    opciones = {
+        'pool_pre_ping': entorno.get('DB_POOL_PRE_PING', '1') not in ('0', 'false', 'False'),
+        'pool_recycle': int(entorno.get('DB_POOL_RECYCLE', 280)),
+    }
+    if uri.startswith('sqlite'):
+        return opciones
+
+    opciones.update({
+        'pool_size': int(entorno.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(entorno.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(entorno.get('DB_POOL_TIMEOUT', 10)),
+    })
+    connect_args = {'connect_timeout': int(entorno.get('DB_CONNECT_TIMEOUT', 5))}
+    for variable, argumento in (('DB_READ_TIMEOUT', 'read_timeout'), ('DB_WRITE_TIMEOUT', 'write_timeout')):
+        if entorno.get(variable):
+            connect_args[argumento] = int(entorno[variable])
+    opciones['connect_args'] = connect_args
+    return opciones
+
+
+def comprobar_base_de_datos():
+    """
+    Ejecuta un `SELECT 1` y mide cuánto tarda.
+
+    Returns:
+        dict: `ok` (bool), `latencia_ms` y, si falló, `error`.
+    """
+    t0 = time.perf_counter()
+    try:
+        with db.engine.connect() as conn:
+            conn.execute(text('SELECT 1'))
+    except Exception as e:
+        return {'ok': False, 'error': str(e).splitlines()[0]}
+    return {'ok': True, 'latencia_ms': round((time.perf_counter() - t0) * 1000, 2)}
+
+
+def estado_pool():
+    """Uso del pool de conexiones del proceso actual."""
+    pool = db.engine.pool
+    estado = {'tipo': type(pool).__name__}
+    if hasattr(pool, 'checkedout'):
+        tamano = pool.size()
+        en_uso = pool.checkedout()
+        estado.update({
+            'tamano': tamano,
+            'en_uso': en_uso,
+            'disponibles': pool.checkedin(),
+            'desbordadas': max(pool.overflow(), 0),
+            'max_desborde': getattr(pool, '_max_overflow', 0),
+            'utilizacion': round(en_uso / (tamano + max(getattr(pool, '_max_overflow', 0), 0)), 3)
+            if tamano else None,
+        })
+    return estado
+
+
+def esperar_base_de_datos(app, intentos=5, espera=2.0):
+    """
+    Comprobación de arranque: espera a que la base de datos responda.
+
+    Reintenta con espera creciente y, si no hay conexión, lanza RuntimeError para
+    que el servidor no arranque sirviendo errores a los escáneres.
+    """
+    with app.app_context():
+        for intento in range(1, intentos + 1):
+            resultado = comprobar_base_de_datos()
+            if resultado['ok']:
+                app.logger.info('Base de datos disponible (%.1f ms).', resultado['latencia_ms'])
+                return resultado
+            app.logger.warning('Base de datos no disponible (intento %d de %d): %s',
+                               intento, intentos, resultado['error'])
+            if intento < intentos:
+                time.sleep(espera * intento)
+    raise RuntimeError(f"No se pudo conectar a la base de datos: {resultado['error']}")
@@ -0,0 +1,321 @@
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import socket
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.services import fotos, qr_cache
+
+# Estados posibles de una tarea
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+COMPLETADA = 'completada'
+ERROR = 'error'
+
+# Las tareas terminadas (y sus ZIP) se borran pasado este tiempo
+HORAS_RETENCION = 24
+# Una tarea en curso que no avanza en este tiempo se da por interrumpida
+MINUTOS_SIN_PROGRESO = 15
+
+_ID_VALIDO = re.compile(r'^[0-9a-f]{32}$')
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool(workers):
+    """Pool de procesos compartido por todas las tareas del worker web."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn' evita heredar los hilos y conexiones abiertas del servidor web
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def _descartar_pool(pool):
+    """
+    Desecha un pool roto (un proceso hijo murió, p. ej. por falta de memoria) para
+    que la siguiente tarea cree uno nuevo en lugar de fallar hasta reiniciar el worker.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _renderizar_qr(item):
+    """Se ejecuta en un proceso del pool: genera el PNG directamente en la caché de QR."""
+    nombre_archivo, datos, ruta = item
+    return nombre_archivo, qr_cache.escribir_png(ruta, datos)
+
+
+# --- Estado persistido en disco (visible para todos los workers) ---
+
+def _ruta_estado(carpeta, tarea_id):
+    return os.path.join(carpeta, f'{tarea_id}.json')
+
+
+def ruta_zip(carpeta, tarea_id):
+    return os.path.join(carpeta, f'{tarea_id}.zip')
+
+
+def _guardar_estado(carpeta, estado):
+    estado['actualizada_en'] = time.time()
+    temporal = _ruta_estado(carpeta, estado['id']) + '.tmp'
+    with open(temporal, 'w') as f:
+        json.dump(estado, f)
+    os.replace(temporal, _ruta_estado(carpeta, estado['id']))
+
+
+def obtener_estado(carpeta, tarea_id):
+    """Devuelve el estado de la tarea o None si el id no existe."""
+    if not _ID_VALIDO.match(tarea_id or ''):
+        return None
+    try:
+        with open(_ruta_estado(carpeta, tarea_id)) as f:
+            estado = json.load(f)
+    except FileNotFoundError:
+        return None
+    if estado['estado'] in (PENDIENTE, EN_PROCESO) and _interrumpida(estado):
+        estado['estado'] = ERROR
+        estado['error'] = 'La tarea se interrumpió (se reinició el servidor). Vuelva a lanzarla.'
+        _guardar_estado(carpeta, estado)
+    return estado
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _interrumpida(estado):
+    """
+    True si la tarea quedó a medias: el proceso que la ejecutaba ya no existe
+    (reinicio o reciclado del worker) o lleva `MINUTOS_SIN_PROGRESO` sin avanzar.
+    El proceso solo se comprueba si la tarea se lanzó en esta misma máquina.
+    """
+    if estado.get('host') == socket.gethostname() and not _proceso_vivo(estado['pid']):
+        return True
+    actualizada = estado.get('actualizada_en', estado['creada_en'])
+    return time.time() - actualizada > MINUTOS_SIN_PROGRESO * 60
+
+
+def _nuevo_estado(tipo, total, **extra):
+    return {
+        'id': uuid.uuid4().hex,
+        'tipo': tipo,
+        'estado': PENDIENTE,
+        'total': total,
+        'procesados': 0,
+        **extra,
+        'error': None,
+        'creada_en': time.time(),
+        # Proceso que ejecuta la tarea, para detectar las que quedaron huérfanas
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+    }
+
+
+def _limpiar_antiguas(carpeta):
+    limite = time.time() - HORAS_RETENCION * 3600
+    for nombre in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except FileNotFoundError:
+            # Otro worker la borró al mismo tiempo
+            continue
+
+
+# --- Generación del ZIP de códigos QR ---
+
+def iniciar_zip_qrs(items, carpeta, carpeta_cache, workers=None):
+    """
+    Lanza en segundo plano la generación del ZIP con los QR de los participantes.
+
+    Solo se renderizan los QR que no están en la caché (participantes nuevos o
+    cuyos datos cambiaron), en paralelo en un pool de procesos locales. Los PNG
+    se escriben uno a uno en un ZIP en disco, así que ni la petición ni la memoria
+    del worker dependen del número de participantes. Al terminar se desalojan de
+    la caché los QR que ya no corresponden a ningún participante.
+
+    Args:
+        items (list[tuple[str, dict]]): (nombre del PNG dentro del ZIP, datos del QR).
+        carpeta (str): carpeta donde se guardan el ZIP y el estado de la tarea.
+        carpeta_cache (str): carpeta de la caché de QR.
+        workers (int): procesos del pool; por defecto, uno por núcleo.
+
+    Returns:
+        str: el id de la tarea.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    _limpiar_antiguas(carpeta)
+
+    estado = _nuevo_estado('qrs', len(items), regenerados=0)
+    _guardar_estado(carpeta, estado)
+
+    pool = _obtener_pool(workers or os.cpu_count())
+    hilo = threading.Thread(target=_generar_zip, args=(pool, items, carpeta, carpeta_cache, estado), daemon=True)
+    hilo.start()
+    return estado['id']
+
+
+def _generar_zip(pool, items, carpeta, carpeta_cache, estado):
+    destino = ruta_zip(carpeta, estado['id'])
+    parcial = destino + '.part'
+    # Se actualiza el progreso en disco aproximadamente cada 2%
+    paso = max(len(items) // 50, 1)
+    try:
+        estado['estado'] = EN_PROCESO
+        os.makedirs(carpeta_cache, exist_ok=True)
+        en_cache, pendientes = [], []
+        for nombre_archivo, datos in items:
+            ruta = qr_cache.ruta_en_cache(carpeta_cache, datos)
+            if os.path.exists(ruta):
+                en_cache.append((nombre_archivo, ruta))
+            else:
+                pendientes.append((nombre_archivo, datos, ruta))
+        estado['regenerados'] = len(pendientes)
+        _guardar_estado(carpeta, estado)
+
+        renderizados = pool.map(_renderizar_qr, pendientes, chunksize=16)
+        # Los PNG ya vienen comprimidos: ZIP_STORED evita recomprimirlos sin ganar espacio
+        with zipfile.ZipFile(parcial, 'w', zipfile.ZIP_STORED) as zf:
+            for i, (nombre_archivo, ruta) in enumerate(itertools.chain(en_cache, renderizados), start=1):
+                zf.write(ruta, nombre_archivo)
+                if i % paso == 0:
+                    estado['procesados'] = i
+                    _guardar_estado(carpeta, estado)
+        os.replace(parcial, destino)
+        qr_cache.desalojar(carpeta_cache, [datos for _, datos in items])
+        estado['procesados'] = len(items)
+        estado['estado'] = COMPLETADA
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            _descartar_pool(pool)
+        estado['estado'] = ERROR
+        estado['error'] = str(e)
+        if os.path.exists(parcial):
+            os.remove(parcial)
+    _guardar_estado(carpeta, estado)
+
+
+# --- Importación de fotos desde un ZIP ---
+
+def _foto_desde_zip(item):
+    """Se ejecuta en un proceso del pool: extrae una foto del ZIP, la guarda y genera sus derivadas."""
+    ruta_zip, miembro, participante_id, carpeta_fotos, carpeta_derivadas = item
+    try:
+        with zipfile.ZipFile(ruta_zip) as zf:
+            contenido = zf.read(miembro)
+        nombre = fotos.guardar_foto(
+            contenido, os.path.splitext(miembro)[1], participante_id, carpeta_fotos, carpeta_derivadas
+        )
+        return miembro, participante_id, nombre, None
+    except (fotos.FotoInvalida, zipfile.BadZipFile, KeyError) as e:
+        return miembro, participante_id, None, str(e)
+
+
+def iniciar_importacion_fotos(app, ruta_zip, asignaciones, omitidas, carpeta, carpeta_fotos, carpeta_derivadas,
+                              workers=None):
+    """
+    Lanza en segundo plano la importación de un ZIP de fotos de participantes.
+
+    Cada foto se decodifica, se reduce y se codifica (JPEG y WebP) en el pool de
+    procesos, en paralelo. Al final se actualiza `foto_participante` de todos los
+    participantes con un único UPDATE por lotes y se borran las fotos que fueron
+    reemplazadas. El ZIP subido se elimina al terminar.
+
+    Args:
+        app (Flask): la aplicación, para abrir un contexto en el hilo de la tarea.
+        asignaciones (list[tuple[str, int]]): (archivo dentro del ZIP, id del participante).
+        omitidas (list[tuple[str, str]]): archivos descartados de antemano y su motivo.
+
+    Returns:
+        str: el id de la tarea.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    _limpiar_antiguas(carpeta)
+
+    estado = _nuevo_estado(
+        'fotos', len(asignaciones),
+        importadas=0, omitidas=[{'archivo': archivo, 'motivo': motivo} for archivo, motivo in omitidas],
+    )
+    _guardar_estado(carpeta, estado)
+
+    items = [(ruta_zip, miembro, pid, carpeta_fotos, carpeta_derivadas) for miembro, pid in asignaciones]
+    pool = _obtener_pool(workers or os.cpu_count())
+    hilo = threading.Thread(
+        target=_importar_fotos, args=(app, pool, items, ruta_zip, carpeta, carpeta_fotos, carpeta_derivadas, estado),
+        daemon=True,
+    )
+    hilo.start()
+    return estado['id']
+
+
+def _importar_fotos(app, pool, items, ruta_zip, carpeta, carpeta_fotos, carpeta_derivadas, estado):
+    from sqlalchemy import bindparam, select, update
+
+    from app import db
+    from app.models.models import Participante
+
+    paso = max(len(items) // 50, 1)
+    nuevas = {}
+    try:
+        estado['estado'] = EN_PROCESO
+        _guardar_estado(carpeta, estado)
+        for i, (miembro, participante_id, nombre, error) in enumerate(
+            pool.map(_foto_desde_zip, items, chunksize=4), start=1
+        ):
+            if error:
+                estado['omitidas'].append({'archivo': miembro, 'motivo': error})
+            else:
+                nuevas[participante_id] = nombre
+            if i % paso == 0:
+                estado['procesados'] = i
+                _guardar_estado(carpeta, estado)
+
+        with app.app_context():
+            anteriores = dict(db.session.execute(
+                select(Participante.id_participante, Participante.foto_participante)
+                .where(Participante.id_participante.in_(list(nuevas)))
+            ).all()) if nuevas else {}
+            if nuevas:
+                db.session.execute(
+                    update(Participante.__table__)
+                    .where(Participante.__table__.c.id_participante == bindparam('pid'))
+                    .values(foto_participante=bindparam('nombre')),
+                    [{'pid': pid, 'nombre': nombre} for pid, nombre in nuevas.items()],
+                )
+                db.session.commit()
+            db.session.remove()
+
+        for pid, anterior in anteriores.items():
+            if anterior and anterior != nuevas[pid]:
+                fotos.eliminar_foto(anterior, carpeta_fotos, carpeta_derivadas)
+        estado['procesados'] = len(items)
+        estado['importadas'] = len(nuevas)
+        estado['estado'] = COMPLETADA
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            _descartar_pool(pool)
+        estado['estado'] = ERROR
+        estado['error'] = str(e)
+    finally:
+        if os.path.exists(ruta_zip):
+            os.remove(ruta_zip)
+    _guardar_estado(carpeta, estado)
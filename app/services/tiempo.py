@@ -0,0 +1,102 @@
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+import pandas as pd
+
+# Zona horaria de los eventos que no tienen una configurada
+ZONA_PREDETERMINADA = 'America/Bogota'
+# Formato con el que se muestran las fechas en reportes y exportaciones (12 horas con AM/PM)
+FORMATO_FECHA_HORA = '%Y-%m-%d %I:%M:%S %p'
+
+
+class ZonaInvalida(ValueError):
+    """El nombre no corresponde a una zona horaria de la base IANA."""
+
+
+@lru_cache(maxsize=32)
+def zona(nombre):
+    """
+    Objeto de zona horaria por nombre IANA (`America/Bogota`), creado una sola vez por proceso.
+
+    Raises:
+        ZonaInvalida: si la zona no existe.
+    """
+    try:
+        return ZoneInfo(nombre or ZONA_PREDETERMINADA)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ZonaInvalida(f'Zona horaria desconocida: {nombre}.')
+
+
+@lru_cache(maxsize=1)
+def zonas_disponibles():
+    """Nombres de zona para el selector de la configuración, ordenados."""
+    return sorted(available_timezones())
+
+
+def zona_del_evento(config):
+    """Nombre de la zona horaria de un evento (fila o copia de `Configuracion`), o la predeterminada."""
+    return getattr(config, 'zona_horaria', None) or ZONA_PREDETERMINADA
+
+
+def a_local(fecha_utc, nombre_zona=ZONA_PREDETERMINADA):
+    """Convierte una fecha UTC naive (como se guarda en la base de datos) a la hora local del evento."""
+    return fecha_utc.replace(tzinfo=timezone.utc).astimezone(zona(nombre_zona))
+
+
+def formatear(fecha_utc, nombre_zona=ZONA_PREDETERMINADA, formato=FORMATO_FECHA_HORA):
+    """Texto de una fecha UTC naive en la hora local del evento ('' si no hay fecha)."""
+    if not fecha_utc:
+        return ''
+    return a_local(fecha_utc, nombre_zona).strftime(formato)
+
+
+def _serie_local(fechas, nombre_zona):
+    return pd.Series(pd.to_datetime(list(fechas)), dtype='datetime64[ns]').dt.tz_localize('UTC').dt.tz_convert(
+        zona(nombre_zona)
+    )
+
+
+def formatear_lote(fechas, nombre_zona=ZONA_PREDETERMINADA, formato=FORMATO_FECHA_HORA):
+    """
+    Versión vectorizada de `formatear` para muchas fechas a la vez (una página del
+    reporte o un lote de la exportación): pandas convierte y formatea la columna
+    completa en lugar de hacer una conversión por celda.
+
+    Returns:
+        list[str]: los textos, en el mismo orden ('' donde la fecha es None).
+    """
+    if not fechas:
+        return []
+    return _serie_local(fechas, nombre_zona).dt.strftime(formato).fillna('').tolist()
+
+
+def claves_dia_hora_lote(fechas, nombre_zona=ZONA_PREDETERMINADA):
+    """
+    Día y hora locales de un lote de fechas UTC, como las claves de los contadores
+    del dashboard ('2025-12-01', '2025-12-01 10').
+
+    Returns:
+        list[tuple[str, str]]: (día, hora) por fecha.
+    """
+    if not fechas:
+        return []
+    horas = _serie_local(fechas, nombre_zona).dt.strftime('%Y-%m-%d %H')
+    return [(hora[:10], hora) for hora in horas]
+
+
+def rango_utc_del_dia(dia, nombre_zona=ZONA_PREDETERMINADA):
+    """
+    Límites en UTC naive de un día local del evento, para filtrar `fecha_hora` con el índice.
+
+    El intervalo es semiabierto, [inicio, fin): se filtra con `>= inicio` y `< fin`,
+    de modo que no se pierde el último segundo del día ni se cuenta dos veces la
+    medianoche. En los días con cambio de horario dura 23 o 25 horas.
+    """
+    zona_evento = zona(nombre_zona)
+    inicio = datetime.combine(dia, time.min, tzinfo=zona_evento)
+    fin = datetime.combine(dia + timedelta(days=1), time.min, tzinfo=zona_evento)
+    return (
+        inicio.astimezone(timezone.utc).replace(tzinfo=None),
+        fin.astimezone(timezone.utc).replace(tzinfo=None),
+    )
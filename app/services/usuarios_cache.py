@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+
+from flask_login import UserMixin
+from sqlalchemy import select
+
+from app import db
+from app.models.models import User
+
+
+class UsuarioSesion(UserMixin):
+    """Identidad del usuario autenticado: copia de solo lectura, sin sesión de SQLAlchemy."""
+
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+
+class CacheUsuarios:
+    """
+    Caché en memoria de los usuarios con sesión iniciada, para el `user_loader`.
+
+    Sin ella, Flask-Login consulta la tabla de usuarios en cada petición (también
+    en cada escaneo). Cada proceso guarda id, nombre y rol durante `USER_CACHE_TTL`
+    segundos. Igual que `config_cache`, `invalidar()` reescribe un archivo de
+    versión en `instance` y los demás workers vacían su copia en cuanto cambia su
+    fecha de modificación, así que editar o eliminar un usuario surte efecto en la
+    siguiente petición.
+    """
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._usuarios = {}
+        self._version = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_TTL', 60)
+        app.config.setdefault('USER_CACHE_VERSION_FILE', os.path.join(app.instance_path, 'usuarios.version'))
+        os.makedirs(os.path.dirname(app.config['USER_CACHE_VERSION_FILE']), exist_ok=True)
+        app.extensions['usuarios_cache'] = self
+        self._ttl = app.config['USER_CACHE_TTL']
+        self._archivo_version = app.config['USER_CACHE_VERSION_FILE']
+
+    def obtener(self, user_id):
+        """Devuelve el usuario (o None si no existe) sin consultar la base de datos si está en caché."""
+        version = self._leer_version()
+        with self._lock:
+            if version != self._version:
+                self._usuarios.clear()
+                self._version = version
+            guardado = self._usuarios.get(user_id)
+        if guardado and time.monotonic() - guardado[1] < self._ttl:
+            return guardado[0]
+
+        fila = db.session.execute(
+            select(User.id, User.username, User.role).where(User.id == user_id)
+        ).first()
+        if fila is None:
+            return None
+        usuario = UsuarioSesion(fila.id, fila.username, fila.role)
+        with self._lock:
+            if version == self._version:
+                self._usuarios[user_id] = (usuario, time.monotonic())
+        return usuario
+
+    def invalidar(self):
+        """Descarta los usuarios en caché de todos los workers (tras editar o eliminar uno)."""
+        with self._lock:
+            self._usuarios.clear()
+            with open(self._archivo_version, 'w') as f:
+                f.write(str(time.time_ns()))
+
+    def _leer_version(self):
+        try:
+            return os.stat(self._archivo_version).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+
+def costo_hash(hash_clave):
+    """Factor de trabajo de un hash bcrypt (`$2b$12$...` -> 12), o None si no se reconoce."""
+    try:
+        return int(hash_clave.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+usuarios_cache = CacheUsuarios()
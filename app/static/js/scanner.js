@@ -6,34 +6,180 @@ document.addEventListener('DOMContentLoaded', function() {
     const cameraSelectorContainer = document.getElementById('camera-selector-container');
     const cameraSelector = document.getElementById('camera-selector');
     
+    const syncUrl = qrReaderContainer.dataset.syncUrl;
+    const queueStatus = document.getElementById('offline-queue-status');
+
     let lastResult = null;
     let html5QrcodeScanner; // Hacemos el scanner una variable global en este scope
 
-    // --- Lógica de Escaneo Exitoso (sin cambios) ---
+    // --- INICIO: COLA DE ESCANEOS SIN CONEXIÓN (IndexedDB) ---
+    const DB_NAME = 'mun-snack-offline';
+    const STORE_NAME = 'escaneos';
+    const SYNC_BATCH_SIZE = 50;
+    const SYNC_INTERVAL_MS = 15000;
+    let syncing = false;
+
+    function openQueue() {
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(STORE_NAME, { keyPath: 'id_local' });
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function queueTransaction(mode, action) {
+        return openQueue().then(db => new Promise((resolve, reject) => {
+            const tx = db.transaction(STORE_NAME, mode);
+            const result = action(tx.objectStore(STORE_NAME));
+            tx.oncomplete = () => resolve(result.result !== undefined ? result.result : result);
+            tx.onerror = () => reject(tx.error);
+        }));
+    }
+
+    function newScanKey() {
+        return (self.crypto && crypto.randomUUID) ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`;
+    }
+
+    // El id_local es la misma clave de idempotencia enviada a validar_qr: si el escaneo
+    // ya llegó al servidor, la sincronización recibe la respuesta original
+    function enqueueScan(qrText, scanKey) {
+        const scan = {
+            id_local: scanKey || newScanKey(),
+            qr: qrText,
+            fecha_hora: new Date().toISOString()
+        };
+        return queueTransaction('readwrite', store => store.put(scan)).then(updateQueueStatus);
+    }
+
+    function pendingScans() {
+        return queueTransaction('readonly', store => store.getAll());
+    }
+
+    function removeScans(ids) {
+        return queueTransaction('readwrite', store => { ids.forEach(id => store.delete(id)); return {}; });
+    }
+
+    function updateQueueStatus() {
+        return pendingScans().then(scans => {
+            if (!queueStatus) return;
+            queueStatus.textContent = scans.length ? `${scans.length} escaneo(s) pendientes de sincronizar.` : '';
+            queueStatus.classList.toggle('hidden', scans.length === 0);
+        });
+    }
+
+    // Envía la cola al servidor en lotes; solo se borran los escaneos que el servidor procesó
+    function flushQueue() {
+        if (syncing || !navigator.onLine) return Promise.resolve();
+        syncing = true;
+        return pendingScans().then(scans => {
+            scans.sort((a, b) => a.fecha_hora.localeCompare(b.fecha_hora));
+            const batches = [];
+            for (let i = 0; i < scans.length; i += SYNC_BATCH_SIZE) {
+                batches.push(scans.slice(i, i + SYNC_BATCH_SIZE));
+            }
+            return batches.reduce((chain, batch) => chain.then(() =>
+                fetch(syncUrl, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ escaneos: batch }) })
+                    .then(response => {
+                        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                        return response.json();
+                    })
+                    .then(data => {
+                        const processed = data.resultados.map(r => r.id_local);
+                        const rejected = data.resultados.filter(r => !r.success).length;
+                        if (rejected) {
+                            resultContainer.innerHTML = `<div class="p-4 rounded bg-yellow-100 text-yellow-800">Sincronización: ${rejected} escaneo(s) guardado(s) sin conexión fueron rechazados (cooldown o sin saldo).</div>`;
+                        }
+                        return removeScans(processed);
+                    })
+            ), Promise.resolve());
+        }).catch(error => {
+            console.error('Fallo al sincronizar escaneos pendientes:', error);
+        }).finally(() => {
+            syncing = false;
+            updateQueueStatus();
+        });
+    }
+
+    window.addEventListener('online', flushQueue);
+    setInterval(flushQueue, SYNC_INTERVAL_MS);
+    updateQueueStatus().then(flushQueue);
+    // --- FIN: COLA DE ESCANEOS SIN CONEXIÓN ---
+
+    function showQueued(participantName) {
+        resultContainer.innerHTML = `<div class="p-4 rounded bg-yellow-100 text-yellow-800"><p class="font-bold">Sin conexión</p><p>Escaneo de <strong>${participantName}</strong> guardado. Se validará al recuperar la conexión.</p></div>`;
+        setTimeout(() => { lastResult = null; }, 2000);
+    }
+
+    // Interpreta el QR solo para mostrarlo al operador; la validación real la hace el servidor.
+    // Formatos: token compacto firmado "M1:<id base36>:<evento>:<firma>" o JSON con "id" y "nombre".
+    function parseQr(text) {
+        if (/^M1:[0-9A-Z]+:[0-9A-Z]+:[A-Z2-7]+$/i.test(text.trim())) {
+            return { id: parseInt(text.trim().split(':')[1], 36), nombre: null };
+        }
+        const participantData = JSON.parse(text);
+        if (participantData && participantData.id) {
+            return { id: participantData.id, nombre: participantData.nombre || null };
+        }
+        throw new Error("QR sin 'id'.");
+    }
+
+    // --- Validación con reintentos ---
+    const VALIDATE_TIMEOUT_MS = 8000;
+    const VALIDATE_RETRIES = 2;
+
+    // Todos los intentos llevan la misma Idempotency-Key: si el primero llegó al servidor
+    // y se perdió la respuesta, el reintento recibe la original en lugar de un cooldown
+    function validateScan(qrText, scanKey, attempt = 0) {
+        const controller = new AbortController();
+        const timer = setTimeout(() => controller.abort(), VALIDATE_TIMEOUT_MS);
+        return fetch(validateUrl, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Idempotency-Key': scanKey },
+            body: JSON.stringify({ 'qr': qrText }),
+            signal: controller.signal
+        })
+        .then(response => {
+            if (response.status >= 500) throw new Error(`HTTP ${response.status}`);
+            return response.json();
+        })
+        .catch(error => {
+            if (attempt >= VALIDATE_RETRIES || !navigator.onLine) throw error;
+            return new Promise(resolve => setTimeout(resolve, 500 * (attempt + 1)))
+                .then(() => validateScan(qrText, scanKey, attempt + 1));
+        })
+        .finally(() => clearTimeout(timer));
+    }
+
+    // --- Lógica de Escaneo Exitoso ---
     function onScanSuccess(decodedText, decodedResult) {
         if (decodedText !== lastResult) {
             lastResult = decodedText;
-            // ... (el resto de esta función es idéntica a la versión anterior)
-            let participantId;
+            let participantName;
             try {
-                const participantData = JSON.parse(decodedText);
-                if (participantData && participantData.id) {
-                    participantId = participantData.id;
-                    resultContainer.innerHTML = `<div class="p-3 bg-gray-200 rounded">Escaneado: <strong>${participantData.nombre || 'Participante'}</strong>. Validando...</div>`;
-                } else { throw new Error("QR sin 'id'."); }
+                const participant = parseQr(decodedText);
+                participantName = participant.nombre || `Participante #${participant.id}`;
+                resultContainer.innerHTML = `<div class="p-3 bg-gray-200 rounded">Escaneado: <strong>${participantName}</strong>. Validando...</div>`;
             } catch (error) {
                 resultContainer.innerHTML = `<div class="p-4 rounded bg-red-100 text-red-800"><strong>Error:</strong> Código QR no válido.</div>`;
                 setTimeout(() => { lastResult = null; }, 2000); 
                 return;
             }
-            fetch(validateUrl, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify({ 'id_participante': participantId })})
-            .then(response => response.json()).then(data => {
+            const scanKey = newScanKey();
+            if (!navigator.onLine) {
+                enqueueScan(decodedText, scanKey).then(() => showQueued(participantName));
+                return;
+            }
+            validateScan(decodedText, scanKey)
+            .then(data => {
                 let messageClass = data.success ? 'bg-green-100 text-green-800' : 'bg-red-100 text-red-800';
                 resultContainer.innerHTML = `<div class="p-4 rounded ${messageClass}"><p class="font-bold">${data.success ? 'Éxito' : 'Error'}</p><p>${data.message}</p>${data.saldo_restante !== undefined ? `<p>Saldo restante: ${data.saldo_restante}</p>` : ''}</div>`;
                 setTimeout(() => { lastResult = null; }, 2000); 
             }).catch(error => {
-                resultContainer.innerHTML = `<div class="p-4 rounded bg-red-100 text-red-800">Error de conexión con el servidor.</div>`;
-                setTimeout(() => { lastResult = null; }, 2000);
+                // La red se cayó durante la petición: el escaneo se guarda para sincronizarlo después
+                enqueueScan(decodedText, scanKey).then(() => showQueued(participantName));
             });
         }
     }
@@ -0,0 +1,77 @@
+// Service worker generado por Flask (ver app/services/activos.py).
+// La versión sale de los hashes de los activos: cada despliegue con activos
+// nuevos crea una caché nueva y borra la anterior.
+const CACHE_PREFIX = 'mun-snack-manager-';
+const CACHE_NAME = CACHE_PREFIX + '{{ version }}';
+const PRECACHE = {{ precache|tojson }};
+// Archivos con hash en el nombre: nunca cambian, se sirven siempre desde la caché
+const PREFIJO_INMUTABLE = {{ prefijo_inmutable|tojson }};
+
+// Evento 'install': guarda los activos del despliegue y activa esta versión sin esperar.
+self.addEventListener('install', event => {
+  event.waitUntil(
+    caches.open(CACHE_NAME)
+      .then(cache => cache.addAll(PRECACHE))
+      .then(() => self.skipWaiting())
+  );
+});
+
+// Evento 'activate': borra las cachés de versiones anteriores.
+self.addEventListener('activate', event => {
+  event.waitUntil(
+    caches.keys()
+      .then(cacheNames => Promise.all(
+        cacheNames
+          .filter(cacheName => cacheName.startsWith(CACHE_PREFIX) && cacheName !== CACHE_NAME)
+          .map(cacheName => caches.delete(cacheName))
+      ))
+      .then(() => self.clients.claim())
+  );
+});
+
+// Páginas: primero la red (siempre la versión actual); sin conexión, la última copia guardada.
+function redPrimero(request) {
+  return fetch(request)
+    .then(response => {
+      if (response.ok && !response.redirected) {
+        const copia = response.clone();
+        caches.open(CACHE_NAME).then(cache => cache.put(request, copia));
+      }
+      return response;
+    })
+    .catch(() => caches.match(request).then(response => response || Response.error()));
+}
+
+// Activos: primero la caché; lo que no esté guardado se pide a la red.
+function cachePrimero(request) {
+  return caches.match(request).then(response => {
+    if (response) {
+      return response;
+    }
+    return fetch(request).then(respuesta => {
+      const url = new URL(request.url);
+      if (respuesta.ok && url.pathname.startsWith(PREFIJO_INMUTABLE)) {
+        const copia = respuesta.clone();
+        caches.open(CACHE_NAME).then(cache => cache.put(request, copia));
+      }
+      return respuesta;
+    });
+  });
+}
+
+// Evento 'fetch': las peticiones que no son GET (validar QR, sincronizar) y las
+// consultas a la API van siempre a la red.
+self.addEventListener('fetch', event => {
+  const request = event.request;
+  if (request.method !== 'GET') {
+    return;
+  }
+  if (request.mode === 'navigate') {
+    event.respondWith(redPrimero(request));
+    return;
+  }
+  const url = new URL(request.url);
+  if (url.pathname.startsWith(PREFIJO_INMUTABLE) || PRECACHE.includes(url.pathname + url.search) || PRECACHE.includes(request.url)) {
+    event.respondWith(cachePrimero(request));
+  }
+});
@@ -1,11 +1,19 @@
 import click
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
 from flask.cli import with_appcontext
 from . import db, bcrypt
-from .models.models import User, Configuracion
+from .models.models import User, Configuracion, Participante, Committe, Pais, InstitucionEducativa, ContadorAgregado
+from .services import activos, agregados, fotos, gestion_eventos, operaciones_masivas
+from .services.config_cache import config_cache
+from .services.indice_participantes import indice_participantes
+from sqlalchemy import inspect, select, text
+from sqlalchemy.schema import CreateColumn
 import qrcode
 from PIL import Image
 import io
 import json
+import os
 
 @click.command(name='init-db')
 @with_appcontext
@@ -27,27 +35,193 @@ def init_db_command():
     default_config = Configuracion(
         nombre_evento="Mi Evento MUN",
         fechas_evento="Del 1 al 4 de Diciembre de 2025",
-        meriendas_totales=6
+        meriendas_totales=6,
+        activo=True
     )
     db.session.add(default_config)
 
     db.session.commit()
+    config_cache.invalidar()
     click.echo('Base de datos inicializada con usuario admin (pass: admin123) y configuración por defecto.')
 
+# --- MIGRACIÓN DE ESQUEMA SIN PÉRDIDA DE DATOS ---
+
+# Rellenos que se ejecutan una sola vez, justo después de añadir la columna indicada.
+# Clave: (tabla, columna). Valor: sentencia SQL.
+BACKFILLS = {
+    ('participante', 'ultimo_registro_at'): (
+        "UPDATE participante SET ultimo_registro_at = ("
+        "SELECT MAX(registro.fecha_hora) FROM registro "
+        "WHERE registro.id_participante = participante.id_participante)"
+    ),
+    # Antes de los eventos múltiples había una sola fila de configuración: pasa a ser
+    # el evento activo y todos los participantes y registros quedan en él.
+    ('configuracion', 'activo'): "UPDATE configuracion SET activo = TRUE",
+    ('participante', 'evento_id'): "UPDATE participante SET evento_id = (SELECT MIN(id_config) FROM configuracion)",
+    ('registro', 'evento_id'): "UPDATE registro SET evento_id = (SELECT MIN(id_config) FROM configuracion)",
+}
+
+def _evento_activo_id():
+    evento = gestion_eventos.evento_activo(db.session)
+    return evento.id_config if evento else None
+
+def upgrade_schema():
+    """
+    Lleva una base de datos existente al esquema actual de los modelos sin borrar datos.
+
+    Crea las tablas que falten, añade las columnas nuevas con ALTER TABLE, crea los
+    índices declarados en los modelos y ejecuta los rellenos de `BACKFILLS`. Si la
+    tabla de contadores del dashboard es nueva, la calcula desde los registros.
+
+    Returns:
+        list[str]: descripción de cada cambio aplicado.
+    """
+    cambios = []
+    tablas_existentes = set(inspect(db.engine).get_table_names())
+    db.create_all()  # Solo crea las tablas inexistentes
+    inspector = inspect(db.engine)
+    for tabla in db.metadata.sorted_tables:
+        if tabla.name not in tablas_existentes:
+            cambios.append(f'Tabla creada: {tabla.name}')
+
+    with db.engine.begin() as conn:
+        for tabla in db.metadata.sorted_tables:
+            columnas_existentes = {c['name'] for c in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in columnas_existentes:
+                    continue
+                ddl = CreateColumn(columna).compile(dialect=db.engine.dialect)
+                conn.execute(text(f'ALTER TABLE {tabla.name} ADD COLUMN {ddl}'))
+                cambios.append(f'Columna añadida: {tabla.name}.{columna.name}')
+
+                relleno = BACKFILLS.get((tabla.name, columna.name))
+                if relleno:
+                    conn.execute(text(relleno))
+                    cambios.append(f'Datos calculados para {tabla.name}.{columna.name}')
+
+            indices_existentes = {i['name'] for i in inspector.get_indexes(tabla.name)}
+            for indice in tabla.indexes:
+                if indice.name not in indices_existentes:
+                    indice.create(conn)
+                    cambios.append(f'Índice creado: {indice.name}')
+
+    if ContadorAgregado.__tablename__ not in tablas_existentes:
+        total = agregados.reconstruir(db.session, _evento_activo_id())
+        cambios.append(f'Contadores del dashboard calculados ({total} registros)')
+
+    return cambios
+
+@click.command(name='upgrade-db')
+@with_appcontext
+def upgrade_db_command():
+    """Actualiza el esquema de la base de datos conservando los datos existentes."""
+    cambios = upgrade_schema()
+    for cambio in cambios:
+        click.echo(cambio)
+    click.echo('Esquema actualizado.' if cambios else 'El esquema ya estaba al día.')
+
+@click.command(name='rebuild-counters')
+@with_appcontext
+def rebuild_counters_command():
+    """Recalcula los contadores del dashboard a partir de los registros del evento activo."""
+    total = agregados.reconstruir(db.session, _evento_activo_id())
+    click.echo(f'Contadores recalculados a partir de {total} registros.')
+
+@click.command(name='archive-event')
+@click.argument('evento_id', type=int)
+@with_appcontext
+def archive_event_command(evento_id):
+    """Mueve los participantes y registros de un evento terminado a las tablas de archivo."""
+    try:
+        participantes, registros = gestion_eventos.archivar_evento(db.session, evento_id)
+    except gestion_eventos.OperacionEventoInvalida as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Evento {evento_id} archivado: {participantes} participantes y {registros} registros.')
+
+@click.command(name='generate-thumbnails')
+@click.option('--forzar', is_flag=True, help='Regenera también las miniaturas que ya existen.')
+@with_appcontext
+def generate_thumbnails_command(forzar):
+    """Genera en paralelo las miniaturas JPEG/WebP de las fotos ya subidas."""
+    with ProcessPoolExecutor(max_workers=current_app.config['QR_WORKERS']) as pool:
+        resultados = fotos.generar_derivadas_carpeta(
+            current_app.config['PHOTOS_FOLDER'], current_app.config['PHOTO_THUMBS_FOLDER'], pool, forzar
+        )
+    generadas = sum(cantidad for _, cantidad, _ in resultados)
+    for nombre, _, error in resultados:
+        if error:
+            click.echo(f'{nombre}: {error}', err=True)
+    click.echo(f'{len(resultados)} fotos revisadas, {generadas} miniaturas generadas.')
+
+@click.command(name='build-assets')
+@with_appcontext
+def build_assets_command():
+    """Compila el CSS de Tailwind y versiona los activos estáticos en static/dist (requiere "npm install")."""
+    try:
+        manifiesto = activos.construir(os.path.dirname(current_app.root_path), current_app.static_folder)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    for nombre, archivo in sorted(manifiesto.items()):
+        click.echo(f'{nombre} -> {activos.CARPETA_DIST}/{archivo}')
+    click.echo('Activos generados; reinicie la aplicación para usarlos.')
+
+@click.command(name='bulk-participants')
+@click.argument('tipo', type=click.Choice(operaciones_masivas.TIPOS))
+@click.option('--committe', 'committe_id', type=int, help='Solo los participantes de este comité.')
+@click.option('--institucion', 'institucion_id', type=int, help='Solo los de esta institución.')
+@click.option('--pais', 'pais_id', type=int, help='Solo los de este país.')
+@click.option('--ids', default='', help='Lista de ids de participantes separados por comas.')
+@click.option('--todos', is_flag=True, help='Todos los participantes del evento activo (sin otro filtro).')
+@click.option('--cantidad', type=int,
+              help='Saldo nuevo (restablecer, por defecto las meriendas totales) o meriendas a sumar (recargar).')
+@click.option('--committe-destino', 'committe_destino_id', type=int, help='Comité nuevo (reasignar).')
+@click.option('--institucion-destino', 'institucion_destino_id', type=int, help='Institución nueva (reasignar).')
+@with_appcontext
+def bulk_participants_command(tipo, committe_id, institucion_id, pais_id, ids, todos, cantidad,
+                              committe_destino_id, institucion_destino_id):
+    """Restablece o recarga saldos, o reasigna comité/institución, con un solo UPDATE sobre el evento activo."""
+    evento = gestion_eventos.evento_activo(db.session)
+    if evento is None:
+        raise click.ClickException('No hay un evento activo.')
+    if tipo == operaciones_masivas.RESTABLECER and cantidad is None:
+        cantidad = evento.meriendas_totales
+    try:
+        afectados = operaciones_masivas.aplicar(
+            db.session, evento.id_config, tipo,
+            operaciones_masivas.filtro(committe_id, institucion_id, pais_id, ids, todos=todos), 'cli',
+            cantidad=cantidad, committe_id=committe_destino_id, institucion_id=institucion_destino_id,
+        )
+    except operaciones_masivas.OperacionInvalida as e:
+        db.session.rollback()
+        raise click.ClickException(str(e))
+    indice_participantes.invalidar()
+    click.echo(f'Operación "{tipo}" aplicada a {afectados} participantes.')
+
 # --- NUEVA FUNCIÓN PARA GENERAR QR ---
-def generate_qr_code_img(data_dict: dict):
+
+# Parámetros de renderizado del QR. Forman parte de la clave de la caché de QR
+# (services/qr_cache.py): si se modifican, todos los códigos se regeneran.
+QR_PARAMETROS = {
+    'error_correction': 'M',  # Tolerancia a errores media
+    'box_size': 10,           # Tamaño de cada "caja" del QR
+    'border': 1,              # Margen estrecho (1 caja de borde)
+    'tamano_px': 472,         # 4x4 cm a 300 DPI
+}
+
+def generate_qr_code_img(data_dict):
     """
     Genera una imagen de código QR a partir de un diccionario de datos.
     
     Args:
-        data_dict (dict): Diccionario con la información del participante.
+        data_dict (dict | str): Diccionario con la información del participante, o el
+            texto exacto a codificar (p. ej. el token compacto de services/qr_token.py).
 
     Returns:
         io.BytesIO: Un objeto de bytes en memoria que contiene la imagen PNG del QR.
     """
     # --- MÉTODO 1: Incluir todos los datos (como solicitaste) ---
     # Convertimos el diccionario a una cadena de texto en formato JSON.
-    qr_data = json.dumps(data_dict, ensure_ascii=False)
+    qr_data = data_dict if isinstance(data_dict, str) else json.dumps(data_dict, ensure_ascii=False)
     
     # --- MÉTODO 2: Incluir solo el ID (Recomendado para la lógica de escaneo actual) ---
     # Si prefieres usar solo el ID, comenta la línea anterior y descomenta la siguiente:
@@ -56,9 +230,9 @@ def generate_qr_code_img(data_dict: dict):
     # Configuración del QR
     qr = qrcode.QRCode(
         version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_M, # Tolerancia a errores media
-        box_size=10, # Tamaño de cada "caja" del QR
-        border=1,    # Margen estrecho (1 caja de borde)
+        error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{QR_PARAMETROS['error_correction']}"),
+        box_size=QR_PARAMETROS['box_size'],
+        border=QR_PARAMETROS['border'],
     )
     
     qr.add_data(qr_data)
@@ -71,7 +245,7 @@ def generate_qr_code_img(data_dict: dict):
     # 1 pulgada = 2.54 cm. DPI = Puntos por Pulgada.
     # Pixeles = (cm / 2.54) * DPI
     # (4 cm / 2.54) * 300 DPI ≈ 472.44 pixeles
-    target_size_px = 472
+    target_size_px = QR_PARAMETROS['tamano_px']
     img = img.resize((target_size_px, target_size_px), Image.Resampling.NEAREST)
 
     # Guardar la imagen en un buffer de memoria en lugar de un archivo físico
@@ -79,4 +253,38 @@ def generate_qr_code_img(data_dict: dict):
     img.save(img_buffer, format='PNG')
     img_buffer.seek(0) # Rebobinar el buffer para que pueda ser leído
 
-    return img_buffer
\ No newline at end of file
+    return img_buffer
+
+def datos_qr_participantes(ids=None, evento_id=None):
+    """
+    Obtiene con una sola consulta los datos que se codifican en el QR de cada participante.
+
+    Args:
+        ids (list[int], opcional): limita la consulta a estos participantes.
+        evento_id (int, opcional): limita la consulta a los participantes de este evento.
+
+    Returns:
+        list[dict]: un diccionario por participante con id, nombre, committe, pais e institucion.
+    """
+    consulta = (
+        select(
+            Participante.id_participante,
+            Participante.nombre_participante,
+            Committe.nombre_committe,
+            Pais.nombre_pais,
+            InstitucionEducativa.nombre_institucion,
+        )
+        .join(Participante.committe)
+        .join(Participante.pais)
+        .join(Participante.institucion)
+        .order_by(Participante.id_participante)
+    )
+    if ids is not None:
+        consulta = consulta.where(Participante.id_participante.in_(ids))
+    if evento_id is not None:
+        consulta = consulta.where(Participante.evento_id == evento_id)
+    filas = db.session.execute(consulta).all()
+    return [
+        {"id": id_, "nombre": nombre, "committe": committe, "pais": pais, "institucion": institucion}
+        for id_, nombre, committe, pais, institucion in filas
+    ]
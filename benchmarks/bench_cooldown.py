@@ -0,0 +1,103 @@
+"""
+Benchmark de la comprobación de cooldown en el escaneo.
+
+Compara, para historiales de 1k, 100k y 1M filas de `Registro`:
+  - la consulta anterior (último Registro ordenado por fecha_hora, sin índice compuesto),
+  - la misma consulta con el índice (id_participante, fecha_hora),
+  - la redención completa actual, que usa `Participante.ultimo_registro_at`.
+
+Uso:
+    python benchmarks/bench_cooldown.py [--tamanos 1000 100000 1000000] [--scans 200]
+
+Se ejecuta sobre una base SQLite temporal, sin necesidad de MySQL.
+"""
+import argparse
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from comun import crear_app, medir
+from sqlalchemy import insert, text
+
+from app import db
+from app.models.models import Committe, InstitucionEducativa, Pais, Participante, Registro, User
+from app.services.redencion import redimir_merienda
+
+PARTICIPANTES = 3000
+LOTE = 50_000
+
+
+def sembrar(total_registros):
+    """Crea participantes y `total_registros` entregas repartidas en los últimos 4 días."""
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(username='bench', password='x', role='operador'))
+    db.session.add_all([
+        Committe(nombre_committe='Comité'),
+        Pais(nombre_pais='Colombia', country_code='co'),
+        InstitucionEducativa(nombre_institucion='Colegio'),
+    ])
+    db.session.flush()
+    db.session.execute(insert(Participante), [
+        {'nombre_participante': f'Participante {i}', 'saldo_merienda': 10**6,
+         'committe_id': 1, 'pais_id': 1, 'institucion_id': 1}
+        for i in range(PARTICIPANTES)
+    ])
+
+    inicio = datetime.utcnow() - timedelta(days=4)
+    for desde in range(0, total_registros, LOTE):
+        filas = [
+            {'id_participante': random.randint(1, PARTICIPANTES), 'operador_responsable_id': 1,
+             'fecha_hora': inicio + timedelta(seconds=random.randint(0, 3 * 86400))}
+            for _ in range(min(LOTE, total_registros - desde))
+        ]
+        db.session.execute(insert(Registro), filas)
+    db.session.execute(text(
+        "UPDATE participante SET ultimo_registro_at = ("
+        "SELECT MAX(fecha_hora) FROM registro WHERE registro.id_participante = participante.id_participante)"
+    ))
+    db.session.commit()
+
+
+def consulta_anterior():
+    participante_id = random.randint(1, PARTICIPANTES)
+    Registro.query.filter_by(id_participante=participante_id).order_by(Registro.fecha_hora.desc()).first()
+    db.session.rollback()
+
+
+def redencion_actual():
+    redimir_merienda(random.randint(1, PARTICIPANTES), 1, cooldown_minutos=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--scans', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = crear_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            print(f"{'registros':>10} | {'sin índice p50/p99 (ms)':>24} | {'con índice p50/p99 (ms)':>24} | {'redención p50/p99 (ms)':>23}")
+            for total in args.tamanos:
+                sembrar(total)
+
+                db.session.execute(text('DROP INDEX ix_registro_participante_fecha'))
+                db.session.commit()
+                sin_indice = medir(consulta_anterior, args.scans)
+
+                db.session.execute(text(
+                    'CREATE INDEX ix_registro_participante_fecha ON registro (id_participante, fecha_hora)'
+                ))
+                db.session.commit()
+                con_indice = medir(consulta_anterior, args.scans)
+                redencion = medir(redencion_actual, args.scans)
+
+                print(f'{total:>10} | {sin_indice[0]:>11.3f} / {sin_indice[1]:>10.3f} | '
+                      f'{con_indice[0]:>11.3f} / {con_indice[1]:>10.3f} | '
+                      f'{redencion[0]:>10.3f} / {redencion[1]:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
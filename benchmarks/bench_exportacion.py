@@ -0,0 +1,96 @@
+"""
+Benchmark de la exportación del reporte de meriendas.
+
+Llena una base SQLite temporal con registros sintéticos y recorre la exportación
+CSV y XLSX completa midiendo el tiempo y el pico de memoria de Python
+(tracemalloc). Con el streaming por lotes el pico debe mantenerse prácticamente
+igual al aumentar la cantidad de filas.
+
+Uso:
+    python benchmarks/bench_exportacion.py [--filas 100000 1000000] [--sin-xlsx]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from comun import crear_app
+from sqlalchemy import insert
+
+from app import db
+from app.models.models import Committe, InstitucionEducativa, Pais, Participante, Registro, User
+from app.services.exportacion import generar_csv, generar_xlsx
+from app.services.reportes import filtros_desde_args
+
+PARTICIPANTES = 2000
+LOTE = 50000
+
+
+def poblar(filas):
+    db.session.add_all([Committe(id_committe=1, nombre_committe='Comité'),
+                        Pais(id_pais=1, nombre_pais='Colombia', country_code='co'),
+                        InstitucionEducativa(id_institucion=1, nombre_institucion='Colegio'),
+                        User(id=1, username='operador', password='x', role='operador')])
+    db.session.execute(insert(Participante), [
+        {'id_participante': i, 'nombre_participante': f'Delegado {i}', 'committe_id': 1,
+         'pais_id': 1, 'institucion_id': 1, 'saldo_merienda': 6}
+        for i in range(1, PARTICIPANTES + 1)
+    ])
+    inicio = datetime(2025, 1, 1, 12, 0)
+    for desde in range(0, filas, LOTE):
+        db.session.execute(insert(Registro), [
+            {'id_participante': i % PARTICIPANTES + 1, 'operador_responsable_id': 1,
+             'fecha_hora': inicio + timedelta(seconds=i)}
+            for i in range(desde, min(desde + LOTE, filas))
+        ])
+    db.session.commit()
+
+
+def recorrer(generar, filtros):
+    """
+    Consume la exportación completa dos veces: una para medir el tiempo y otra con
+    tracemalloc (que la hace mucho más lenta) para el pico de memoria.
+
+    Returns:
+        tuple: (segundos, bytes generados, pico de memoria en MB).
+    """
+    t0 = time.perf_counter()
+    total = sum(len(bloque) for bloque in generar(db.session, filtros))
+    segundos = time.perf_counter() - t0
+
+    tracemalloc.start()
+    for _ in generar(db.session, filtros):
+        pass
+    pico = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    tracemalloc.stop()
+    return segundos, total, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--sin-xlsx', action='store_true', help='Mide solo la exportación CSV')
+    args = parser.parse_args()
+
+    filtros = filtros_desde_args({})
+    print(f"{'filas':>9} | {'formato':>7} | {'segundos':>8} | {'MB generados':>12} | {'pico memoria MB':>15}")
+    for filas in args.filas:
+        with tempfile.TemporaryDirectory() as carpeta:
+            app = crear_app(os.path.join(carpeta, 'bench.db'))
+            with app.app_context():
+                db.create_all()
+                poblar(filas)
+                formatos = {'csv': generar_csv}
+                if not args.sin_xlsx:
+                    formatos['xlsx'] = generar_xlsx
+                for formato, generar in formatos.items():
+                    segundos, total, pico = recorrer(generar, filtros)
+                    print(f'{filas:>9} | {formato:>7} | {segundos:>8.2f} | {total / 1024 / 1024:>12.1f} | {pico:>15.1f}')
+                db.session.remove()
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark de la importación desde Excel.
+
+Genera un libro con la estructura de `plantilla_importacion.xlsx` (10k estudiantes por
+defecto) y compara la importación por lotes actual con el recorrido fila a fila
+anterior (una consulta por catálogo y por fila). Después mide la reimportación en
+modo sincronizar de un libro en el que solo cambiaron `--cambios` filas.
+
+Uso:
+    python benchmarks/bench_importacion.py [--filas 10000] [--cambios 20] [--sin-anterior]
+
+Se ejecuta sobre una base SQLite temporal, sin necesidad de MySQL.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from comun import crear_app
+import openpyxl
+
+from app import db
+from app.models.models import Committe, InstitucionEducativa, Pais, Participante
+from app.services.importacion import SINCRONIZAR, importar_libro, leer_hoja
+
+PAISES = ['Colombia', 'Peru', 'Chile', 'Mexico', 'Spain', 'France', 'Germany', 'Japan', 'Brazil', 'Canada']
+
+
+def generar_libro(ruta, filas, cambios=0):
+    """Libro de prueba; las primeras `cambios` filas cambian de comité respecto del libro original."""
+    libro = openpyxl.Workbook(write_only=True)
+    instituciones = [f'Institución Educativa {i}' for i in range(60)]
+    committes = [f'Comité {i}' for i in range(25)]
+
+    hoja = libro.create_sheet('Instituciones')
+    hoja.append(['nombre_institucion'])
+    for nombre in instituciones:
+        hoja.append([nombre])
+    hoja = libro.create_sheet('Paises')
+    hoja.append(['nombre_pais'])
+    for nombre in PAISES:
+        hoja.append([nombre])
+    hoja = libro.create_sheet('Committes')
+    hoja.append(['nombre_committe'])
+    for nombre in committes:
+        hoja.append([nombre])
+
+    hoja = libro.create_sheet('Estudiantes')
+    hoja.append(['nombre_participante', 'committe', 'pais_representado', 'institucion_educativa', 'id_externo'])
+    for i in range(filas):
+        # Una de cada 500 filas apunta a una institución inexistente para ejercitar el reporte
+        institucion = 'Colegio Fantasma' if i % 500 == 0 else instituciones[i % len(instituciones)]
+        committe = committes[(i + 1 if i < cambios else i) % len(committes)]
+        hoja.append([f'Delegado {i}', committe, PAISES[i % len(PAISES)], institucion, f'E{i}'])
+    libro.save(ruta)
+
+
+def importar_fila_a_fila(ruta, saldo_inicial):
+    """Reproducción del algoritmo anterior: una consulta por catálogo y por fila."""
+    libro = openpyxl.load_workbook(ruta, read_only=True)
+    for _, fila in leer_hoja(libro, 'Instituciones'):
+        if not InstitucionEducativa.query.filter_by(nombre_institucion=fila['nombre_institucion']).first():
+            db.session.add(InstitucionEducativa(nombre_institucion=fila['nombre_institucion']))
+    for _, fila in leer_hoja(libro, 'Committes'):
+        if not Committe.query.filter_by(nombre_committe=fila['nombre_committe']).first():
+            db.session.add(Committe(nombre_committe=fila['nombre_committe']))
+    for _, fila in leer_hoja(libro, 'Paises'):
+        if not Pais.query.filter_by(nombre_pais=fila['nombre_pais']).first():
+            db.session.add(Pais(nombre_pais=fila['nombre_pais']))
+    db.session.commit()
+    for _, fila in leer_hoja(libro, 'Estudiantes'):
+        institucion = InstitucionEducativa.query.filter_by(nombre_institucion=fila['institucion_educativa']).first()
+        pais = Pais.query.filter_by(nombre_pais=fila['pais_representado']).first()
+        committe = Committe.query.filter_by(nombre_committe=fila['committe']).first()
+        if institucion and pais and committe:
+            db.session.add(Participante(
+                nombre_participante=fila['nombre_participante'], institucion_id=institucion.id_institucion,
+                pais_id=pais.id_pais, committe_id=committe.id_committe, saldo_merienda=saldo_inicial,
+            ))
+    db.session.commit()
+    libro.close()
+
+
+def cronometrar(funcion, *args):
+    db.drop_all()
+    db.create_all()
+    t0 = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - t0, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=10_000)
+    parser.add_argument('--cambios', type=int, default=20, help='Filas modificadas en la reimportación.')
+    parser.add_argument('--sin-anterior', action='store_true', help='No medir el algoritmo fila a fila.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_libro = os.path.join(tmp, 'importacion.xlsx')
+        generar_libro(ruta_libro, args.filas)
+        ruta_corregido = os.path.join(tmp, 'corregido.xlsx')
+        generar_libro(ruta_corregido, args.filas, args.cambios)
+
+        app = crear_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            segundos, reporte = cronometrar(importar_libro, ruta_libro, 6)
+            print(f'Importación por lotes: {segundos:.2f} s '
+                  f'({reporte.participantes} participantes, {len(reporte.omitidos)} filas omitidas)')
+
+            t0 = time.perf_counter()
+            reporte = importar_libro(ruta_corregido, 6, modo=SINCRONIZAR)
+            print(f'Reimportación (sincronizar): {time.perf_counter() - t0:.2f} s '
+                  f'({reporte.participantes} nuevos, {reporte.actualizados} actualizados, '
+                  f'{reporte.sin_cambios} sin cambios)')
+
+            if not args.sin_anterior:
+                segundos, _ = cronometrar(importar_fila_a_fila, ruta_libro, 6)
+                print(f'Importación fila a fila: {segundos:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark del índice en memoria de participantes (services/indice_participantes.py).
+
+Mide, para eventos de 1k, 10k y 50k participantes:
+  - la memoria del índice (total y por participante) y el tiempo de la carga completa,
+  - la prevalidación de escaneos rechazados (desconocido, sin saldo, cooldown) desde memoria,
+  - el mismo rechazo por el camino de la base de datos (`redimir_merienda`).
+
+Termina con código 1 si algún tamaño supera el presupuesto documentado de
+BYTES_POR_PARTICIPANTE_MAX bytes por participante.
+
+Uso:
+    python benchmarks/bench_indice.py [--tamanos 1000 10000 50000] [--scans 2000]
+
+Se ejecuta sobre una base SQLite temporal, sin necesidad de MySQL.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from comun import crear_app, medir
+from sqlalchemy import insert
+
+from app import db
+from app.models.models import Committe, Configuracion, InstitucionEducativa, Pais, Participante, User
+from app.services.indice_participantes import BYTES_POR_PARTICIPANTE_MAX, IndiceParticipantes
+from app.services.redencion import redimir_merienda
+
+NOMBRES = ['María José', 'Juan Sebastián', 'Valentina', 'Santiago', 'Isabella', 'Nicolás', 'Sofía', 'Andrés Felipe']
+APELLIDOS = ['Rodríguez', 'Gómez', 'Martínez', 'López', 'Hernández', 'Peña', 'Castaño', 'Muñoz', 'Ospina']
+COOLDOWN = 60
+
+
+def sembrar(total):
+    """Un evento con `total` participantes: un tercio sin saldo, un tercio en cooldown y el resto disponible."""
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(username='bench', password='x', role='operador'))
+    db.session.add(Configuracion(nombre_evento='Bench', fechas_evento='', meriendas_totales=6, cooldown_minutos=COOLDOWN))
+    db.session.add_all([
+        Committe(nombre_committe='Comité'),
+        Pais(nombre_pais='Colombia', country_code='co'),
+        InstitucionEducativa(nombre_institucion='Colegio'),
+    ])
+    db.session.flush()
+    ahora = datetime.utcnow()
+    db.session.execute(insert(Participante), [
+        {'nombre_participante': f'{random.choice(NOMBRES)} {random.choice(APELLIDOS)} {random.choice(APELLIDOS)}',
+         'saldo_merienda': 0 if i % 3 == 0 else 6,
+         'ultimo_registro_at': ahora - timedelta(minutes=5) if i % 3 == 1 else None,
+         'committe_id': 1, 'pais_id': 1, 'institucion_id': 1, 'evento_id': 1}
+        for i in range(total)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1_000, 10_000, 50_000])
+    parser.add_argument('--scans', type=int, default=2000)
+    args = parser.parse_args()
+
+    excedido = False
+    with tempfile.TemporaryDirectory() as tmp:
+        app = crear_app(os.path.join(tmp, 'bench.db'))
+        app.config['PARTICIPANT_INDEX_VERSION_FILE'] = os.path.join(tmp, 'participantes.version')
+        indice = IndiceParticipantes(app)
+        with app.app_context():
+            print(f"{'participantes':>13} | {'memoria (KB)':>12} | {'B/part.':>7} | {'carga (ms)':>10} | "
+                  f"{'índice p50/p99 (ms)':>20} | {'base de datos p50/p99 (ms)':>27}")
+            for total in args.tamanos:
+                sembrar(total)
+                t0 = time.perf_counter()
+                indice.precargar(1)
+                carga = (time.perf_counter() - t0) * 1000
+                memoria = indice.memoria_bytes()
+                por_participante = memoria / total
+                excedido |= por_participante > BYTES_POR_PARTICIPANTE_MAX
+
+                # Ids que se rechazan: desconocidos, sin saldo (i % 3 == 0) y en cooldown (i % 3 == 1)
+                rechazados = [total + 1 + i for i in range(100)]
+                rechazados += [i + 1 for i in range(total) if i % 3 != 2]
+
+                def desde_indice():
+                    indice.prevalidar(random.choice(rechazados), COOLDOWN, datetime.utcnow(), 1)
+
+                def desde_base_de_datos():
+                    redimir_merienda(random.choice(rechazados), 1, COOLDOWN, evento_id=1)
+
+                en_memoria = medir(desde_indice, args.scans)
+                en_base = medir(desde_base_de_datos, args.scans)
+                print(f'{total:>13} | {memoria / 1024:>12.1f} | {por_participante:>7.1f} | {carga:>10.1f} | '
+                      f'{en_memoria[0]:>9.4f} / {en_memoria[1]:>8.4f} | '
+                      f'{en_base[0]:>12.3f} / {en_base[1]:>12.3f}')
+
+    if excedido:
+        print(f'El índice supera el presupuesto de {BYTES_POR_PARTICIPANTE_MAX} bytes por participante.')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
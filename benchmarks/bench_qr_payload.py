@@ -0,0 +1,101 @@
+"""
+Benchmark de los formatos de contenido del QR.
+
+Compara el formato JSON completo con el token compacto firmado: versión del QR,
+módulos por lado, tiempo de generación del PNG y tamaño del archivo. Si está
+instalado OpenCV (`opencv-python`) o `pyzbar`, mide también el tiempo de
+decodificación de la imagen.
+
+Uso:
+    python benchmarks/bench_qr_payload.py [--repeticiones 50]
+"""
+import argparse
+import io
+import json
+
+from comun import medir
+import qrcode
+from PIL import Image
+
+from app.services.qr_token import firmar
+from app.utils import QR_PARAMETROS, generate_qr_code_img
+
+SECRET_KEY = 'benchmark'
+
+# Participantes representativos: nombres e instituciones cortos, medianos y largos
+PARTICIPANTES = [
+    {'id': 7, 'nombre': 'Ana Gómez', 'committe': 'UNICEF', 'pais': 'Peru', 'institucion': 'Colegio Andino'},
+    {'id': 1284, 'nombre': 'María José Rodríguez Peñaloza', 'committe': 'Consejo de Seguridad',
+     'pais': 'Colombia', 'institucion': 'Institución Educativa Distrital Nuestra Señora del Carmen'},
+    {'id': 30512, 'nombre': 'Juan Sebastián de la Torre Valderrama', 'committe': 'Organización Mundial de la Salud',
+     'pais': 'United Kingdom of Great Britain and Northern Ireland',
+     'institucion': 'Colegio Bilingüe Internacional Bicentenario de la Independencia de Barranquilla'},
+]
+
+
+def _decodificador():
+    """Devuelve una función que decodifica un PNG, o None si no hay librería disponible."""
+    try:
+        import cv2
+        import numpy as np
+        detector = cv2.QRCodeDetector()
+
+        def decodificar(png):
+            imagen = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_GRAYSCALE)
+            return detector.detectAndDecode(imagen)[0]
+        return decodificar
+    except ImportError:
+        pass
+    try:
+        from pyzbar.pyzbar import decode
+
+        def decodificar(png):
+            return decode(Image.open(io.BytesIO(png)))[0].data.decode('utf-8')
+        return decodificar
+    except ImportError:
+        return None
+
+
+def describir(contenido, repeticiones, decodificar):
+    qr = qrcode.QRCode(error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{QR_PARAMETROS['error_correction']}"))
+    qr.add_data(contenido)
+    qr.make(fit=True)
+    png = generate_qr_code_img(contenido).getvalue()
+    resultado = {
+        'caracteres': len(contenido),
+        'version': qr.version,
+        'modulos': qr.modules_count,
+        'generacion_ms': medir(lambda: generate_qr_code_img(contenido), repeticiones)[0],
+        'png_bytes': len(png),
+        'decodificacion_ms': None,
+    }
+    if decodificar:
+        resultado['decodificacion_ms'] = medir(lambda: decodificar(png), repeticiones)[0]
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    args = parser.parse_args()
+
+    decodificar = _decodificador()
+    if not decodificar:
+        print('(Sin OpenCV ni pyzbar: no se mide la decodificación)')
+
+    print(f"{'participante':>12} | {'formato':>8} | {'chars':>5} | {'versión':>7} | {'módulos':>7} | "
+          f"{'generar ms':>10} | {'PNG bytes':>9} | {'decodificar ms':>14}")
+    for datos in PARTICIPANTES:
+        formatos = {
+            'json': json.dumps(datos, ensure_ascii=False),
+            'compacto': firmar(datos['id'], 1, SECRET_KEY),
+        }
+        for formato, contenido in formatos.items():
+            r = describir(contenido, args.repeticiones, decodificar)
+            decod = f"{r['decodificacion_ms']:.2f}" if r['decodificacion_ms'] is not None else '-'
+            print(f"{datos['id']:>12} | {formato:>8} | {r['caracteres']:>5} | {r['version']:>7} | {r['modulos']:>7} | "
+                  f"{r['generacion_ms']:>10.2f} | {r['png_bytes']:>9} | {decod:>14}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,381 @@
+"""
+Suite de benchmarks de la aplicación completa (escaneo, reportes, dashboard, QR e importación).
+
+Siembra una base de datos con un evento sintético del tamaño indicado y mide, a
+través de la app real (`create_app`):
+  - escaneos: `operador.validar_qr` con varios operadores simultáneos,
+  - reportes: primera página, página siguiente, con filtros y la API JSON,
+  - dashboard: la página y su endpoint de actualización,
+  - qrs: `generar_todos_los_qrs` hasta que el ZIP está listo (en frío y con caché),
+  - importacion: `importar_datos` con un libro generado.
+
+Por defecto usa una base SQLite temporal y el cliente de pruebas de Flask, sin
+red. Con `--wsgi` los escaneos se envían por HTTP a un servidor WSGI local con
+hilos; con `--db-url` puede usarse una base MySQL (se BORRA su contenido, por lo
+que exige `--permitir-borrado`).
+
+El resultado es un JSON (parámetros, entorno, estadísticas por escenario y las
+métricas por endpoint del servidor) que puede compararse con una corrida
+anterior usando `--comparar`.
+
+Uso:
+    python benchmarks/bench_suite.py [--participantes 2000] [--registros 50000] [--operadores 8]
+        [--escaneos 100] [--escenarios escaneos reportes] [--wsgi] [--salida resultado.json]
+        [--comparar anterior.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from comun import resumir
+import sqlalchemy
+from sqlalchemy import insert, text
+from werkzeug.serving import make_server
+
+from bench_importacion import PAISES, generar_libro
+
+ESCENARIOS = ['escaneos', 'reportes', 'dashboard', 'qrs', 'importacion']
+CLAVE = 'benchmark'
+LOTE = 20_000
+
+
+# --- Clientes ---
+
+class ClienteFlask:
+    """Cliente de pruebas de Flask: sin red, dentro del mismo proceso."""
+
+    def __init__(self, app):
+        self._cliente = app.test_client()
+
+    def login(self, usuario):
+        self._cliente.post('/login', data={'username': usuario, 'password': CLAVE})
+
+    def get(self, ruta):
+        r = self._cliente.get(ruta)
+        return r.status_code, r.data, r.headers
+
+    def post_json(self, ruta, datos):
+        r = self._cliente.post(ruta, json=datos)
+        return r.status_code, r.data
+
+    def post_archivo(self, ruta, campo, ruta_archivo):
+        with open(ruta_archivo, 'rb') as f:
+            r = self._cliente.post(ruta, data={campo: (f, os.path.basename(ruta_archivo))},
+                                   content_type='multipart/form-data')
+        return r.status_code, r.data
+
+
+class ClienteHttp:
+    """Cliente HTTP real contra el servidor WSGI local (con su propia cookie de sesión)."""
+
+    def __init__(self, base):
+        self._base = base
+        self._opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor())
+
+    def login(self, usuario):
+        datos = urllib.parse.urlencode({'username': usuario, 'password': CLAVE}).encode()
+        self._opener.open(self._base + '/login', datos).read()
+
+    def post_json(self, ruta, datos):
+        peticion = urllib.request.Request(
+            self._base + ruta, data=json.dumps(datos).encode(), headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with self._opener.open(peticion) as r:
+                return r.status, r.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+# --- Datos sintéticos ---
+
+def sembrar(app, p):
+    """Crea usuarios, catálogos, participantes y un historial de registros de los últimos 3 días."""
+    from app import bcrypt, db
+    from app.models.models import (Committe, Configuracion, InstitucionEducativa, Pais, Participante,
+                                   Registro, User)
+    from app.services import agregados
+    from app.services.config_cache import config_cache
+    from app.utils import BACKFILLS
+
+    rng = random.Random(p.semilla)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        clave = bcrypt.generate_password_hash(CLAVE, rounds=4).decode('utf-8')
+        db.session.add(User(username='admin', password=clave, role='admin'))
+        db.session.add_all([User(username=f'operador{i}', password=clave, role='operador') for i in range(p.operadores)])
+        evento = Configuracion(nombre_evento='Benchmark', fechas_evento='-', meriendas_totales=6,
+                               cooldown_minutos=p.cooldown, activo=True)
+        db.session.add(evento)
+        db.session.add_all([Committe(nombre_committe=f'Comité {i}') for i in range(p.committes)])
+        db.session.add_all([Pais(nombre_pais=nombre, country_code='co') for nombre in PAISES])
+        db.session.add_all([InstitucionEducativa(nombre_institucion=f'Institución Educativa {i}')
+                            for i in range(p.instituciones)])
+        db.session.flush()
+
+        for desde in range(0, p.participantes, LOTE):
+            db.session.execute(insert(Participante), [
+                {'nombre_participante': f'Delegado {i}', 'saldo_merienda': 10 ** 6, 'evento_id': evento.id_config,
+                 'committe_id': rng.randint(1, p.committes), 'pais_id': rng.randint(1, len(PAISES)),
+                 'institucion_id': rng.randint(1, p.instituciones)}
+                for i in range(desde, min(desde + LOTE, p.participantes))
+            ])
+
+        inicio = datetime.utcnow() - timedelta(days=3)
+        for desde in range(0, p.registros, LOTE):
+            db.session.execute(insert(Registro), [
+                {'id_participante': rng.randint(1, p.participantes), 'evento_id': evento.id_config,
+                 'operador_responsable_id': rng.randint(2, p.operadores + 1),
+                 'fecha_hora': inicio + timedelta(seconds=rng.randint(0, 3 * 86400 - 7200))}
+                for _ in range(min(LOTE, p.registros - desde))
+            ])
+        db.session.execute(text(BACKFILLS[('participante', 'ultimo_registro_at')]))
+        db.session.commit()
+        agregados.reconstruir(db.session, evento.id_config)
+        config_cache.invalidar()
+
+
+# --- Escenarios ---
+
+def cronometrar_get(cliente, ruta, repeticiones):
+    tiempos, estados = [], Counter()
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        status, _, _ = cliente.get(ruta)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+        estados[status] += 1
+    return {**resumir(tiempos), 'estados': dict(estados)}
+
+
+def escenario_escaneos(app, p, base_http):
+    from app.models.models import Configuracion
+    from app.services.qr_token import firmar
+
+    with app.app_context():
+        evento_id = Configuracion.query.first().id_config
+    secret = app.config['SECRET_KEY']
+
+    def operador(i):
+        cliente = ClienteHttp(base_http) if base_http else ClienteFlask(app)
+        cliente.login(f'operador{i}')
+        rng = random.Random(p.semilla + i)
+        tiempos, estados = [], Counter()
+        for _ in range(p.escaneos):
+            token = firmar(rng.randint(1, p.participantes), evento_id, secret)
+            t0 = time.perf_counter()
+            status, cuerpo = cliente.post_json('/operador/validar_qr', {'qr': token})
+            tiempos.append((time.perf_counter() - t0) * 1000)
+            try:
+                estados[json.loads(cuerpo).get('estado', status)] += 1
+            except ValueError:
+                estados[status] += 1
+        return tiempos, estados
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(p.operadores) as ejecutor:
+        resultados = list(ejecutor.map(operador, range(p.operadores)))
+    segundos = time.perf_counter() - t0
+
+    tiempos = [t for ts, _ in resultados for t in ts]
+    estados = sum((e for _, e in resultados), Counter())
+    return {'validar_qr': {
+        **resumir(tiempos),
+        'operadores': p.operadores,
+        'transporte': 'http' if base_http else 'test_client',
+        'escaneos_por_segundo': round(len(tiempos) / segundos, 1),
+        'estados': dict(estados),
+    }}
+
+
+def escenario_reportes(app, p, cliente):
+    _, cuerpo, _ = cliente.get('/admin/api/reportes')
+    siguiente = json.loads(cuerpo)['siguiente']
+    ayer = (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%d')
+    return {
+        'reportes_primera_pagina': cronometrar_get(cliente, '/admin/reportes', p.repeticiones),
+        'reportes_pagina_siguiente': cronometrar_get(
+            cliente, f'/admin/reportes?cursor={siguiente}', p.repeticiones),
+        'reportes_filtrado': cronometrar_get(
+            cliente, f'/admin/reportes?fecha={ayer}&committe_id=1&sort_by=participante&order=asc', p.repeticiones),
+        'api_reportes': cronometrar_get(cliente, '/admin/api/reportes?por_pagina=200', p.repeticiones),
+    }
+
+
+def escenario_dashboard(app, p, cliente):
+    return {
+        'dashboard': cronometrar_get(cliente, '/admin/', p.repeticiones),
+        'api_dashboard': cronometrar_get(cliente, '/admin/api/dashboard', p.repeticiones),
+    }
+
+
+def _generar_zip(cliente):
+    """Lanza la generación del ZIP de QR y espera a que termine. Devuelve los segundos."""
+    t0 = time.perf_counter()
+    _, _, cabeceras = cliente.get('/admin/participantes/generar_qrs')
+    tarea_id = cabeceras['Location'].rstrip('/').rsplit('/', 1)[-1]
+    while True:
+        _, cuerpo, _ = cliente.get(f'/admin/tareas/{tarea_id}/estado')
+        estado = json.loads(cuerpo)
+        if estado['estado'] in ('completada', 'error'):
+            break
+        time.sleep(0.05)
+    if estado['estado'] == 'error':
+        raise RuntimeError(f"La generación de QR falló: {estado.get('error')}")
+    return time.perf_counter() - t0
+
+
+def escenario_qrs(app, p, cliente):
+    return {
+        'qrs_en_frio': {'segundos': round(_generar_zip(cliente), 3), 'participantes': p.participantes,
+                        'workers': app.config['QR_WORKERS']},
+        'qrs_con_cache': {'segundos': round(_generar_zip(cliente), 3), 'participantes': p.participantes,
+                          'workers': app.config['QR_WORKERS']},
+    }
+
+
+def escenario_importacion(app, p, cliente, carpeta):
+    ruta = os.path.join(carpeta, 'importacion.xlsx')
+    generar_libro(ruta, p.filas_importacion)
+    tiempos = []
+    for _ in range(p.repeticiones_importacion):
+        t0 = time.perf_counter()
+        cliente.post_archivo('/admin/importar', 'file', ruta)
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return {'importacion': {**resumir(tiempos), 'filas': p.filas_importacion}}
+
+
+# --- Ejecución ---
+
+def entorno(app):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        commit = None
+    from app import db
+    with app.app_context():
+        dialecto = db.engine.dialect.name
+    return {
+        'fecha': datetime.utcnow().isoformat() + 'Z',
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'base_de_datos': dialecto,
+    }
+
+
+def comparar(anterior, actual):
+    """Imprime la variación de p50/p99 (o segundos) de cada medición respecto de una corrida anterior."""
+    print(f"{'medición':<28} | {'antes':>10} | {'ahora':>10} | {'cambio':>8}", file=sys.stderr)
+    for nombre, nuevo in actual['resultados'].items():
+        viejo = anterior.get('resultados', {}).get(nombre)
+        if not viejo:
+            continue
+        for clave in ('p50_ms', 'p99_ms', 'segundos'):
+            if clave in nuevo and clave in viejo and viejo[clave]:
+                cambio = (nuevo[clave] - viejo[clave]) / viejo[clave] * 100
+                print(f'{nombre + " " + clave:<28} | {viejo[clave]:>10.2f} | {nuevo[clave]:>10.2f} | {cambio:>+7.1f}%',
+                      file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db-url', help='URL de SQLAlchemy (por defecto, SQLite temporal)')
+    parser.add_argument('--permitir-borrado', action='store_true',
+                        help='Necesario con --db-url que no sea SQLite: la base se vacía y se vuelve a sembrar')
+    parser.add_argument('--participantes', type=int, default=2000)
+    parser.add_argument('--committes', type=int, default=25)
+    parser.add_argument('--instituciones', type=int, default=60)
+    parser.add_argument('--registros', type=int, default=50_000)
+    parser.add_argument('--operadores', type=int, default=8, help='Operadores escaneando a la vez')
+    parser.add_argument('--escaneos', type=int, default=100, help='Escaneos por operador')
+    parser.add_argument('--cooldown', type=int, default=0, help='Minutos de cooldown del evento sembrado')
+    parser.add_argument('--repeticiones', type=int, default=20, help='Repeticiones de cada página medida')
+    parser.add_argument('--filas-importacion', type=int, default=1000)
+    parser.add_argument('--repeticiones-importacion', type=int, default=3)
+    parser.add_argument('--escenarios', nargs='+', choices=ESCENARIOS, default=ESCENARIOS)
+    parser.add_argument('--wsgi', action='store_true', help='Enviar los escaneos por HTTP a un servidor WSGI local')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, salida estándar)')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior para comparar')
+    p = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        url = p.db_url or f"sqlite:///{os.path.join(carpeta, 'bench.db')}"
+        if not url.startswith('sqlite') and not p.permitir_borrado:
+            parser.error('--db-url apunta a una base que no es SQLite: agregue --permitir-borrado para vaciarla.')
+        os.environ['DATABASE_URL'] = url
+
+        from app import create_app
+        from app.services.metricas import metricas
+        app = create_app()
+        # Carpetas temporales para no tocar la caché de QR ni las exportaciones reales
+        app.config['QR_CACHE_FOLDER'] = os.path.join(carpeta, 'qr_cache')
+        app.config['EXPORTS_FOLDER'] = os.path.join(carpeta, 'exportaciones')
+        os.makedirs(app.config['QR_CACHE_FOLDER'])
+
+        sembrar(app, p)
+        metricas.reiniciar()
+
+        servidor = None
+        if p.wsgi:
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            servidor = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+
+        admin = ClienteFlask(app)
+        admin.login('admin')
+        resultados = {}
+        try:
+            for escenario in p.escenarios:
+                print(f'Ejecutando {escenario}...', file=sys.stderr)
+                if escenario == 'escaneos':
+                    base = f'http://127.0.0.1:{servidor.server_port}' if servidor else None
+                    resultados.update(escenario_escaneos(app, p, base))
+                elif escenario == 'importacion':
+                    resultados.update(escenario_importacion(app, p, admin, carpeta))
+                else:
+                    resultados.update(globals()[f'escenario_{escenario}'](app, p, admin))
+        finally:
+            if servidor:
+                servidor.shutdown()
+
+        salida = {
+            'parametros': {k: v for k, v in vars(p).items() if k not in ('salida', 'comparar', 'db_url')},
+            'entorno': entorno(app),
+            'resultados': resultados,
+            'servidor': metricas.resumen()['endpoints'],
+        }
+
+    texto = json.dumps(salida, indent=2, ensure_ascii=False)
+    if p.salida:
+        with open(p.salida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+    if p.comparar:
+        with open(p.comparar, encoding='utf-8') as f:
+            comparar(json.load(f), salida)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Utilidades compartidas por los benchmarks."""
+import os
+import sys
+import time
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+
+from app import db
+
+
+def crear_app(ruta_db):
+    """App mínima con la extensión de base de datos apuntando a un archivo SQLite."""
+    app = Flask('benchmark')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{ruta_db}'
+    db.init_app(app)
+    return app
+
+
+def medir(funcion, repeticiones):
+    """Ejecuta `funcion` varias veces y devuelve (p50, p99) en milisegundos."""
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    tiempos.sort()
+    return statistics.median(tiempos), tiempos[max(int(len(tiempos) * 0.99) - 1, 0)]
+
+
+def resumir(tiempos_ms):
+    """Estadísticas de una lista de tiempos en milisegundos, listas para volcar a JSON."""
+    if not tiempos_ms:
+        return {'n': 0}
+    ordenados = sorted(tiempos_ms)
+
+    def percentil(p):
+        return round(ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)], 3)
+
+    return {
+        'n': len(ordenados),
+        'media_ms': round(statistics.fmean(ordenados), 3),
+        'p50_ms': percentil(0.50),
+        'p90_ms': percentil(0.90),
+        'p99_ms': percentil(0.99),
+        'max_ms': round(ordenados[-1], 3),
+    }
@@ -0,0 +1,42 @@
+"""
+Configuración de gunicorn para producción (`gunicorn -c gunicorn.conf.py wsgi:app`).
+
+Se usan workers `gthread`: las vistas pasan la mayor parte del tiempo esperando a
+MySQL, así que varios hilos por proceso aprovechan mejor la CPU que más procesos.
+Cada worker tiene su propio pool de conexiones, de modo que el máximo de
+conexiones abiertas es WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW), que
+debe quedar por debajo de `max_connections` de MySQL. Conviene que
+GUNICORN_THREADS no supere DB_POOL_SIZE + DB_MAX_OVERFLOW para que ningún hilo
+espere una conexión libre.
+
+El feed en vivo (/admin/eventos), las métricas y la caché de configuración viven
+en memoria de cada proceso: con WEB_CONCURRENCY > 1 cada worker ve solo sus
+propios eventos y métricas. Por eso el perfil por defecto es un proceso con
+varios hilos.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Las conexiones SSE del feed en vivo duran EVENTOS_DURACION_CONEXION (300 s) y
+# mantienen ocupado un hilo; el timeout solo vigila que el worker siga vivo.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Reciclado de workers desactivado por defecto: al reiniciar un worker se pierden
+# sus métricas, las respuestas guardadas por clave de idempotencia, el búfer del
+# feed en vivo y los índices en memoria, y las tareas en segundo plano que
+# ejecutaba quedan interrumpidas (se marcan como error, ver services/tareas.py).
+# Con un solo proceso, además, el servicio se corta durante el reinicio. Solo si
+# la memoria crece sin control conviene fijar GUNICORN_MAX_REQUESTS (p. ej. 5000)
+# y, en ese caso, usar WEB_CONCURRENCY > 1.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
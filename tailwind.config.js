@@ -0,0 +1,12 @@
+/** Configuración de Tailwind para el build de activos (`flask build-assets`). */
+module.exports = {
+  // Solo se incluyen en el CSS las clases que aparecen en estos archivos
+  content: [
+    './app/templates/**/*.html',
+    './app/static/js/**/*.js',
+  ],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};
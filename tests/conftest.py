@@ -0,0 +1,104 @@
+"""Fixtures compartidas: la app completa sobre un archivo SQLite temporal."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import bcrypt, create_app, db
+from app.models.models import Committe, Configuracion, InstitucionEducativa, Pais, Participante, User
+from app.services.config_cache import config_cache
+from app.services.idempotencia import resultados_recientes
+from app.services.indice_participantes import indice_participantes
+from app.services.usuarios_cache import usuarios_cache
+
+CONTRASENA = 'x'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App con TESTING, base SQLite y archivos de versión/exportaciones propios de cada prueba."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('BCRYPT_LOG_ROUNDS', '4')
+    app = create_app()
+    app.config.update(
+        TESTING=True,
+        CONFIG_VERSION_FILE=str(tmp_path / 'config.version'),
+        USER_CACHE_VERSION_FILE=str(tmp_path / 'usuarios.version'),
+        PARTICIPANT_INDEX_VERSION_FILE=str(tmp_path / 'participantes.version'),
+        EXPORTS_FOLDER=str(tmp_path / 'exportaciones'),
+        QR_CACHE_FOLDER=str(tmp_path / 'qr_cache'),
+    )
+    # Las extensiones son únicas por proceso: se vuelven a enlazar a esta app y se vacían
+    for extension in (config_cache, usuarios_cache, indice_participantes, resultados_recientes):
+        extension.init_app(app)
+    resultados_recientes._entradas.clear()
+
+    with app.app_context():
+        db.create_all()
+        for extension in (config_cache, usuarios_cache, indice_participantes):
+            extension.invalidar()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def contexto(app):
+    """
+    Contexto de aplicación para las pruebas que usan los servicios directamente.
+
+    Las pruebas que hacen peticiones no deben tenerlo abierto: Flask reutilizaría
+    el contexto (y `g`, con el usuario de la sesión) en todas las peticiones.
+    """
+    with app.app_context():
+        yield
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def sembrar(app, participantes=5, saldo=6, cooldown=60):
+    """
+    Evento activo con un admin ('admin'), un operador ('op'), un comité, un país,
+    una institución y `participantes` participantes con `saldo` meriendas.
+
+    Returns:
+        list[int]: ids de los participantes creados.
+    """
+    with app.app_context():
+        return _sembrar(participantes, saldo, cooldown)
+
+
+def _sembrar(participantes, saldo, cooldown):
+    contrasena = bcrypt.generate_password_hash(CONTRASENA).decode('utf-8')
+    db.session.add_all([
+        User(username='admin', password=contrasena, role='admin'),
+        User(username='op', password=contrasena, role='operador'),
+        Configuracion(nombre_evento='Evento', fechas_evento='Diciembre', meriendas_totales=saldo,
+                      cooldown_minutos=cooldown, activo=True),
+    ])
+    committe = Committe(nombre_committe='Consejo de Seguridad')
+    pais = Pais(nombre_pais='Colombia', country_code='co')
+    institucion = InstitucionEducativa(nombre_institucion='Colegio')
+    db.session.add_all([committe, pais, institucion])
+    db.session.flush()
+    nuevos = [
+        Participante(nombre_participante=f'Participante {i}', saldo_merienda=saldo, evento_id=1,
+                     committe_id=committe.id_committe, pais_id=pais.id_pais,
+                     institucion_id=institucion.id_institucion)
+        for i in range(participantes)
+    ]
+    db.session.add_all(nuevos)
+    db.session.commit()
+    config_cache.invalidar()
+    indice_participantes.invalidar()
+    return [p.id_participante for p in nuevos]
+
+
+def iniciar_sesion(client, usuario='admin'):
+    return client.post('/login', data={'username': usuario, 'password': CONTRASENA})
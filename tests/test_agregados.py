@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from conftest import sembrar
+
+from app import db
+from app.models.models import ContadorAgregado
+from app.services import agregados
+from app.services.redencion import redimir_merienda
+
+ZONA = 'America/Bogota'
+
+
+def test_contadores_fragmentados_suman_lo_mismo_que_la_reconstruccion(app, contexto):
+    ids = sembrar(app, participantes=10, saldo=3, cooldown=0)
+    ahora = datetime(2025, 12, 1, 15, 0)  # 10:00 en Bogotá
+    agregados.ajustar_participantes(db.session, 10, 10)
+    db.session.commit()
+    for vuelta in range(3):
+        for i, participante_id in enumerate(ids):
+            redimir_merienda(participante_id, 2 if i % 3 else 1, 0, ahora=ahora + timedelta(minutes=20 * vuelta + i),
+                             evento_id=1, zona_horaria=ZONA)
+
+    fragmentados = agregados.resumen(db.session, ahora=ahora, zona_horaria=ZONA)
+    filas_total = db.session.query(ContadorAgregado).filter_by(dimension=agregados.TOTAL).count()
+    agregados.reconstruir(db.session, 1)
+    reconstruidos = agregados.resumen(db.session, ahora=ahora, zona_horaria=ZONA)
+
+    assert filas_total > 1
+    assert fragmentados == reconstruidos
+    assert fragmentados['entregadas'] == fragmentados['hoy'] == 30
+    assert (fragmentados['participantes'], fragmentados['con_saldo']) == (10, 0)
+    assert fragmentados['por_hora'] == [{'hora': '10', 'valor': 30}]
+    assert fragmentados['por_committe'] == [{'nombre': 'Consejo de Seguridad', 'valor': 30}]
+    assert fragmentados['por_operador'] == [{'nombre': 'op', 'valor': 18}, {'nombre': 'admin', 'valor': 12}]
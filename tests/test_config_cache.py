@@ -0,0 +1,97 @@
+import os
+import types
+
+import pytest
+from conftest import iniciar_sesion, sembrar
+from flask import Flask
+from sqlalchemy import event, update
+from sqlalchemy.engine import Engine
+
+from app import db
+from app.models.models import Configuracion
+from app.services import config_cache as modulo
+from app.services.config_cache import CacheConfiguracion, config_cache
+
+
+@pytest.fixture
+def consultas():
+    contadas = []
+
+    def contar(*args):
+        contadas.append(1)
+
+    event.listen(Engine, 'before_cursor_execute', contar)
+    yield contadas
+    event.remove(Engine, 'before_cursor_execute', contar)
+
+
+@pytest.fixture
+def otro_worker(app):
+    """Caché de otro proceso: su propia copia, el mismo archivo de versión."""
+    app_worker = Flask(__name__)
+    app_worker.config['CONFIG_VERSION_FILE'] = app.config['CONFIG_VERSION_FILE']
+    return CacheConfiguracion(app_worker)
+
+
+def _cambiar_cooldown(minutos):
+    db.session.execute(update(Configuracion).where(Configuracion.id_config == 1).values(cooldown_minutos=minutos))
+    db.session.commit()
+
+
+def test_la_configuracion_se_sirve_desde_la_cache(app, contexto, consultas):
+    sembrar(app, participantes=0, cooldown=60)
+    del consultas[:]
+    assert config_cache.obtener().cooldown_minutos == 60
+    assert len(consultas) == 1
+
+    _cambiar_cooldown(5)
+    del consultas[:]
+    # Sin invalidar, se sigue sirviendo la copia sin ir a la base de datos
+    assert config_cache.obtener().cooldown_minutos == 60
+    assert consultas == []
+
+    config_cache.invalidar()
+    assert config_cache.obtener().cooldown_minutos == 5
+
+
+def test_otro_worker_ve_el_cambio_de_version(app, contexto, otro_worker):
+    sembrar(app, participantes=0, cooldown=60)
+    assert otro_worker.obtener().cooldown_minutos == 60
+
+    _cambiar_cooldown(5)
+    assert otro_worker.obtener().cooldown_minutos == 60
+    config_cache.invalidar()
+    assert otro_worker.obtener().cooldown_minutos == 5
+
+    # Basta con que cambie la fecha del archivo (p. ej. `touch` desde un despliegue)
+    _cambiar_cooldown(10)
+    estado = os.stat(app.config['CONFIG_VERSION_FILE'])
+    os.utime(app.config['CONFIG_VERSION_FILE'], ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000))
+    assert otro_worker.obtener().cooldown_minutos == 10
+
+
+def test_la_copia_caduca_con_el_ttl(app, contexto, monkeypatch):
+    sembrar(app, participantes=0, cooldown=60)
+    reloj = [1000.0]
+    monkeypatch.setattr(modulo, 'time', types.SimpleNamespace(monotonic=lambda: reloj[0], time_ns=lambda: 0))
+    assert config_cache.obtener().cooldown_minutos == 60
+
+    _cambiar_cooldown(5)
+    reloj[0] += app.config['CONFIG_CACHE_TTL'] - 1
+    assert config_cache.obtener().cooldown_minutos == 60
+    reloj[0] += 1
+    assert config_cache.obtener().cooldown_minutos == 5
+
+
+def test_guardar_la_configuracion_invalida_la_cache(app, client, otro_worker):
+    sembrar(app, participantes=0, cooldown=60)
+    with app.app_context():
+        assert otro_worker.obtener().cooldown_minutos == 60
+    iniciar_sesion(client)
+
+    client.post('/admin/configuracion', data={
+        'nombre_evento': 'Evento', 'fechas_evento': 'Diciembre', 'meriendas_totales': 6, 'cooldown_minutos': 15,
+    })
+
+    with app.app_context():
+        assert otro_worker.obtener().cooldown_minutos == 15
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+from flask import has_request_context
+from sqlalchemy import event, insert
+from sqlalchemy.engine import Engine
+
+from conftest import iniciar_sesion, sembrar
+
+from app import db
+from app.models.models import Committe, InstitucionEducativa, Pais, Participante, Registro, User
+
+# Vistas con `presupuesto_consultas`; en modo TESTING superarlo lanza PresupuestoExcedido
+VISTAS = [
+    '/admin/',
+    '/admin/api/dashboard',
+    '/admin/participantes',
+    '/admin/committes',
+    '/admin/paises',
+    '/admin/instituciones',
+    '/admin/reportes',
+    '/admin/api/reportes',
+    '/admin/usuarios',
+]
+
+
+def _agregar_filas(app, cantidad, desde):
+    """Agrega `cantidad` comités, países, instituciones, usuarios, participantes y entregas."""
+    with app.app_context():
+        _insertar_filas(range(desde, desde + cantidad))
+
+
+def _insertar_filas(rango):
+    db.session.execute(insert(Committe), [{'nombre_committe': f'Comité {i}'} for i in rango])
+    db.session.execute(insert(Pais), [{'nombre_pais': f'País {i}', 'country_code': 'co'} for i in rango])
+    db.session.execute(insert(InstitucionEducativa), [{'nombre_institucion': f'Colegio {i}'} for i in rango])
+    db.session.execute(insert(User), [{'username': f'operador{i}', 'password': 'x', 'role': 'operador'} for i in rango])
+    db.session.flush()
+    # Cada participante con su propio comité, país e institución: un N+1 se notaría en cualquiera
+    db.session.execute(insert(Participante), [
+        {'nombre_participante': f'Participante {i}', 'saldo_merienda': 5, 'evento_id': 1,
+         'committe_id': i + 2, 'pais_id': i + 2, 'institucion_id': i + 2}
+        for i in rango
+    ])
+    ids = [p.id_participante for p in db.session.query(Participante.id_participante)
+           .filter(Participante.nombre_participante.in_([f'Participante {i}' for i in rango]))]
+    db.session.execute(insert(Registro), [
+        {'id_participante': pid, 'evento_id': 1, 'operador_responsable_id': 3 + i, 'fecha_hora': datetime.utcnow()}
+        for i, pid in zip(rango, ids)
+    ])
+    db.session.commit()
+
+
+def _consultas(client, url):
+    """Consultas SQL que ejecuta la petición (falla si se supera el presupuesto de la vista)."""
+    contadas = []
+
+    def contar(*args):
+        if has_request_context():
+            contadas.append(1)
+
+    event.listen(Engine, 'before_cursor_execute', contar)
+    try:
+        respuesta = client.get(url)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', contar)
+    assert respuesta.status_code == 200, url
+    return len(contadas)
+
+
+@pytest.mark.parametrize('url', VISTAS)
+def test_consultas_no_crecen_con_las_filas(app, client, url):
+    sembrar(app, participantes=1)
+    _agregar_filas(app, 2, desde=0)
+    iniciar_sesion(client)
+    client.get(url)  # carga el usuario y la configuración en caché
+
+    pocas = _consultas(client, url)
+    _agregar_filas(app, 40, desde=2)
+    muchas = _consultas(client, url)
+
+    assert pocas == muchas
+
+
+def test_presupuesto_excedido_falla_en_modo_pruebas(app, client):
+    from app.services.consultas import PresupuestoExcedido, presupuesto_consultas
+
+    @app.route('/prueba-n-mas-1')
+    @presupuesto_consultas(1)
+    def prueba_n_mas_1():
+        return str([p.committe.nombre_committe for p in db.session.query(Participante)])
+
+    sembrar(app, participantes=1)
+    _agregar_filas(app, 3, desde=0)
+    with pytest.raises(PresupuestoExcedido):
+        client.get('/prueba-n-mas-1')
@@ -0,0 +1,60 @@
+import json
+import threading
+
+import pytest
+from flask import Flask
+
+from app.services.eventos import CanalEventos
+
+CAPACIDAD = 5
+
+
+@pytest.fixture
+def canal():
+    app = Flask(__name__)
+    app.config['EVENTOS_CAPACIDAD'] = CAPACIDAD
+    return CanalEventos(app)
+
+
+def _recibidos(canal, ultimo_id=None, duracion=0.1):
+    """Números publicados que envía un flujo que empieza después de `ultimo_id`."""
+    recibidos = []
+    for bloque in canal.flujo(ultimo_id, duracion=duracion, latido=0.02):
+        if bloque.startswith('id: '):
+            recibidos.append(json.loads(bloque.split('data: ', 1)[1])['n'])
+    return recibidos
+
+
+def test_el_buffer_conserva_solo_los_ultimos_eventos(canal):
+    ids = [canal.publicar('escaneo', {'n': n}) for n in range(1, 9)]
+
+    # Sin Last-Event-ID se envía el buffer completo: los tres primeros ya se descartaron
+    assert _recibidos(canal) == [4, 5, 6, 7, 8]
+    # Al reconectarse solo recibe lo posterior a su último id
+    assert _recibidos(canal, ids[4]) == [6, 7, 8]
+    assert _recibidos(canal, ids[7]) == []
+    # Si su último id ya salió del buffer, recibe lo que queda
+    assert _recibidos(canal, ids[0]) == [4, 5, 6, 7, 8]
+
+
+@pytest.mark.parametrize('ultimo_id', ['otroproc-6', 'no-es-un-id', ''])
+def test_un_id_de_otro_proceso_recibe_el_buffer_completo(canal, ultimo_id):
+    for n in range(1, 9):
+        canal.publicar('escaneo', {'n': n})
+    assert _recibidos(canal, ultimo_id) == [4, 5, 6, 7, 8]
+
+
+def test_el_flujo_recibe_lo_publicado_mientras_espera(canal):
+    ultimo = canal.publicar('escaneo', {'n': 1})
+    temporizador = threading.Timer(0.05, canal.publicar, ('escaneo', {'n': 2}))
+    temporizador.start()
+    try:
+        assert _recibidos(canal, ultimo, duracion=0.5) == [2]
+    finally:
+        temporizador.join()
+
+
+def test_el_flujo_envia_latidos_sin_eventos(canal):
+    bloques = list(canal.flujo(duracion=0.05, latido=0.01))
+    assert bloques[0] == 'retry: 3000\n\n'
+    assert ': latido\n\n' in bloques
@@ -0,0 +1,47 @@
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from conftest import sembrar
+
+from app import db
+from app.models.models import Registro
+from app.services.exportacion import FILAS_POR_LOTE, generar_csv
+from app.services.reportes import filtros_desde_args
+
+
+def _agregar_registros(desde, hasta):
+    inicio = datetime(2025, 12, 1, 12, 0)
+    db.session.execute(insert(Registro), [
+        {'id_participante': i % 20 + 1, 'evento_id': 1, 'operador_responsable_id': 2,
+         'fecha_hora': inicio + timedelta(seconds=i)}
+        for i in range(desde, hasta)
+    ])
+    db.session.commit()
+
+
+def _pico_csv(filtros):
+    """Recorre la exportación completa y devuelve (bytes generados, pico de memoria de Python)."""
+    tracemalloc.start()
+    try:
+        total = sum(len(bloque) for bloque in generar_csv(db.session, filtros))
+        return total, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_pico_de_memoria_no_depende_de_las_filas(app, contexto):
+    sembrar(app, participantes=20)
+    filtros = filtros_desde_args({})
+    pocas = 2 * FILAS_POR_LOTE
+    _agregar_registros(0, pocas)
+    _pico_csv(filtros)  # primera pasada: compila la consulta y calienta las cachés de SQLAlchemy
+    bytes_pocas, pico_pocas = _pico_csv(filtros)
+
+    _agregar_registros(pocas, 5 * pocas)
+    bytes_muchas, pico_muchas = _pico_csv(filtros)
+
+    # Cinco veces más filas generan cinco veces más CSV, pero el pico de memoria es el de un lote
+    assert bytes_muchas > 4 * bytes_pocas
+    assert pico_muchas < pico_pocas * 1.5
@@ -0,0 +1,116 @@
+import io
+import os
+import re
+import zipfile
+
+import pytest
+from conftest import iniciar_sesion, sembrar
+from PIL import Image
+
+from app.services import fotos
+from app.services.fotos import FotoInvalida, guardar_foto, nombre_derivada
+
+
+def _jpeg(ancho, alto, orientacion=None):
+    """Foto JPEG en memoria; `orientacion` es la etiqueta EXIF 0x0112."""
+    salida = io.BytesIO()
+    imagen = Image.new('RGB', (ancho, alto), (200, 60, 40))
+    exif = Image.Exif()
+    if orientacion:
+        exif[0x0112] = orientacion
+    imagen.save(salida, 'JPEG', exif=exif)
+    return salida.getvalue()
+
+
+@pytest.fixture
+def carpetas(tmp_path):
+    return str(tmp_path / 'fotos'), str(tmp_path / 'fotos' / 'miniaturas')
+
+
+def test_guardar_foto_genera_las_derivadas(carpetas):
+    carpeta_fotos, carpeta_derivadas = carpetas
+
+    nombre = guardar_foto(_jpeg(1200, 800), '.JPG', 5, carpeta_fotos, carpeta_derivadas)
+
+    assert re.fullmatch(r'5_[0-9a-f]{10}\.jpg', nombre)
+    esperadas = {
+        ('mini', 'webp'): ('WEBP', (80, 80)),
+        ('mini', 'jpg'): ('JPEG', (80, 80)),
+        ('media', 'webp'): ('WEBP', (320, 213)),
+        ('media', 'jpg'): ('JPEG', (320, 213)),
+    }
+    assert sorted(os.listdir(carpeta_derivadas)) == sorted(nombre_derivada(nombre, t, f) for t, f in esperadas)
+    for (tamano, formato), (formato_pil, dimensiones) in esperadas.items():
+        with Image.open(os.path.join(carpeta_derivadas, nombre_derivada(nombre, tamano, formato))) as derivada:
+            assert (derivada.format, derivada.size) == (formato_pil, dimensiones)
+    # Solo la original y la carpeta de miniaturas: no quedan temporales
+    assert sorted(os.listdir(carpeta_fotos)) == [nombre, 'miniaturas']
+
+
+def test_derivadas_existentes_se_omiten_salvo_que_se_fuerce(carpetas):
+    carpeta_fotos, carpeta_derivadas = carpetas
+    nombre = guardar_foto(_jpeg(400, 400), '.jpg', 1, carpeta_fotos, carpeta_derivadas)
+    original = os.path.join(carpeta_fotos, nombre)
+
+    assert fotos.generar_derivadas(original, carpeta_derivadas) == 0
+    os.remove(os.path.join(carpeta_derivadas, nombre_derivada(nombre, 'mini', 'webp')))
+    assert fotos.generar_derivadas(original, carpeta_derivadas) == 1
+    assert fotos.generar_derivadas(original, carpeta_derivadas, forzar=True) == 4
+
+
+def test_la_orientacion_exif_se_corrige(carpetas):
+    carpeta_fotos, carpeta_derivadas = carpetas
+    # Orientación 6: la cámara guardó de lado una foto vertical
+    nombre = guardar_foto(_jpeg(400, 200, orientacion=6), '.jpg', 2, carpeta_fotos, carpeta_derivadas)
+    with Image.open(os.path.join(carpeta_derivadas, nombre_derivada(nombre, 'media', 'jpg'))) as media:
+        assert media.size == (160, 320)
+
+
+def test_archivo_que_no_es_imagen(carpetas):
+    carpeta_fotos, carpeta_derivadas = carpetas
+    with pytest.raises(FotoInvalida):
+        guardar_foto(b'no es una imagen', '.jpg', 3, carpeta_fotos, carpeta_derivadas)
+    with pytest.raises(FotoInvalida, match='no admitido'):
+        guardar_foto(_jpeg(10, 10), '.gif', 3, carpeta_fotos, carpeta_derivadas)
+    assert os.listdir(carpeta_fotos) == []
+
+
+def test_filtro_miniatura_y_original_de_derivada(app, carpetas):
+    carpeta_fotos, carpeta_derivadas = carpetas
+    nombre = guardar_foto(_jpeg(100, 100), '.png', 7, carpeta_fotos, carpeta_derivadas)
+    base = nombre[:-len('.png')]
+
+    assert app.jinja_env.filters['miniatura'](nombre, 'mini', 'webp') == f'{base}-mini.webp'
+    assert fotos.original_de_derivada(f'{base}-media.jpg', carpeta_fotos) == os.path.join(carpeta_fotos, nombre)
+    assert fotos.original_de_derivada(f'{base}-enorme.jpg', carpeta_fotos) is None
+    assert fotos.original_de_derivada('8_0000000000-mini.jpg', carpeta_fotos) is None
+
+
+def test_miniatura_se_genera_al_pedirla(app, client, carpetas):
+    carpeta_fotos, carpeta_derivadas = carpetas
+    app.config.update(PHOTOS_FOLDER=carpeta_fotos, PHOTO_THUMBS_FOLDER=carpeta_derivadas)
+    os.makedirs(carpeta_fotos)
+    with open(os.path.join(carpeta_fotos, '9_abcdef0123.jpg'), 'wb') as f:
+        f.write(_jpeg(300, 300))
+    sembrar(app, participantes=0)
+    iniciar_sesion(client)
+
+    respuesta = client.get('/admin/participantes/fotos/9_abcdef0123-mini.webp')
+
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'image/webp'
+    assert 'immutable' in respuesta.headers['Cache-Control']
+    assert client.get('/admin/participantes/fotos/10_abcdef0123-mini.webp').status_code == 404
+
+
+def test_asignar_fotos_zip(tmp_path):
+    ruta = tmp_path / 'fotos.zip'
+    with zipfile.ZipFile(ruta, 'w') as zf:
+        for nombre in ('12.jpg', 'curso/13.PNG', '99.jpg', 'ana.jpg', 'notas.txt', '__MACOSX/._12.jpg', '.DS_Store'):
+            zf.writestr(nombre, b'x')
+        zf.writestr('curso/', b'')
+
+    asignaciones, omitidas = fotos.asignar_fotos_zip(str(ruta), {12, 13})
+
+    assert asignaciones == [('12.jpg', 12), ('curso/13.PNG', 13)]
+    assert [archivo for archivo, _ in omitidas] == ['99.jpg', 'ana.jpg', 'notas.txt']
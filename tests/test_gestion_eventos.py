@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+from conftest import iniciar_sesion, sembrar
+from sqlalchemy import delete, func, select
+
+from app import db
+from app.models.models import Configuracion, Participante, ParticipanteArchivado, Registro, RegistroArchivado, User
+from app.services import agregados, reportes
+from app.services.config_cache import config_cache
+from app.services.gestion_eventos import (OperacionEventoInvalida, activar_evento, archivar_evento, crear_evento,
+                                          evento_activo)
+from app.services.redencion import redimir_merienda
+
+INICIO = datetime(2025, 12, 1, 15, 0)
+
+
+def _contar(modelo, evento_id):
+    return db.session.scalar(select(func.count()).select_from(modelo).where(modelo.evento_id == evento_id))
+
+
+def _dos_eventos(app):
+    """Evento 1 con tres entregas y evento 2 (el activo) con un participante y una entrega."""
+    ids = sembrar(app, participantes=3, cooldown=0)
+    for i, participante_id in enumerate(ids):
+        redimir_merienda(participante_id, 2, 0, ahora=INICIO + timedelta(minutes=i), evento_id=1)
+    crear_evento(db.session, 'Evento 2', 'Enero', 4, 30, 'json')
+    nuevo = Participante(nombre_participante='Otra Persona', saldo_merienda=4, evento_id=2, committe_id=1, pais_id=1,
+                         institucion_id=1)
+    db.session.add(nuevo)
+    db.session.commit()
+    redimir_merienda(nuevo.id_participante, 1, 0, ahora=INICIO, evento_id=2)
+    activar_evento(db.session, 2)
+    config_cache.invalidar()
+    return ids
+
+
+def test_archivar_mueve_todas_las_filas_del_evento(app, contexto):
+    ids = _dos_eventos(app)
+
+    assert archivar_evento(db.session, 1) == (3, 3)
+
+    assert (_contar(Registro, 1), _contar(Participante, 1)) == (0, 0)
+    assert (_contar(RegistroArchivado, 1), _contar(ParticipanteArchivado, 1)) == (3, 3)
+    # El evento en uso no se toca
+    assert (_contar(Registro, 2), _contar(Participante, 2)) == (1, 1)
+    archivados = db.session.scalars(select(RegistroArchivado).order_by(RegistroArchivado.fecha_hora)).all()
+    assert [r.id_participante for r in archivados] == ids
+    assert {(r.nombre_committe, r.nombre_institucion, r.username, r.saldo_merienda) for r in archivados} == {
+        ('Consejo de Seguridad', 'Colegio', 'op', 5)
+    }
+    assert db.session.get(ParticipanteArchivado, ids[0]).nombre_pais == 'Colombia'
+    assert db.session.get(Configuracion, 1).archivado_at is not None
+
+
+def test_no_se_archiva_el_evento_activo_ni_dos_veces(app, contexto):
+    _dos_eventos(app)
+
+    with pytest.raises(OperacionEventoInvalida, match='activo'):
+        archivar_evento(db.session, 2)
+    assert _contar(RegistroArchivado, 2) == 0
+
+    archivar_evento(db.session, 1)
+    with pytest.raises(OperacionEventoInvalida, match='ya está archivado'):
+        archivar_evento(db.session, 1)
+    with pytest.raises(OperacionEventoInvalida, match='archivado'):
+        activar_evento(db.session, 1)
+    with pytest.raises(OperacionEventoInvalida, match='no existe'):
+        archivar_evento(db.session, 99)
+
+
+def test_una_fila_sin_copiar_aborta_el_archivado(app, contexto):
+    _dos_eventos(app)
+    # Entrega cuyo operador ya no existe: no se puede resolver su nombre
+    db.session.execute(delete(User).where(User.username == 'op'))
+    db.session.commit()
+
+    with pytest.raises(OperacionEventoInvalida, match='no se archivó nada'):
+        archivar_evento(db.session, 1)
+    assert (_contar(Registro, 1), _contar(Participante, 1)) == (3, 3)
+    assert (_contar(RegistroArchivado, 1), _contar(ParticipanteArchivado, 1)) == (0, 0)
+
+
+def test_activar_reconstruye_los_contadores_del_evento(app, contexto):
+    _dos_eventos(app)
+    resumen = agregados.resumen(db.session, ahora=INICIO)
+    assert (resumen['entregadas'], resumen['participantes']) == (1, 1)
+
+    activar_evento(db.session, 1)
+    resumen = agregados.resumen(db.session, ahora=INICIO)
+    assert (resumen['entregadas'], resumen['participantes']) == (3, 3)
+    assert evento_activo(db.session).id_config == 1
+
+
+def test_reportes_de_un_evento_archivado(app, client):
+    with app.app_context():
+        ids = _dos_eventos(app)
+        archivar_evento(db.session, 1)
+
+        filtros = reportes.resolver_evento(db.session, reportes.filtros_desde_args({'evento_id': '1'}), 2)
+        assert (filtros['evento'], filtros['archivado']) == (1, True)
+        assert 'registro_archivado' in str(reportes.consulta_reporte(filtros))
+        db.session.remove()
+
+    iniciar_sesion(client)
+    cuerpo = client.get('/admin/api/reportes', query_string={'evento_id': 1, 'order': 'asc'}).get_json()
+    assert [r['id_participante'] for r in cuerpo['registros']] == ids
+    assert {r['operador'] for r in cuerpo['registros']} == {'op'}
+    assert client.get('/admin/reportes', query_string={'evento_id': 1}).status_code == 200
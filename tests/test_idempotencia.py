@@ -0,0 +1,109 @@
+import threading
+import types
+
+import pytest
+from conftest import iniciar_sesion, sembrar
+from flask import Flask
+
+from app import db
+from app.models.models import Registro
+from app.services import idempotencia
+from app.services.idempotencia import ResultadosRecientes
+
+HILOS = 8
+
+
+@pytest.fixture
+def resultados():
+    app = Flask(__name__)
+    app.config.update(SCAN_IDEMPOTENCY_TTL=60, SCAN_IDEMPOTENCY_MAX=3, SCAN_IDEMPOTENCY_WAIT=5)
+    return ResultadosRecientes(app)
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj monotónico controlado por la prueba (solo dentro de idempotencia)."""
+    actual = [1000.0]
+    monkeypatch.setattr(idempotencia, 'time', types.SimpleNamespace(monotonic=lambda: actual[0]))
+    return actual
+
+
+def test_reintento_de_validar_qr_recibe_la_respuesta_original(app, client):
+    participante_id = sembrar(app, participantes=1)[0]
+    iniciar_sesion(client, 'op')
+    cabeceras = {'Idempotency-Key': 'lectura-0001'}
+
+    original = client.post('/operador/validar_qr', json={'id_participante': participante_id}, headers=cabeceras)
+    reintento = client.post('/operador/validar_qr', json={'id_participante': participante_id}, headers=cabeceras)
+
+    assert original.status_code == reintento.status_code == 200
+    assert original.get_json()['estado'] == 'ok'
+    assert reintento.get_json() == original.get_json()
+    assert 'Idempotent-Replayed' not in original.headers
+    assert reintento.headers['Idempotent-Replayed'] == 'true'
+    with app.app_context():
+        assert db.session.query(Registro).count() == 1
+
+
+def test_clave_invalida_se_rechaza(app, client):
+    participante_id = sembrar(app, participantes=1)[0]
+    iniciar_sesion(client, 'op')
+    respuesta = client.post('/operador/validar_qr', json={'id_participante': participante_id},
+                            headers={'Idempotency-Key': 'corta'})
+    assert respuesta.status_code == 400
+
+
+def test_llamadas_simultaneas_con_la_misma_clave_ejecutan_una_vez(resultados):
+    barrera = threading.Barrier(HILOS)
+    ejecuciones, respuestas = [], []
+
+    def funcion():
+        ejecuciones.append(1)
+        return 'entregado'
+
+    def llamar():
+        barrera.wait()
+        respuestas.append(resultados.ejecutar(1, 'lectura-0001', funcion))
+
+    hilos = [threading.Thread(target=llamar) for _ in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(ejecuciones) == 1
+    assert sorted(respuestas) == [('entregado', False)] + [('entregado', True)] * (HILOS - 1)
+
+
+def test_las_claves_son_por_operador(resultados):
+    assert resultados.ejecutar(1, 'lectura-0001', lambda: 'a') == ('a', False)
+    assert resultados.ejecutar(2, 'lectura-0001', lambda: 'b') == ('b', False)
+
+
+def test_la_clave_caduca_con_el_ttl(resultados, reloj):
+    assert resultados.ejecutar(1, 'lectura-0001', lambda: 'primera') == ('primera', False)
+    reloj[0] += 59
+    assert resultados.ejecutar(1, 'lectura-0001', lambda: 'segunda') == ('primera', True)
+    reloj[0] += 1
+    assert resultados.obtener(1, 'lectura-0001') is None
+    assert resultados.ejecutar(1, 'lectura-0001', lambda: 'segunda') == ('segunda', False)
+
+
+def test_se_descartan_las_claves_mas_antiguas(resultados, reloj):
+    for i in range(5):
+        resultados.ejecutar(1, f'lectura-000{i}', lambda: i)
+    assert len(resultados) == 3
+    assert [resultados.obtener(1, f'lectura-000{i}') for i in (0, 1)] == [None, None]
+    resultados.guardar(1, 'lectura-0005', 5)
+    assert len(resultados) == 3
+    assert [resultados.obtener(1, f'lectura-000{i}') for i in (3, 4, 5)] == [3, 4, 5]
+
+
+def test_una_excepcion_no_deja_la_clave_guardada(resultados):
+    def falla():
+        raise RuntimeError('sin conexión')
+
+    with pytest.raises(RuntimeError):
+        resultados.ejecutar(1, 'lectura-0001', falla)
+    assert len(resultados) == 0
+    assert resultados.ejecutar(1, 'lectura-0001', lambda: 'entregado') == ('entregado', False)
@@ -0,0 +1,125 @@
+import openpyxl
+import pytest
+
+from conftest import sembrar
+
+from app import db
+from app.models.models import Committe, ContadorAgregado, Participante
+from app.services import agregados
+from app.services.importacion import SINCRONIZAR, importar_libro
+from app.services.redencion import redimir_merienda
+
+
+@pytest.fixture
+def libro(tmp_path):
+    """Crea la plantilla de importación con los estudiantes indicados y devuelve su ruta."""
+    def crear(estudiantes, nombre='importacion.xlsx'):
+        wb = openpyxl.Workbook()
+        wb.remove(wb.active)
+        for hoja, columna, valores in (
+            ('Instituciones', 'nombre_institucion', ['Colegio', 'Liceo']),
+            ('Paises', 'nombre_pais', ['Colombia', 'Chile']),
+            ('Committes', 'nombre_committe', ['Consejo de Seguridad', 'UNICEF']),
+        ):
+            ws = wb.create_sheet(hoja)
+            ws.append([columna])
+            for valor in valores:
+                ws.append([valor])
+        ws = wb.create_sheet('Estudiantes')
+        ws.append(['nombre_participante', 'committe', 'pais_representado', 'institucion_educativa', 'id_externo'])
+        for fila in estudiantes:
+            ws.append(list(fila))
+        ruta = tmp_path / nombre
+        wb.save(ruta)
+        return ruta
+    return crear
+
+
+ESTUDIANTES = [
+    ('Ana Gómez', 'UNICEF', 'Chile', 'Liceo', 'E1'),
+    ('Luis Peña', 'Consejo de Seguridad', 'Colombia', 'Colegio', 'E2'),
+    ('Sara Ruiz', 'UNICEF', 'Colombia', 'Liceo', 'E3'),
+]
+
+
+def _contador(dimension, clave):
+    return db.session.get(ContadorAgregado, (dimension, clave))
+
+
+def test_importacion_inicial(app, contexto, libro):
+    sembrar(app, participantes=0)
+    ruta = libro(ESTUDIANTES + [('Sin Comité', 'OTAN', 'Chile', 'Liceo', 'E4')])
+
+    reporte = importar_libro(ruta, 6, evento_id=1)
+
+    # Solo se crean los catálogos que no existían
+    assert (reporte.instituciones, reporte.paises, reporte.committes) == (1, 1, 1)
+    assert reporte.participantes == 3
+    assert [(o['fila'], o['nombre']) for o in reporte.omitidos] == [(5, 'Sin Comité')]
+    assert db.session.query(Committe).count() == 2
+    participantes = db.session.query(Participante).order_by(Participante.id_externo).all()
+    assert [p.nombre_participante for p in participantes] == ['Ana Gómez', 'Luis Peña', 'Sara Ruiz']
+    assert all(p.saldo_merienda == 6 and p.evento_id == 1 for p in participantes)
+    assert _contador(agregados.PARTICIPANTES, agregados.INSCRITOS).valor == 3
+    assert _contador(agregados.PARTICIPANTES, agregados.CON_SALDO).valor == 3
+
+
+def test_reimportar_el_mismo_libro_no_cambia_nada(app, contexto, libro):
+    sembrar(app, participantes=0)
+    ruta = libro(ESTUDIANTES)
+    importar_libro(ruta, 6, evento_id=1)
+
+    reporte = importar_libro(ruta, 6, evento_id=1, modo=SINCRONIZAR, eliminar_ausentes=True)
+
+    assert (reporte.participantes, reporte.actualizados, reporte.eliminados) == (0, 0, 0)
+    assert reporte.sin_cambios == 3
+    assert reporte.cambios == []
+    assert db.session.query(Participante).count() == 3
+    assert _contador(agregados.PARTICIPANTES, agregados.INSCRITOS).valor == 3
+
+
+def _estado():
+    participantes = db.session.query(Participante).order_by(Participante.id_participante).all()
+    return [(p.id_participante, p.nombre_participante, p.committe_id, p.saldo_merienda) for p in participantes]
+
+
+def test_vista_previa_no_escribe(app, contexto, libro):
+    sembrar(app, participantes=0)
+    importar_libro(libro(ESTUDIANTES), 6, evento_id=1)
+    antes = _estado()
+    inscritos = _contador(agregados.PARTICIPANTES, agregados.INSCRITOS).valor
+
+    # Ana cambia de comité, Sara ya no está y llega un estudiante nuevo
+    ruta = libro([('Ana Gómez', 'Consejo de Seguridad', 'Chile', 'Liceo', 'E1'), ESTUDIANTES[1],
+                  ('Pedro Díaz', 'UNICEF', 'Chile', 'Colegio', 'E5')], nombre='cambios.xlsx')
+    reporte = importar_libro(ruta, 6, evento_id=1, modo=SINCRONIZAR, eliminar_ausentes=True, vista_previa=True)
+
+    assert (reporte.participantes, reporte.actualizados, reporte.eliminados, reporte.sin_cambios) == (1, 1, 1, 1)
+    assert sorted((c['accion'], c['nombre']) for c in reporte.cambios) == [
+        ('actualizado', 'Ana Gómez'), ('eliminado', 'Sara Ruiz'), ('nuevo', 'Pedro Díaz'),
+    ]
+    db.session.expire_all()
+    assert _estado() == antes
+    assert _contador(agregados.PARTICIPANTES, agregados.INSCRITOS).valor == inscritos
+
+
+def test_sincronizar_aplica_solo_la_diferencia(app, contexto, libro):
+    sembrar(app, participantes=0)
+    importar_libro(libro(ESTUDIANTES), 6, evento_id=1)
+    ana = db.session.query(Participante).filter_by(id_externo='E1').one()
+    ana_id = ana.id_participante
+    assert redimir_merienda(ana_id, 1, 60, evento_id=1).estado == 'ok'
+
+    ruta = libro([('Ana María Gómez', 'Consejo de Seguridad', 'Chile', 'Liceo', 'E1'), ESTUDIANTES[1]],
+                 nombre='cambios.xlsx')
+    reporte = importar_libro(ruta, 6, evento_id=1, modo=SINCRONIZAR, eliminar_ausentes=True)
+
+    assert (reporte.actualizados, reporte.eliminados, reporte.sin_cambios) == (1, 1, 1)
+    db.session.expire_all()
+    ana = db.session.get(Participante, ana_id)
+    # Se actualiza la misma fila y se conserva el saldo ya consumido
+    assert (ana.nombre_participante, ana.saldo_merienda) == ('Ana María Gómez', 5)
+    consejo = db.session.query(Committe).filter_by(nombre_committe='Consejo de Seguridad').one()
+    assert ana.committe_id == consejo.id_committe
+    assert db.session.query(Participante).filter_by(id_externo='E3').count() == 0
+    assert _contador(agregados.PARTICIPANTES, agregados.INSCRITOS).valor == 2
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+from conftest import sembrar
+from sqlalchemy import insert, update
+
+from app import db
+from app.models.models import Participante
+from app.services.indice_participantes import BYTES_POR_PARTICIPANTE_MAX, indice_participantes
+from app.services.redencion import COOLDOWN, DESCONOCIDO, SIN_SALDO, redimir_merienda
+
+PARTICIPANTES_MEMORIA = 5000
+
+
+def test_memoria_por_participante_dentro_del_presupuesto(app, contexto):
+    sembrar(app, participantes=0)
+    # Nombres del largo habitual de un carné: dos nombres y dos apellidos
+    db.session.execute(insert(Participante), [
+        {'nombre_participante': f'María José Rodríguez Castaño {i}', 'saldo_merienda': 6, 'evento_id': 1,
+         'committe_id': 1, 'pais_id': 1, 'institucion_id': 1}
+        for i in range(PARTICIPANTES_MEMORIA)
+    ])
+    db.session.commit()
+
+    assert indice_participantes.precargar(1) == PARTICIPANTES_MEMORIA
+    assert indice_participantes.memoria_bytes() / PARTICIPANTES_MEMORIA <= BYTES_POR_PARTICIPANTE_MAX
+
+
+def test_prevalidar_rechaza_desde_memoria(app, contexto):
+    disponible, sin_saldo, en_cooldown = sembrar(app, participantes=3)
+    ahora = datetime.utcnow()
+    db.session.execute(update(Participante).where(Participante.id_participante == sin_saldo).values(saldo_merienda=0))
+    db.session.execute(update(Participante).where(Participante.id_participante == en_cooldown)
+                       .values(ultimo_registro_at=ahora - timedelta(minutes=10)))
+    db.session.commit()
+    indice_participantes.invalidar()
+
+    assert indice_participantes.prevalidar(999, 60, ahora, 1).estado == DESCONOCIDO
+    assert indice_participantes.prevalidar(sin_saldo, 60, ahora, 1).estado == SIN_SALDO
+    resultado = indice_participantes.prevalidar(en_cooldown, 60, ahora, 1)
+    assert resultado.estado == COOLDOWN
+    assert resultado.minutos_restantes == 50
+    # Lo que puede prosperar pasa a la base de datos
+    assert indice_participantes.prevalidar(disponible, 60, ahora, 1) is None
+    # Con el cooldown ya vencido también
+    assert indice_participantes.prevalidar(en_cooldown, 5, ahora, 1) is None
+
+
+def test_prevalidar_sin_evento_no_decide(app, contexto):
+    sembrar(app, participantes=1)
+    assert indice_participantes.prevalidar(999, 60, datetime.utcnow(), None) is None
+
+
+def test_registrar_aplica_la_entrega(app, contexto):
+    participante_id = sembrar(app, participantes=1)[0]
+    ahora = datetime.utcnow()
+    assert indice_participantes.prevalidar(participante_id, 60, ahora, 1) is None
+
+    resultado = redimir_merienda(participante_id, 1, 60, ahora=ahora, evento_id=1)
+    indice_participantes.registrar(resultado, ahora)
+
+    siguiente = indice_participantes.prevalidar(participante_id, 60, ahora + timedelta(minutes=1), 1)
+    assert siguiente.estado == COOLDOWN
+    assert siguiente.saldo_restante == 5
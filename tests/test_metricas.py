@@ -0,0 +1,48 @@
+import pytest
+from flask import abort, g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.services.metricas import metricas
+
+
+@pytest.fixture(autouse=True)
+def metricas_vacias():
+    metricas.reiniciar()
+
+
+def _endpoint(nombre):
+    return metricas.resumen()['endpoints'][nombre]
+
+
+def test_sentencia_fallida_no_deja_mediciones_pendientes(app):
+    with app.test_request_context():
+        app.preprocess_request()
+        with db.engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM tabla_inexistente'))
+            tiempo_con_error = g.tiempo_sql
+            conn.execute(text('SELECT 1'))
+            assert 'inicio_sql' not in conn.info
+        assert 0 < tiempo_con_error < g.tiempo_sql
+
+
+def test_peticiones_con_excepcion_o_5xx_se_registran_como_error(app, client):
+    @app.route('/falla')
+    def falla():
+        raise RuntimeError('fallo de prueba')
+
+    @app.route('/error-500')
+    def error_500():
+        abort(500)
+
+    with pytest.raises(RuntimeError):
+        client.get('/falla')
+    client.get('/error-500')
+    client.get('/healthz')
+
+    assert (_endpoint('falla')['peticiones'], _endpoint('falla')['errores']) == (1, 1)
+    assert (_endpoint('error_500')['peticiones'], _endpoint('error_500')['errores']) == (1, 1)
+    assert _endpoint('salud.healthz')['errores'] == 0
+    assert 'mun_request_errors_total{endpoint="falla"} 1' in metricas.prometheus()
@@ -0,0 +1,125 @@
+import json
+import threading
+
+import pytest
+from conftest import sembrar
+from sqlalchemy import event, func, select, update
+
+from app import db
+from app.models.models import Committe, OperacionMasiva, Participante
+from app.services import agregados
+from app.services.operaciones_masivas import (REASIGNAR, RECARGAR, RESTABLECER, OperacionInvalida, aplicar, filtro,
+                                              recientes)
+from app.services.redencion import OK, redimir_merienda
+
+
+@pytest.fixture
+def participantes(app, contexto):
+    """Seis participantes: los tres primeros sin saldo, con los contadores al día."""
+    ids = sembrar(app, participantes=6, saldo=6)
+    db.session.execute(update(Participante).where(Participante.id_participante.in_(ids[:3])).values(saldo_merienda=0))
+    db.session.commit()
+    agregados.reconstruir(db.session, 1)
+    return ids
+
+
+def _con_saldo():
+    return agregados.resumen(db.session)['con_saldo']
+
+
+def _con_saldo_real():
+    return db.session.scalar(select(func.count()).where(Participante.saldo_merienda > 0))
+
+
+def test_filtro_vacio_se_rechaza():
+    with pytest.raises(OperacionInvalida):
+        filtro()
+    with pytest.raises(OperacionInvalida):
+        filtro(committe_id='', ids='')
+    assert filtro(todos=True)['todos'] is True
+
+
+def test_restablecer_ajusta_el_contador_de_participantes_con_saldo(participantes):
+    assert _con_saldo() == 3
+    afectados = aplicar(db.session, 1, RESTABLECER, filtro(ids=participantes[1:5]), 'admin', cantidad=6)
+    assert afectados == 4
+    # Dos de los cuatro estaban sin saldo
+    assert _con_saldo() == _con_saldo_real() == 5
+
+    afectados = aplicar(db.session, 1, RESTABLECER, filtro(todos=True), 'admin', cantidad=0)
+    assert afectados == 6
+    assert _con_saldo() == _con_saldo_real() == 0
+
+
+def test_recargar_suma_al_saldo_actual(participantes):
+    afectados = aplicar(db.session, 1, RECARGAR, filtro(ids=participantes[2:4]), 'cli', cantidad=2)
+    assert afectados == 2
+    saldos = db.session.scalars(select(Participante.saldo_merienda).where(
+        Participante.id_participante.in_(participantes[2:4])).order_by(Participante.id_participante)).all()
+    assert saldos == [2, 8]
+    assert _con_saldo() == _con_saldo_real() == 4
+
+
+def test_escaneo_simultaneo_no_descuadra_el_contador(app, participantes):
+    # Un participante con la última merienda, que otra estación escanea justo antes del UPDATE masivo
+    db.session.execute(update(Participante).where(Participante.id_participante == participantes[3])
+                       .values(saldo_merienda=1))
+    db.session.commit()
+    agregados.reconstruir(db.session, 1)
+    estados, disparado = [], []
+
+    def escanear():
+        with app.app_context():
+            estados.append(redimir_merienda(participantes[3], 2, 0, evento_id=1).estado)
+            db.session.remove()
+
+    def antes_del_update(conn, cursor, sentencia, *args):
+        if not disparado and sentencia.startswith('UPDATE participante'):
+            disparado.append(True)
+            hilo = threading.Thread(target=escanear)
+            hilo.start()
+            hilo.join()
+
+    event.listen(db.engine, 'before_cursor_execute', antes_del_update)
+    try:
+        aplicar(db.session, 1, RESTABLECER, filtro(todos=True), 'admin', cantidad=6)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', antes_del_update)
+
+    assert estados == [OK]
+    assert _con_saldo() == _con_saldo_real() == 6
+
+
+def test_reasignar_no_cambia_el_contador(participantes):
+    destino = Committe(nombre_committe='Asamblea General')
+    db.session.add(destino)
+    db.session.commit()
+
+    afectados = aplicar(db.session, 1, REASIGNAR, filtro(committe_id=1), 'admin', committe_id=destino.id_committe)
+    assert afectados == 6
+    assert db.session.scalar(select(func.count()).where(Participante.committe_id == destino.id_committe)) == 6
+    assert _con_saldo() == 3
+
+    with pytest.raises(OperacionInvalida):
+        aplicar(db.session, 1, REASIGNAR, filtro(todos=True), 'admin', committe_id=999)
+
+
+def test_solo_afecta_al_evento_indicado(participantes):
+    assert aplicar(db.session, 2, RESTABLECER, filtro(todos=True), 'admin', cantidad=6) == 0
+    assert _con_saldo() == 3
+
+
+def test_la_operacion_queda_en_la_auditoria(participantes):
+    aplicar(db.session, 1, RECARGAR, filtro(ids=participantes[:2]), 'admin', cantidad=3)
+    operacion = recientes(db.session, 1)[0]
+    assert (operacion.usuario, operacion.tipo, operacion.afectados) == ('admin', RECARGAR, 2)
+    assert json.loads(operacion.filtros)['ids'] == participantes[:2]
+    assert json.loads(operacion.parametros) == {'cantidad': 3}
+    assert db.session.query(OperacionMasiva).count() == 1
+
+
+@pytest.mark.parametrize('tipo, cantidad', [(RESTABLECER, -1), (RECARGAR, 0), (RECARGAR, 'x'), ('borrar', 1)])
+def test_parametros_invalidos(participantes, tipo, cantidad):
+    with pytest.raises(OperacionInvalida):
+        aplicar(db.session, 1, tipo, filtro(todos=True), 'admin', cantidad=cantidad)
+    assert db.session.query(OperacionMasiva).count() == 0
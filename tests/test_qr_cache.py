@@ -0,0 +1,61 @@
+import os
+import threading
+
+from conftest import iniciar_sesion, sembrar
+
+from app.services import qr_cache
+
+
+def test_desalojo_limitado_al_evento_y_formato(tmp_path):
+    evento_1 = qr_cache.carpeta_de(str(tmp_path), 1, 'json')
+    evento_2 = qr_cache.carpeta_de(str(tmp_path), 2, 'json')
+    compacto_1 = qr_cache.carpeta_de(str(tmp_path), 1, 'compacto')
+    vigente = qr_cache.obtener_o_generar(evento_1, 'vigente')
+    antiguo = qr_cache.obtener_o_generar(evento_1, 'antiguo')
+    otro_evento = qr_cache.obtener_o_generar(evento_2, 'otro')
+    otro_formato = qr_cache.obtener_o_generar(compacto_1, 'M1:1:1:FIRMA')
+
+    assert qr_cache.desalojar(evento_1, ['vigente']) == 1
+
+    assert os.path.exists(vigente) and not os.path.exists(antiguo)
+    assert os.path.exists(otro_evento) and os.path.exists(otro_formato)
+
+
+def test_qr_de_participante_se_guarda_en_la_carpeta_del_evento(app, client):
+    participante_id = sembrar(app, participantes=1)[0]
+    iniciar_sesion(client)
+
+    respuesta = client.get(f'/admin/participante/{participante_id}/qr')
+
+    assert respuesta.status_code == 200
+    carpeta = qr_cache.carpeta_de(app.config['QR_CACHE_FOLDER'], 1, 'json')
+    assert os.listdir(carpeta) == [f'{respuesta.headers["ETag"].strip(chr(34))}.png']
+
+
+def test_escrituras_simultaneas_del_mismo_qr(tmp_path, monkeypatch):
+    barrera = threading.Barrier(2)
+    generar = qr_cache.generate_qr_code_img
+
+    def generar_a_la_vez(datos):
+        # Los dos hilos ya abrieron su temporal antes de que alguno lo reemplace
+        barrera.wait()
+        return generar(datos)
+
+    monkeypatch.setattr(qr_cache, 'generate_qr_code_img', generar_a_la_vez)
+    ruta = qr_cache.ruta_en_cache(str(tmp_path), 'participante')
+    errores = []
+
+    def escribir():
+        try:
+            qr_cache.escribir_png(ruta, 'participante')
+        except Exception as e:  # pragma: no cover - se reporta en la aserción
+            errores.append(e)
+
+    hilos = [threading.Thread(target=escribir) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    assert os.listdir(tmp_path) == [os.path.basename(ruta)]
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from conftest import iniciar_sesion, sembrar
+
+from app.services.qr_token import QRInvalido, firmar, participante_desde_escaneo, verificar
+
+CLAVE = 'clave-de-prueba'
+
+
+def test_modo_por_defecto_acepta_token_json_e_id():
+    assert participante_desde_escaneo({'qr': firmar(42, 1, CLAVE)}, CLAVE, 1) == 42
+    assert participante_desde_escaneo({'qr': json.dumps({'id': 42, 'nombre': 'Ana'})}, CLAVE, 1) == 42
+    assert participante_desde_escaneo({'id_participante': '42'}, CLAVE, 1) == 42
+
+
+def test_token_alterado_o_de_otro_evento():
+    token = firmar(42, 1, CLAVE)
+    with pytest.raises(QRInvalido):
+        participante_desde_escaneo({'qr': token[:-1] + ('A' if token[-1] != 'A' else 'B')}, CLAVE, 1)
+    with pytest.raises(QRInvalido, match='otro evento'):
+        participante_desde_escaneo({'qr': token}, CLAVE, 2)
+
+
+@pytest.mark.parametrize('data', [
+    {'qr': json.dumps({'id': 42})},
+    {'qr': '42'},
+    {'id_participante': 42},
+])
+def test_solo_firmados_rechaza_contenido_sin_firma(data):
+    with pytest.raises(QRInvalido, match='firmados'):
+        participante_desde_escaneo(data, CLAVE, 1, solo_firmados=True)
+
+
+def test_solo_firmados_acepta_el_token():
+    assert participante_desde_escaneo({'qr': firmar(42, 1, CLAVE)}, CLAVE, 1, solo_firmados=True) == 42
+
+
+def test_validar_qr_con_qr_require_signed(app, client):
+    participante_id = sembrar(app, participantes=1)[0]
+    app.config['QR_REQUIRE_SIGNED'] = True
+    iniciar_sesion(client, 'op')
+
+    respuesta = client.post('/operador/validar_qr', json={'id_participante': participante_id})
+    assert respuesta.status_code == 400
+    assert 'firmados' in respuesta.get_json()['message']
+
+    token = firmar(participante_id, 1, app.config['SECRET_KEY'])
+    respuesta = client.post('/operador/validar_qr', json={'qr': token})
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()['estado'] == 'ok'
+
+
+@pytest.mark.parametrize('token', [
+    'M1:1:0:ÑÑÑ',       # firma fuera de ASCII
+    'M1:é:0:AAAA',      # id fuera de ASCII
+    'M1:1:٣:AAAA',      # dígito Unicode que int() aceptaría
+    'M1:1_0:0:AAAA',    # guion bajo que int() aceptaría
+    'M1:1:0:A1A8',      # firma fuera del alfabeto base 32
+    'M1::0:AAAA',
+])
+def test_token_con_caracteres_fuera_del_alfabeto(token):
+    with pytest.raises(QRInvalido):
+        verificar(token, CLAVE)
+
+
+@pytest.mark.parametrize('cabeceras', [{}, {'Idempotency-Key': 'lectura-0001'}])
+def test_validar_qr_con_token_no_ascii_responde_400(app, client, cabeceras):
+    sembrar(app, participantes=1)
+    iniciar_sesion(client, 'op')
+    for token in ('M1:1:0:ÑÑÑ', 'M1:é:0:AAA'):
+        respuesta = client.post('/operador/validar_qr', json={'qr': token}, headers=cabeceras)
+        assert respuesta.status_code == 400
+        assert respuesta.get_json()['success'] is False
@@ -0,0 +1,47 @@
+import threading
+
+from conftest import sembrar
+
+from app import db
+from app.models.models import Participante, Registro
+from app.services.redencion import COOLDOWN, OK, redimir_merienda
+
+HILOS = 8
+
+
+def test_escaneos_simultaneos_entregan_una_sola_merienda(app, contexto):
+    participante_id = sembrar(app, participantes=1, saldo=6)[0]
+    barrera = threading.Barrier(HILOS)
+    estados, errores = [], []
+
+    def escanear():
+        with app.app_context():
+            try:
+                barrera.wait()
+                estados.append(redimir_merienda(participante_id, 2, 60, evento_id=1).estado)
+            except Exception as e:  # pragma: no cover - se reporta en la aserción
+                errores.append(e)
+            finally:
+                db.session.remove()
+
+    hilos = [threading.Thread(target=escanear) for _ in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    assert estados.count(OK) == 1
+    assert estados.count(COOLDOWN) == HILOS - 1
+    db.session.expire_all()
+    assert db.session.get(Participante, participante_id).saldo_merienda == 5
+    assert db.session.query(Registro).count() == 1
+
+
+def test_sin_saldo_y_desconocido(app, contexto):
+    participante_id = sembrar(app, participantes=1, saldo=1)[0]
+    assert redimir_merienda(participante_id, 2, 0, evento_id=1).estado == OK
+    assert redimir_merienda(participante_id, 2, 0, evento_id=1).estado == 'sin_saldo'
+    assert redimir_merienda(999, 2, 0, evento_id=1).estado == 'desconocido'
+    # Un participante de otro evento se trata como desconocido
+    assert redimir_merienda(participante_id, 2, 0, evento_id=2).estado == 'desconocido'
@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import iniciar_sesion, sembrar
+
+from app.services import reportes
+from app.services.redencion import redimir_merienda
+
+
+@pytest.fixture
+def con_registros(app, client):
+    ids = sembrar(app, participantes=5, saldo=6, cooldown=0)
+    inicio = datetime.utcnow() - timedelta(hours=1)
+    with app.app_context():
+        for i, participante_id in enumerate(ids):
+            redimir_merienda(participante_id, 2, 0, ahora=inicio + timedelta(minutes=i), evento_id=1)
+    iniciar_sesion(client)
+    return client
+
+
+def _pagina(client, cursor=None):
+    respuesta = client.get('/admin/api/reportes', query_string={
+        'sort_by': 'fecha_hora', 'order': 'asc', 'por_pagina': 2, **({'cursor': cursor} if cursor else {}),
+    })
+    return respuesta.status_code, respuesta.get_json()
+
+
+def _cursor(valor, id_registro, direccion):
+    datos = json.dumps([valor, id_registro, direccion]).encode('utf-8')
+    return base64.urlsafe_b64encode(datos).decode('ascii').rstrip('=')
+
+
+def test_cursores_hacia_adelante_y_hacia_atras(con_registros):
+    _, pagina_1 = _pagina(con_registros)
+    _, pagina_2 = _pagina(con_registros, pagina_1['siguiente'])
+    _, pagina_3 = _pagina(con_registros, pagina_2['siguiente'])
+    _, de_vuelta = _pagina(con_registros, pagina_3['anterior'])
+
+    ids = lambda pagina: [r['id_registro'] for r in pagina['registros']]
+    assert ids(pagina_1) + ids(pagina_2) + ids(pagina_3) == [1, 2, 3, 4, 5]
+    assert pagina_3['siguiente'] is None
+    assert ids(de_vuelta) == ids(pagina_2)
+
+
+@pytest.mark.parametrize('cursor', [
+    _cursor('2025-12-01T10:00:00', 1, 'atras'),
+    _cursor('2025-12-01T10:00:00', 1, None),
+    _cursor(['2025-12-01T10:00:00'], 1, 'sig'),
+    _cursor('2025-12-01T10:00:00', 'uno', 'sig'),
+    'no-es-un-cursor',
+])
+def test_cursor_invalido(con_registros, cursor):
+    estado, cuerpo = _pagina(con_registros, cursor)
+    assert estado == 400
+    assert cuerpo['error'] == 'Cursor de paginación inválido.'
+
+
+def test_direccion_desconocida_se_rechaza_al_decodificar():
+    with pytest.raises(reportes.FiltroInvalido):
+        reportes._decodificar_cursor(_cursor('Ana', 1, 'sideways'), 'participante')
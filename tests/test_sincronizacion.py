@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+
+from conftest import iniciar_sesion, sembrar
+
+from app import db
+from app.models.models import Participante, Registro
+
+
+def _lote(client, escaneos):
+    respuesta = client.post('/operador/sincronizar', json={'escaneos': escaneos})
+    assert respuesta.status_code == 200
+    return {r['id_local']: r['estado'] for r in respuesta.get_json()['resultados']}
+
+
+def _escaneo(id_local, participante_id, fecha):
+    return {'id_local': id_local, 'id_participante': participante_id, 'fecha_hora': fecha.isoformat()}
+
+
+def test_lotes_en_conflicto_de_dos_dispositivos(app):
+    participante_id = sembrar(app, participantes=1, saldo=6, cooldown=60)[0]
+    base = datetime.utcnow().replace(microsecond=0)
+    antes = lambda minutos: base - timedelta(minutes=minutos)
+    dispositivo_a, dispositivo_b = app.test_client(), app.test_client()
+    iniciar_sesion(dispositivo_a, 'op')
+    iniciar_sesion(dispositivo_b, 'admin')
+
+    assert _lote(dispositivo_a, [_escaneo('a-0000001', participante_id, antes(100))]) == {'a-0000001': 'ok'}
+
+    # 20 minutos después de la entrega del dispositivo A: cooldown; 70 minutos después: entrega
+    assert _lote(dispositivo_b, [
+        _escaneo('b-0000001', participante_id, antes(80)),
+        _escaneo('b-0000002', participante_id, antes(30)),
+    ]) == {'b-0000001': 'cooldown', 'b-0000002': 'ok'}
+
+    # Escaneos que llegan tarde y son anteriores a la última entrega: 50 minutos antes
+    # de la entrega de A se rechaza; a más de un cooldown de cualquier entrega, se acepta
+    assert _lote(dispositivo_a, [
+        _escaneo('a-0000002', participante_id, antes(150)),
+        _escaneo('a-0000003', participante_id, antes(200)),
+    ]) == {'a-0000002': 'cooldown', 'a-0000003': 'ok'}
+
+    with app.app_context():
+        participante = db.session.get(Participante, participante_id)
+        assert participante.saldo_merienda == 3
+        # La última entrega sigue siendo la más reciente, no la del escaneo atrasado
+        assert participante.ultimo_registro_at == antes(30)
+        fechas = sorted(r.fecha_hora for r in db.session.query(Registro))
+        assert fechas == [antes(200), antes(100), antes(30)]
+
+    # Un escaneo en línea dentro de la hora siguiente a la última entrega sigue en cooldown
+    respuesta = dispositivo_a.post('/operador/validar_qr', json={'id_participante': participante_id})
+    assert respuesta.get_json()['estado'] == 'cooldown'
+
+
+def test_reenvio_del_mismo_lote_no_repite_entregas(app):
+    participante_id = sembrar(app, participantes=1, saldo=6, cooldown=60)[0]
+    client = app.test_client()
+    iniciar_sesion(client, 'op')
+    lote = [_escaneo('c-0000001', participante_id, datetime.utcnow() - timedelta(minutes=5))]
+
+    assert _lote(client, lote) == {'c-0000001': 'ok'}
+    assert _lote(client, lote) == {'c-0000001': 'ok'}
+    with app.app_context():
+        assert db.session.query(Registro).count() == 1
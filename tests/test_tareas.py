@@ -0,0 +1,97 @@
+import os
+import subprocess
+import sys
+import time
+import zipfile
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.services import tareas
+
+
+def _tarea(carpeta, **cambios):
+    estado = {**tareas._nuevo_estado('qrs', 10, regenerados=0), 'estado': tareas.EN_PROCESO, **cambios}
+    tareas._guardar_estado(str(carpeta), estado)
+    return estado['id']
+
+
+def _pid_terminado():
+    proceso = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proceso.wait()
+    return proceso.pid
+
+
+def test_tarea_en_curso_de_un_proceso_vivo(tmp_path):
+    tarea_id = _tarea(tmp_path)
+    assert tareas.obtener_estado(str(tmp_path), tarea_id)['estado'] == tareas.EN_PROCESO
+
+
+def test_tarea_de_un_proceso_terminado_se_marca_como_error(tmp_path):
+    tarea_id = _tarea(tmp_path, pid=_pid_terminado())
+
+    estado = tareas.obtener_estado(str(tmp_path), tarea_id)
+    assert estado['estado'] == tareas.ERROR
+    assert 'interrumpió' in estado['error']
+    # El cambio queda guardado para el resto de workers
+    with open(os.path.join(tmp_path, f'{tarea_id}.json')) as f:
+        assert '"error"' in f.read()
+
+
+def test_tarea_sin_progreso_se_marca_como_error(tmp_path, monkeypatch):
+    tarea_id = _tarea(tmp_path, host='otro-servidor')
+    ahora = time.time()
+    monkeypatch.setattr(tareas.time, 'time', lambda: ahora + tareas.MINUTOS_SIN_PROGRESO * 60 + 1)
+
+    assert tareas.obtener_estado(str(tmp_path), tarea_id)['estado'] == tareas.ERROR
+
+
+def test_tarea_terminada_no_se_modifica(tmp_path):
+    tarea_id = _tarea(tmp_path, pid=_pid_terminado(), estado=tareas.COMPLETADA)
+    assert tareas.obtener_estado(str(tmp_path), tarea_id)['estado'] == tareas.COMPLETADA
+
+
+def test_limpieza_tolera_archivos_borrados_por_otro_worker(tmp_path, monkeypatch):
+    antiguo = tmp_path / 'antiguo.zip'
+    antiguo.write_bytes(b'')
+    viejo = time.time() - (tareas.HORAS_RETENCION + 1) * 3600
+    os.utime(antiguo, (viejo, viejo))
+    (tmp_path / 'reciente.zip').write_bytes(b'')
+    # Un archivo que otro worker borra entre el listado y la comprobación
+    monkeypatch.setattr(tareas.os, 'listdir', lambda carpeta: ['ya_borrado.json', 'antiguo.zip', 'reciente.zip'])
+
+    tareas._limpiar_antiguas(str(tmp_path))
+
+    assert not antiguo.exists()
+    assert (tmp_path / 'reciente.zip').exists()
+
+
+@pytest.fixture
+def pool_limpio():
+    """Cada prueba empieza y termina sin el pool compartido del módulo."""
+    tareas._pool = None
+    yield
+    if tareas._pool is not None:
+        tareas._pool.shutdown(cancel_futures=True)
+        tareas._pool = None
+
+
+def test_un_pool_roto_se_reemplaza_en_la_siguiente_tarea(tmp_path, pool_limpio):
+    carpeta, cache = str(tmp_path / 'tareas'), str(tmp_path / 'qr')
+    os.makedirs(carpeta)
+    pool = tareas._obtener_pool(1)
+    # Un hijo que muere de golpe (como al quedarse sin memoria) rompe el pool
+    with pytest.raises(BrokenProcessPool):
+        pool.submit(os._exit, 1).result()
+
+    estado = tareas._nuevo_estado('qrs', 1, regenerados=0)
+    tareas._generar_zip(pool, [('a.png', 'participante a')], carpeta, cache, estado)
+    assert estado['estado'] == tareas.ERROR
+
+    nuevo = tareas._obtener_pool(1)
+    assert nuevo is not pool
+    estado = tareas._nuevo_estado('qrs', 1, regenerados=0)
+    tareas._generar_zip(nuevo, [('a.png', 'participante a')], carpeta, cache, estado)
+    assert estado['estado'] == tareas.COMPLETADA
+    with zipfile.ZipFile(tareas.ruta_zip(carpeta, estado['id'])) as zf:
+        assert zf.namelist() == ['a.png']
@@ -0,0 +1,72 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from conftest import iniciar_sesion, sembrar
+
+from app import db
+from app.services import reportes, tiempo
+from app.services.redencion import redimir_merienda
+
+ZONA = 'America/Bogota'  # UTC-5, sin horario de verano
+
+# Entregas alrededor de la medianoche local del 1 al 2 de diciembre (05:00 UTC)
+ENTREGAS_UTC = [
+    datetime(2025, 12, 1, 4, 55),   # 30 nov, 23:55 local
+    datetime(2025, 12, 1, 5, 0),    # 1 dic, 00:00 local
+    datetime(2025, 12, 2, 4, 55),   # 1 dic, 23:55 local
+    datetime(2025, 12, 2, 4, 59, 59),
+    datetime(2025, 12, 2, 5, 0),    # 2 dic, 00:00 local
+    datetime(2025, 12, 2, 5, 5),    # 2 dic, 00:05 local
+]
+
+
+def test_rango_utc_del_dia():
+    assert tiempo.rango_utc_del_dia(date(2025, 12, 1), ZONA) == (datetime(2025, 12, 1, 5), datetime(2025, 12, 2, 5))
+    # Con cambio de horario el día local dura 23 horas
+    inicio, fin = tiempo.rango_utc_del_dia(date(2025, 3, 9), 'America/New_York')
+    assert fin - inicio == timedelta(hours=23)
+
+
+def test_formatear_lote_y_claves_en_hora_local():
+    fechas = [ENTREGAS_UTC[2], ENTREGAS_UTC[5], None]
+    assert tiempo.formatear_lote(fechas, ZONA) == ['2025-12-01 11:55:00 PM', '2025-12-02 12:05:00 AM', '']
+    assert tiempo.formatear_lote(fechas[:2], ZONA) == [tiempo.formatear(f, ZONA) for f in fechas[:2]]
+    assert tiempo.claves_dia_hora_lote(fechas[:2], ZONA) == [
+        ('2025-12-01', '2025-12-01 23'), ('2025-12-02', '2025-12-02 00'),
+    ]
+    assert tiempo.claves_dia_hora_lote(fechas[:2], 'UTC') == [
+        ('2025-12-02', '2025-12-02 04'), ('2025-12-02', '2025-12-02 05'),
+    ]
+    assert tiempo.formatear_lote([], ZONA) == []
+
+
+@pytest.mark.parametrize('dia, esperadas', [
+    ('2025-11-30', [0]),
+    ('2025-12-01', [1, 2, 3]),
+    ('2025-12-02', [4, 5]),
+])
+def test_filtro_por_fecha_usa_el_dia_local(app, contexto, dia, esperadas):
+    ids = sembrar(app, participantes=len(ENTREGAS_UTC), cooldown=0)
+    for participante_id, fecha in zip(ids, ENTREGAS_UTC):
+        redimir_merienda(participante_id, 2, 0, ahora=fecha, evento_id=1, zona_horaria=ZONA)
+
+    filtros = reportes.filtros_desde_args({'fecha': dia, 'order': 'asc'})
+    reportes.resolver_evento(db.session, filtros, 1, ZONA)
+    filas = db.session.execute(reportes.consulta_reporte(filtros).order_by('fecha_hora')).all()
+
+    assert [f.fecha_hora for f in filas] == [ENTREGAS_UTC[i] for i in esperadas]
+
+
+def test_api_de_reportes_filtra_y_muestra_la_hora_local(app, client):
+    ids = sembrar(app, participantes=len(ENTREGAS_UTC), cooldown=0)
+    with app.app_context():
+        for participante_id, fecha in zip(ids, ENTREGAS_UTC):
+            redimir_merienda(participante_id, 2, 0, ahora=fecha, evento_id=1, zona_horaria=ZONA)
+    iniciar_sesion(client)
+
+    # El evento sembrado no tiene zona propia: usa la predeterminada (Bogotá)
+    cuerpo = client.get('/admin/api/reportes', query_string={'fecha': '2025-12-01', 'order': 'asc'}).get_json()
+
+    assert [r['fecha_hora_local'] for r in cuerpo['registros']] == [
+        '2025-12-01 12:00:00 AM', '2025-12-01 11:55:00 PM', '2025-12-01 11:59:59 PM',
+    ]
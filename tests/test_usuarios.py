@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+
+from conftest import CONTRASENA, iniciar_sesion, sembrar
+from sqlalchemy import event, update
+from sqlalchemy.engine import Engine
+
+from app import bcrypt, db
+from app.models.models import User
+from app.services.usuarios_cache import costo_hash, usuarios_cache
+
+
+@contextmanager
+def contar_consultas():
+    contadas = []
+
+    def contar(*args):
+        contadas.append(1)
+
+    event.listen(Engine, 'before_cursor_execute', contar)
+    try:
+        yield contadas
+    finally:
+        event.remove(Engine, 'before_cursor_execute', contar)
+
+
+def test_el_user_loader_responde_desde_la_cache(app, contexto):
+    sembrar(app, participantes=0)
+    with contar_consultas() as contadas:
+        assert usuarios_cache.obtener(2).username == 'op'
+    assert len(contadas) == 1
+    with contar_consultas() as contadas:
+        assert usuarios_cache.obtener(2).role == 'operador'
+    assert contadas == []
+
+    # Un cambio hecho sin invalidar no se ve hasta que caduca la copia
+    db.session.execute(update(User).where(User.id == 2).values(role='admin'))
+    db.session.commit()
+    assert usuarios_cache.obtener(2).role == 'operador'
+    usuarios_cache.invalidar()
+    assert usuarios_cache.obtener(2).role == 'admin'
+    assert usuarios_cache.obtener(999) is None
+
+
+def test_editar_y_eliminar_un_usuario_surte_efecto_en_la_siguiente_peticion(app):
+    sembrar(app, participantes=0)
+    admin, operador = app.test_client(), app.test_client()
+    iniciar_sesion(admin, 'admin')
+    iniciar_sesion(operador, 'op')
+    assert operador.get('/admin/usuarios').status_code == 302
+    # La copia del operador ya está en la caché
+    assert operador.get('/operador/escaner').status_code == 200
+
+    admin.post('/admin/usuario/edit/2', data={'username': 'op', 'role': 'admin'})
+    assert operador.get('/admin/usuarios').status_code == 200
+
+    admin.post('/admin/usuario/delete/2')
+    respuesta = operador.get('/operador/escaner')
+    assert respuesta.status_code == 302
+    assert '/login' in respuesta.headers['Location']
+
+
+def test_el_login_rehace_el_hash_con_el_costo_configurado(app, client):
+    sembrar(app, participantes=0)
+    costo = app.config['BCRYPT_LOG_ROUNDS']
+    with app.app_context():
+        db.session.execute(update(User).where(User.id == 2).values(
+            password=bcrypt.generate_password_hash(CONTRASENA, costo + 1).decode('utf-8')
+        ))
+        db.session.commit()
+
+    # Una contraseña incorrecta no toca el hash
+    client.post('/login', data={'username': 'op', 'password': 'otra'})
+    with app.app_context():
+        assert costo_hash(db.session.get(User, 2).password) == costo + 1
+
+    assert iniciar_sesion(client, 'op').status_code == 302
+    with app.app_context():
+        hash_nuevo = db.session.get(User, 2).password
+        assert costo_hash(hash_nuevo) == costo
+        assert bcrypt.check_password_hash(hash_nuevo, CONTRASENA)
+
+    # Con el costo ya al día, un nuevo login no lo reescribe
+    client.get('/logout')
+    iniciar_sesion(client, 'op')
+    with app.app_context():
+        assert db.session.get(User, 2).password == hash_nuevo
+
+
+def test_costo_hash():
+    assert costo_hash('$2b$12$abcdefghijklmnopqrstuv') == 12
+    assert costo_hash('sin formato') is None
+    assert costo_hash(None) is None
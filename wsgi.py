@@ -0,0 +1,26 @@
+"""
+Punto de entrada WSGI para producción:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Antes de aceptar peticiones comprueba que la base de datos responda
+(DB_STARTUP_RETRIES intentos); si no hay conexión el proceso termina con error.
+Después carga el índice en memoria de participantes del evento activo, para que
+el primer escaneo no tenga que esperar la carga.
+"""
+import os
+
+from app import db
+from app.services.gestion_eventos import evento_activo
+from app.services.indice_participantes import indice_participantes
+from app.services.salud import esperar_base_de_datos
+from run import app
+
+esperar_base_de_datos(app, intentos=int(os.environ.get('DB_STARTUP_RETRIES', 5)))
+
+with app.app_context():
+    evento = evento_activo(db.session)
+    if evento is not None:
+        cargados = indice_participantes.precargar(evento.id_config)
+        app.logger.info('Índice de participantes cargado: %d participantes, %.1f KB.',
+                        cargados, indice_participantes.memoria_bytes() / 1024)